@@ -2,9 +2,19 @@ from django.contrib import admin
 from .models import Course, CustomUser,Unit,Resource,Assignment,Announcement,DiscussionMessage,Message,Project,ProjectMilestone,ProjectFile   
 
 # ,Quiz,Question,Choice,Answer
+
+
+class SoftDeleteAdmin(admin.ModelAdmin):
+    # Deleting only stamps deleted_at (app.softdelete), so confirm the selected
+    # rows instead of collecting their whole cascade
+    def get_deleted_objects(self, objs, request):
+        objs = list(objs)
+        perms_needed = set() if self.has_delete_permission(request) else {self.opts.verbose_name}
+        return [str(obj) for obj in objs], {self.opts.verbose_name_plural: len(objs)}, perms_needed, []
+
 # Register your models here.
-admin.site.register(CustomUser)
-admin.site.register(Course)
+admin.site.register(CustomUser, SoftDeleteAdmin)
+admin.site.register(Course, SoftDeleteAdmin)
 admin.site.register(Unit)
 admin.site.register(Resource)
 admin.site.register(Assignment)
@@ -0,0 +1,144 @@
+"""Async versions of the hottest read endpoints, for the ASGI deployment.
+
+Under ``education/wsgi.py`` a request holds its worker thread for as long as
+it runs, so a few slow dashboard builds can queue everything behind them.
+Served by ``education/asgi.py`` (``uvicorn education.asgi:application``)
+these views await the async ORM and cache instead, and one worker process
+keeps many of them in flight. They still work under WSGI, where Django runs
+them to completion on the request thread.
+
+Each view returns the same JSON as its DRF counterpart, scoped by the same
+``visible_*`` helpers, for plain GETs only: no ``?fields=`` / ``?expand=``
+and no browsable API. Writes stay on the DRF viewsets. Authentication is
+``CachedJWTAuthentication``, so a cached user costs no query.
+
+Django 4.2 still runs each ORM call on a per-request thread; what a request
+no longer does is pin a thread while it waits. Every middleware in the stack
+is async-capable, so requests reach these views without a thread hop.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotAllowed, HttpResponseNotModified
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_etags
+from rest_framework.exceptions import APIException, NotAuthenticated, NotFound
+
+from .authentication import CachedJWTAuthentication
+from .caching import conditional_etag
+from .fastlist import row_mapper
+from .renderers import FastJSONRenderer
+from .serializers import AnnouncementSerializer, AssignmentSerializer, ExamSerializer, MessageSerializer, StudentExamSerializer
+from .views import (
+    AnnouncementViewSet, StudentDashboardView, dashboard_cache_key, dashboard_queries, student_exam_payload,
+    visible_announcements, visible_exams, visible_messages, with_questions,
+)
+
+_authentication = CachedJWTAuthentication()
+
+
+def _json(data, status=200):
+    return HttpResponse(FastJSONRenderer().render(data), content_type='application/json', status=status)
+
+
+def _error(exc):
+    # Same body as DRF's exception handler
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    return _json(data, status=exc.status_code)
+
+
+def jwt_get(view):
+    """Serve GETs only, to callers with a valid access token; ``request.user`` is theirs."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return HttpResponseNotAllowed(['GET'])
+        try:
+            result = await sync_to_async(_authentication.authenticate)(request)
+            if result is None:
+                raise NotAuthenticated()
+        except APIException as exc:
+            response = _error(exc)
+            if exc.status_code == 401:
+                response['WWW-Authenticate'] = _authentication.authenticate_header(request)
+            return response
+        request.user = result[0]
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+@jwt_get
+async def announcements(request):
+    etag = await sync_to_async(conditional_etag)(
+        request, AnnouncementViewSet.conditional_models, 'application/json'
+    )
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        mapper = row_mapper(AnnouncementSerializer())
+        response = _json(await mapper.amap(visible_announcements(request.user), request))
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@jwt_get
+async def messages(request):
+    return _json(await row_mapper(MessageSerializer()).amap(visible_messages(request.user), request))
+
+
+@jwt_get
+async def exams(request):
+    serializer_class = StudentExamSerializer if request.user.user_type == 'student' else ExamSerializer
+    exams = [exam async for exam in with_questions(visible_exams(request.user))]
+    return _json(serializer_class(exams, many=True).data)
+
+
+@jwt_get
+async def exam_detail(request, pk):
+    queryset = visible_exams(request.user).filter(pk=pk)
+    if request.user.user_type != 'student':
+        exam = await with_questions(queryset).afirst()
+        if exam is None:
+            return _error(NotFound())
+        return _json(ExamSerializer(exam).data)
+
+    # Students get the shared pre-rendered payload, as from ExamViewSet.retrieve
+    exam = await queryset.only('id', 'content_version').afirst()
+    if exam is None:
+        return _error(NotFound())
+    etag, body = await sync_to_async(student_exam_payload)(exam)
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@jwt_get
+async def dashboard(request):
+    user = request.user
+    if user.user_type != 'student':
+        return _json({'error': 'Unauthorized'}, status=403)
+    try:
+        days = max(1, min(int(request.GET.get('days', 7)), 60))
+    except ValueError:
+        return _json({'days': ['Must be an integer.']}, status=400)
+
+    # Shares its cache entries with StudentDashboardView
+    key = dashboard_cache_key(request, user, days)
+    data = await cache.aget(key)
+    if data is None:
+        queries = dashboard_queries(user, days, StudentDashboardView.announcement_count)
+        data = {
+            'courses': [course async for course in queries['courses']],
+            'due_assignments': await row_mapper(AssignmentSerializer()).amap(queries['due_assignments'], request),
+            'unread_messages': await queries['unread_messages'].acount(),
+            'announcements': await row_mapper(AnnouncementSerializer()).amap(queries['announcements'], request),
+            'open_exams': [exam async for exam in queries['open_exams']],
+        }
+        await cache.aset(key, data, timeout=settings.DASHBOARD_CACHE_TIMEOUT)
+    return _json(data)
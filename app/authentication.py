@@ -0,0 +1,86 @@
+"""JWT authentication with a process-local cache of resolved users.
+
+simplejwt's ``JWTAuthentication`` loads the user row on every request. Here
+resolved users are kept in process, keyed by user id, next to a per-user
+version token held in the ``USER_CACHE_ALIAS`` cache. ``invalidate_users``
+replaces the version token, so every process reloads the user on its next
+request; ``app.signals`` calls it on every save and delete of a user, which
+covers password changes and deactivation, and bulk ``update()``s must call it
+themselves.
+
+The version check needs a cache shared by all worker processes (REDIS_URL) to
+invalidate across them. With a per-process backend (the LocMem default) a
+user deactivated on one process would stay cached on the others, so users are
+then loaded on every request as ``JWTAuthentication`` does.
+"""
+import copy
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+# Bounds memory; resolved users are cheap to reload.
+MAX_CACHED_USERS = 10000
+
+# {str(user_id): (version, expires_at, user)}
+_users = {}
+
+# Backends whose entries other worker processes cannot see
+PROCESS_LOCAL_CACHES = (LocMemCache, DummyCache)
+
+
+def caches_users():
+    return not isinstance(caches[settings.USER_CACHE_ALIAS], PROCESS_LOCAL_CACHES)
+
+
+def _version_key(user_id):
+    return f'user-version:{user_id}'
+
+
+def user_version(user_id):
+    cache = caches[settings.USER_CACHE_ALIAS]
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # Never match a missing (evicted) version against a cached user
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_users(*user_ids):
+    """Make every process reload ``user_ids`` on their next request."""
+    caches[settings.USER_CACHE_ALIAS].set_many({_version_key(pk): uuid.uuid4().hex for pk in user_ids}, timeout=None)
+    for pk in user_ids:
+        _users.pop(str(pk), None)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None or not caches_users():
+            return super().get_user(validated_token)
+        user_id = str(user_id)
+
+        version = user_version(user_id)
+        entry = _users.get(user_id)
+        if entry is None or entry[0] != version or entry[1] < time.monotonic():
+            user = super().get_user(validated_token)
+            if len(_users) >= MAX_CACHED_USERS:
+                _users.clear()
+            _users[user_id] = (version, time.monotonic() + settings.USER_CACHE_TIMEOUT, user)
+        else:
+            user = entry[2]
+            # Checked per token, the rest of simplejwt's checks held when the user was cached
+            if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed('The user\'s password has been changed.', code='password_changed')
+        # Requests must not share (and mutate) one instance
+        return copy.copy(user)
@@ -0,0 +1,139 @@
+"""Per-model version counters, conditional GET and response caching for the API.
+
+Every write to a versioned model bumps its ``ModelVersion`` row (wired up in
+``app.signals``). A response that depends on a set of models can then be
+validated with one small query on those counters instead of re-running and
+re-serializing its queryset, and cached under a key that includes them, so a
+cached entry can never outlive the data it was rendered from.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db.models import F
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+
+from .models import ModelVersion
+
+
+def model_label(model):
+    return model._meta.label_lower
+
+
+def bump_versions(*models):
+    """Record that rows of ``models`` changed. Call after bulk ``update()``s, which send no signals."""
+    now = timezone.now()
+    for model in models:
+        label = model_label(model)
+        updated = ModelVersion.objects.filter(label=label).update(version=F('version') + 1, changed_at=now)
+        if not updated:
+            ModelVersion.objects.get_or_create(label=label, defaults={'version': 1})
+
+
+def current_versions(models):
+    """Return ``{label: version}`` for ``models`` in one query."""
+    labels = [model_label(model) for model in models]
+    versions = dict.fromkeys(labels, 0)
+    versions.update(ModelVersion.objects.filter(label__in=labels).values_list('label', 'version'))
+    return versions
+
+
+def cache_version(key):
+    """Opaque version token kept under ``key`` in the default cache.
+
+    For versions scoped finer than a model (one course, one user). A missing
+    token, never set or evicted, is replaced by a fresh one, so it can never
+    match a version that entries were cached under before.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_cache_version(key):
+    cache.set(key, uuid.uuid4().hex, timeout=None)
+
+
+def conditional_etag(request, models, media_type):
+    """The ETag of a response to ``request`` rendered from the rows of ``models``.
+
+    There is deliberately no Last-Modified: it has whole-second resolution,
+    so a change in the same second as a cached response would be missed.
+    """
+    versions = current_versions(models)
+    user = request.user
+    key = '|'.join([
+        str(user.pk) if user.is_authenticated else 'anon',
+        request.build_absolute_uri(),
+        media_type or '',
+        *(f'{label}={version}' for label, version in sorted(versions.items())),
+    ])
+    return f'"{hashlib.sha1(key.encode()).hexdigest()}"'
+
+
+class ConditionalGetMixin:
+    """Answer ``If-None-Match`` on list and retrieve without serializing.
+
+    ``conditional_models`` lists every model whose rows can change the
+    response: the viewset's own model plus anything its serializer or its
+    queryset scoping reads. The ETag covers those model versions, the caller,
+    the full URL and the negotiated media type.
+    """
+    conditional_models = ()
+
+    def get_conditional_etag(self, request):
+        if getattr(self, '_conditional_etag', None) is None:
+            self._conditional_etag = conditional_etag(request, self.conditional_models, request.accepted_media_type)
+        return self._conditional_etag
+
+    def conditional_response(self, request, handler, *args, **kwargs):
+        etag = self.get_conditional_etag(request)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = self.fresh_response(request, handler, *args, **kwargs)
+        if 200 <= response.status_code < 300 or response.status_code == 304:
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def fresh_response(self, request, handler, *args, **kwargs):
+        return handler(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().retrieve, *args, **kwargs)
+
+
+class AnonymousResponseCacheMixin(ConditionalGetMixin):
+    """Cache rendered anonymous list/retrieve responses in ``settings.RESPONSE_CACHE_ALIAS``.
+
+    The cache key is the conditional ETag, which already covers the URL, the
+    media type and the dependent model versions. Any save, delete or
+    enrollment change therefore moves reads to a new key; stale entries are
+    never read again and simply age out.
+    """
+
+    def fresh_response(self, request, handler, *args, **kwargs):
+        if request.user.is_authenticated or request.accepted_renderer.format != 'json':
+            return handler(request, *args, **kwargs)
+
+        cache = caches[settings.RESPONSE_CACHE_ALIAS]
+        etag = self.get_conditional_etag(request)
+        key = 'response:' + etag.strip('"')
+        cached = cache.get(key)
+        if cached is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            body = request.accepted_renderer.render(response.data, request.accepted_media_type, self.get_renderer_context())
+            cached = (request.accepted_media_type, body)
+            cache.set(key, cached, timeout=settings.RESPONSE_CACHE_TIMEOUT)
+        content_type, body = cached
+        return HttpResponse(body, content_type=content_type)
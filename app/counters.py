@@ -0,0 +1,63 @@
+"""Denormalized enrollment counters.
+
+``Course.students_count``, ``CustomUser.courses_enrolled_count`` and
+``CustomUser.courses_taught_count`` are stored columns, so serializing a
+course or user reads them instead of running a COUNT per row. A refresh is a
+single UPDATE setting each column to a correlated COUNT over the enrollment
+table (or ``Course.teacher``) for the given rows. It is atomic, and correct
+whatever the signal that triggered it reported: re-adding a member, removing
+a non-member, a concurrent change to the same course.
+
+``app.signals`` refreshes the affected rows after enrollment changes, teacher
+changes and deletes. ``save()`` never writes the counter columns of an
+existing row (see ``safe_update_fields``), so a stale in-memory value
+cannot overwrite them. Code that changes enrollments or teachers with
+``update()`` or raw SQL must call the refresh functions itself, or leave it
+to ``manage.py repair_counters``. Soft-deleted courses and users are not
+counted.
+"""
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Course, CustomUser
+
+Enrollment = Course.students.through
+
+
+def _count(queryset, column):
+    """COUNT of ``queryset`` rows whose ``column`` is the outer row's pk."""
+    counts = queryset.filter(**{column: OuterRef('pk')}).order_by().values(column).annotate(n=Count('*')).values('n')
+    return Coalesce(Subquery(counts), 0)
+
+
+def refresh_course_counters(course_ids=None):
+    """Recompute ``students_count`` for ``course_ids`` (all courses when ``None``); returns how many were wrong."""
+    courses = Course.objects.all() if course_ids is None else Course.objects.filter(pk__in=course_ids)
+    students = _count(Enrollment.objects.filter(customuser__deleted_at__isnull=True), 'course_id')
+    return courses.exclude(students_count=students).update(students_count=students)
+
+
+def refresh_user_counters(user_ids=None):
+    """Recompute both counters for ``user_ids`` (all users when ``None``); returns how many were wrong."""
+    users = CustomUser.objects.all() if user_ids is None else CustomUser.objects.filter(pk__in=user_ids)
+    enrolled = _count(Enrollment.objects.filter(course__deleted_at__isnull=True), 'customuser_id')
+    taught = _count(Course.objects.all(), 'teacher_id')
+    return users.exclude(Q(courses_enrolled_count=enrolled) & Q(courses_taught_count=taught)).update(
+        courses_enrolled_count=enrolled, courses_taught_count=taught,
+    )
+
+
+def repair_counters(batch_size=2000):
+    """Recompute every counter, ``batch_size`` rows per UPDATE; returns ``(courses, users)`` fixed."""
+    fixed = []
+    for model, refresh in ((Course, refresh_course_counters), (CustomUser, refresh_user_counters)):
+        ids = model.objects.order_by('pk').values_list('pk', flat=True)
+        total, last = 0, 0
+        while True:
+            chunk = list(ids.filter(pk__gt=last)[:batch_size])
+            if not chunk:
+                break
+            total += refresh(chunk)
+            last = chunk[-1]
+        fixed.append(total)
+    return tuple(fixed)
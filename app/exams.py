@@ -0,0 +1,348 @@
+"""Exam grading, timed attempts and item analysis.
+
+``ExamSubmission.responses`` holds the chosen ``Choice`` ids, one per answered
+question. Grading and item analysis both work from that compact layout.
+
+Answers autosaved during an ``ExamAttempt`` go through ``answer_buffer``, an
+in-process write-behind buffer that coalesces autosaves and writes them to the
+database in batches.
+"""
+import atexit
+import logging
+import threading
+import time
+from datetime import timedelta
+from itertools import chain
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import Choice, ExamAttempt, ExamSubmission
+
+logger = logging.getLogger(__name__)
+
+
+def grade_responses(exam, choice_ids, strict=True):
+    """Validate ``choice_ids`` against ``exam`` and return ``(score, responses)``.
+
+    ``responses`` is the de-duplicated list of choice ids ordered by question.
+    Raises ``ValueError`` if a choice does not belong to the exam or if a
+    question is answered more than once. With ``strict=False`` such choices
+    are dropped instead (used when finalizing attempts of an edited exam).
+    """
+    choice_ids = set(choice_ids)
+    rows = Choice.objects.filter(question__exam=exam, id__in=choice_ids).order_by('id').values_list(
+        'id', 'question_id', 'is_correct', 'question__marks'
+    )
+
+    answered = {}
+    score = 0
+    for choice_id, question_id, is_correct, marks in rows:
+        if question_id in answered:
+            if not strict:
+                continue
+            raise ValueError(f'Question {question_id} has more than one answer.')
+        answered[question_id] = choice_id
+        if is_correct:
+            score += marks
+
+    unknown = choice_ids - set(answered.values())
+    if unknown and strict:
+        raise ValueError(f'Choices {sorted(unknown)} do not belong to this exam.')
+
+    return score, [answered[question_id] for question_id in sorted(answered)]
+
+
+def item_analysis(exam, chunk_size=2000):
+    """Compute difficulty and discrimination for every question of ``exam``.
+
+    Submissions are loaded as a flat column of choice ids and scattered into a
+    0/1 response matrix (submissions x questions), so the statistics are a few
+    array operations regardless of how many submissions there are.
+
+    ``difficulty`` is the proportion of submissions answering correctly.
+    ``discrimination`` is the corrected point-biserial correlation between the
+    item and the rest of the exam score (total minus the item itself). It is
+    ``None`` when either side has no variance.
+    """
+    questions = list(exam.questions.order_by('id').values_list('id', 'text', 'marks'))
+    choices = list(Choice.objects.filter(question__exam=exam).values_list('id', 'question_id', 'is_correct'))
+
+    result = {'exam': exam.id, 'submissions': 0, 'items': []}
+    if not questions:
+        return result
+
+    column = {question_id: index for index, (question_id, _, _) in enumerate(questions)}
+    marks = np.array([question_marks for _, _, question_marks in questions], dtype=np.float64)
+
+    # Dense lookup tables indexed by choice id: owning question column and correctness.
+    size = max((choice_id for choice_id, _, _ in choices), default=0) + 1
+    choice_column = np.full(size, -1, dtype=np.int64)
+    choice_correct = np.zeros(size, dtype=np.int8)
+    for choice_id, question_id, is_correct in choices:
+        choice_column[choice_id] = column[question_id]
+        choice_correct[choice_id] = is_correct
+
+    responses = list(
+        ExamSubmission.objects.filter(exam=exam)
+        .values_list('responses', flat=True)
+        .iterator(chunk_size=chunk_size)
+    )
+    n = len(responses)
+    result['submissions'] = n
+    k = len(questions)
+
+    lengths = np.fromiter((len(r or ()) for r in responses), dtype=np.int64, count=n)
+    flat = np.fromiter(chain.from_iterable(r or () for r in responses), dtype=np.int64, count=int(lengths.sum()))
+    rows = np.repeat(np.arange(n), lengths)
+
+    # Drop ids of choices that were deleted after the submission was made.
+    known = (flat >= 0) & (flat < size)
+    flat, rows = flat[known], rows[known]
+    cols = choice_column[flat]
+    valid = cols >= 0
+    flat, rows, cols = flat[valid], rows[valid], cols[valid]
+
+    correct = np.zeros((n, k), dtype=np.float64)
+    correct[rows, cols] = choice_correct[flat]
+    answered = np.bincount(cols, minlength=k)
+
+    if n:
+        totals = correct @ marks
+        p = correct.mean(axis=0)
+        var_item = p * (1 - p)
+        cov = correct.T @ (totals - totals.mean()) / n
+        var_rest = totals.var() - 2 * marks * cov + marks ** 2 * var_item
+        cov_rest = cov - marks * var_item
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r_pb = cov_rest / np.sqrt(var_item * var_rest)
+    else:
+        p = np.full(k, np.nan)
+        r_pb = np.full(k, np.nan)
+
+    for index, (question_id, text, _) in enumerate(questions):
+        result['items'].append({
+            'question': question_id,
+            'text': text,
+            'answered': int(answered[index]),
+            'difficulty': None if np.isnan(p[index]) else round(float(p[index]), 4),
+            'discrimination': None if not np.isfinite(r_pb[index]) else round(float(r_pb[index]), 4),
+        })
+    return result
+
+
+def validate_answers(exam, answers):
+    """Normalize an autosave payload to ``{str(question_id): choice_id or None}``.
+
+    Raises ``ValueError`` if a choice does not belong to the given question.
+    """
+    if not isinstance(answers, dict):
+        raise ValueError('answers must be an object of {question_id: choice_id}.')
+    try:
+        normalized = {str(int(q)): (None if c is None else int(c)) for q, c in answers.items()}
+    except (TypeError, ValueError):
+        raise ValueError('answers must map question ids to choice ids.')
+
+    choice_ids = {c for c in normalized.values() if c is not None}
+    owner = dict(Choice.objects.filter(question__exam=exam, id__in=choice_ids).values_list('id', 'question_id'))
+    for question_id, choice_id in normalized.items():
+        if choice_id is not None and str(owner.get(choice_id)) != question_id:
+            raise ValueError(f'Choice {choice_id} is not an option of question {question_id}.')
+    return normalized
+
+
+def attempt_deadline(exam, started_at):
+    return started_at + timedelta(minutes=exam.duration_minutes)
+
+
+def is_expired(attempt, now=None):
+    """True once the deadline plus the submit grace period has passed."""
+    now = now or timezone.now()
+    return now > attempt.deadline + timedelta(seconds=settings.EXAM_ATTEMPT_GRACE_SECONDS)
+
+
+class AnswerBuffer:
+    """Coalesces autosaved answers in memory and writes them in batches.
+
+    ``put`` only touches a dict. Pending answers are written when the buffer
+    holds ``flush_size`` attempts, every ``flush_interval`` seconds by a
+    background thread, when an attempt is finalized, and at process exit.
+    About once per grace period the background thread also finalizes expired
+    attempts, so an abandoned attempt is graded without another request.
+    A flush is one read and one ``bulk_update`` however many attempts it
+    covers, written outside the lock so ``put`` never waits on the database.
+    Answers are merged into what is stored, so autosaves landing on
+    different worker processes do not overwrite each other's questions.
+
+    Each process only flushes its own buffer, so an attempt may be finalized
+    elsewhere while answers for it are still pending here. When they are
+    written, answers to questions the finalized attempt left blank are added
+    and its submission is graded again; answers it already has are kept.
+    """
+
+    def __init__(self, flush_size, flush_interval):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        # Flushes write one at a time, so an older batch never lands after a newer one
+        self._write_lock = threading.Lock()
+        self._flusher = None
+
+    def put(self, attempt_id, answers):
+        with self._lock:
+            self._pending.setdefault(attempt_id, {}).update(answers)
+            due = len(self._pending) >= self.flush_size
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_periodically, name='exam-autosave', daemon=True)
+                self._flusher.start()
+        if due:
+            self.flush()
+
+    def pending(self, attempt_id):
+        with self._lock:
+            return dict(self._pending.get(attempt_id, {}))
+
+    def flush(self, attempt_ids=None):
+        """Write pending answers (all of them, or only ``attempt_ids``)."""
+        with self._lock:
+            if attempt_ids is None:
+                batch, self._pending = self._pending, {}
+            else:
+                batch = {a: self._pending.pop(a) for a in attempt_ids if a in self._pending}
+        if not batch:
+            return 0
+        with self._write_lock:
+            try:
+                return _write_answers(batch)
+            except Exception:
+                # Put them back under any answers that arrived meanwhile
+                with self._lock:
+                    for attempt_id, answers in batch.items():
+                        self._pending[attempt_id] = {**answers, **self._pending.get(attempt_id, {})}
+                raise
+
+    def _flush_periodically(self):
+        swept_at = time.monotonic()
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+                if time.monotonic() - swept_at >= settings.EXAM_ATTEMPT_GRACE_SECONDS:
+                    swept_at = time.monotonic()
+                    finalize_expired_attempts()
+            except Exception:
+                logger.exception('Could not flush buffered exam answers')
+            finally:
+                close_old_connections()
+
+
+def _write_answers(batch):
+    """Merge ``batch`` (``{attempt_id: answers}``) into the stored attempts; returns how many were written."""
+    now = timezone.now()
+    with transaction.atomic():
+        attempts = list(
+            ExamAttempt.objects.select_for_update().filter(id__in=batch).only('id', 'answers', 'status', 'exam', 'submission')
+        )
+        open_attempts = []
+        for attempt in attempts:
+            if attempt.status == 'in_progress':
+                attempt.answers = {**attempt.answers, **batch[attempt.id]}
+                attempt.saved_at = now
+                open_attempts.append(attempt)
+                continue
+            # Autosaved on this process before another one finalized the attempt
+            missing = {q: c for q, c in batch[attempt.id].items() if q not in attempt.answers}
+            if missing and attempt.submission is not None:
+                attempt.answers = {**attempt.answers, **missing}
+                attempt.save(update_fields=['answers'])
+                submission = attempt.submission
+                submission.score, submission.responses = _grade(attempt)
+                submission.save(update_fields=['score', 'responses'])
+        ExamAttempt.objects.bulk_update(open_attempts, ['answers', 'saved_at'], batch_size=500)
+    return len(attempts)
+
+
+answer_buffer = AnswerBuffer(
+    flush_size=settings.EXAM_AUTOSAVE_FLUSH_SIZE,
+    flush_interval=settings.EXAM_AUTOSAVE_FLUSH_INTERVAL,
+)
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        answer_buffer.flush()
+    except Exception:
+        logger.exception('Could not flush buffered exam answers at exit')
+
+
+def start_attempt(exam, student):
+    """Return the student's open attempt for ``exam``, creating one if needed.
+
+    Once the student has used ``EXAM_MAX_ATTEMPTS`` attempts, returns the
+    latest (closed) one instead.
+    """
+    attempts = ExamAttempt.objects.filter(exam=exam, student=student)
+    attempt = attempts.filter(status='in_progress').first()
+    if attempt and is_expired(attempt):
+        finalize_attempt(attempt, status='expired')
+        attempt = None
+    if attempt is None:
+        closed = attempts.exclude(status='in_progress')
+        if closed.count() >= settings.EXAM_MAX_ATTEMPTS:
+            return closed.order_by('-started_at', '-id').first()
+        now = timezone.now()
+        attempt = ExamAttempt.objects.create(exam=exam, student=student, deadline=attempt_deadline(exam, now))
+    return attempt
+
+
+def _grade(attempt):
+    choice_ids = [c for c in attempt.answers.values() if c is not None]
+    return grade_responses(attempt.exam, choice_ids, strict=False)
+
+
+def finalize_attempt(attempt, answers=None, status='submitted'):
+    """Grade an attempt into an ``ExamSubmission`` and close it.
+
+    ``answers`` (already validated) are merged over the buffered and stored
+    ones. Answers still buffered by other processes are added when those
+    flush (see ``AnswerBuffer``). Finalizing an attempt that is already
+    closed returns its existing submission.
+    """
+    answer_buffer.flush([attempt.id])
+    with transaction.atomic():
+        attempt = ExamAttempt.objects.select_for_update().select_related('exam').get(pk=attempt.pk)
+        if attempt.status != 'in_progress':
+            return attempt.submission
+
+        if answers:
+            attempt.answers = {**attempt.answers, **answers}
+        score, responses = _grade(attempt)
+        attempt.submission = ExamSubmission.objects.create(
+            exam=attempt.exam, student_id=attempt.student_id, score=score, responses=responses
+        )
+        attempt.status = status
+        attempt.save(update_fields=['answers', 'status', 'submission'])
+    return attempt.submission
+
+
+def finalize_expired_attempts(now=None, attempts=None):
+    """Finalize every open attempt whose deadline (plus grace) has passed.
+
+    ``attempts`` narrows the sweep to a queryset (e.g. one exam's attempts);
+    without it the whole buffer is flushed first.
+    """
+    now = now or timezone.now()
+    if attempts is None:
+        answer_buffer.flush()
+        attempts = ExamAttempt.objects.all()
+    cutoff = now - timedelta(seconds=settings.EXAM_ATTEMPT_GRACE_SECONDS)
+    expired = attempts.filter(status='in_progress', deadline__lt=cutoff)
+    count = 0
+    for attempt in expired.iterator():
+        finalize_attempt(attempt, status='expired')
+        count += 1
+    return count
@@ -0,0 +1,173 @@
+"""Read-only fast path for list endpoints.
+
+``ModelSerializer`` builds a model instance per row and resolves every field
+through its attribute machinery; ``source='student.username'`` also costs a
+query per row unless the queryset was joined by hand. For serializers made
+only of model columns and forward foreign-key lookups, the same JSON can be
+produced from one ``values_list()`` query with the related columns joined in.
+
+``row_mapper`` compiles a serializer's readable fields into ``(name, lookup,
+converter)`` triples once per serializer class and field set. Serializers with
+fields that cannot be expressed as a column lookup (method fields, nested
+serializers, to-many relations, ``source='*'``) get no mapper and keep using
+the regular path.
+"""
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.files.storage import FileSystemStorage
+from django.utils.encoding import filepath_to_uri
+from rest_framework import ISO_8601, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+# Fields whose to_representation() is the identity for values the database returns
+_IDENTITY_FIELDS = (serializers.CharField, serializers.IntegerField, serializers.BooleanField, serializers.ReadOnlyField)
+
+
+def _column_lookup(model, attrs):
+    """The ``values()`` lookup for ``attrs`` and the model field it ends on, or ``None``."""
+    model_field = None
+    for attr in attrs:
+        if model_field is not None:
+            # Only forward many-to-one / one-to-one hops can be joined without duplicating rows
+            if not (model_field.many_to_one or model_field.one_to_one):
+                return None
+            model = model_field.related_model
+        try:
+            model_field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return None
+        if model_field.many_to_many or model_field.one_to_many or (model_field.is_relation and model_field.auto_created):
+            return None
+    return '__'.join(attrs), model_field
+
+
+def _file_url(storage):
+    """Converter factory: the request decides whether file URLs are absolute."""
+    def bind(request):
+        if (
+            isinstance(storage, FileSystemStorage) and storage.url.__func__ is FileSystemStorage.url
+            and storage.base_url.startswith('/') and not storage.base_url.startswith('//')
+        ):
+            # Same URL FileField renders, with the storage's url()/urljoin and
+            # build_absolute_uri() resolved once per response instead of per row
+            prefix = request.build_absolute_uri(storage.base_url) if request is not None else storage.base_url
+            return lambda name: prefix + filepath_to_uri(name).lstrip('/') if name else None
+        if request is None:
+            return lambda name: storage.url(name) if name else None
+        return lambda name: request.build_absolute_uri(storage.url(name)) if name else None
+    return bind
+
+
+def _datetime(field):
+    """Converter factory for ``DateTimeField``: the active timezone is looked up once per response."""
+    def bind(request):
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+        if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+            return field.to_representation
+
+        def convert(value):
+            if value.utcoffset() is None:
+                return field.to_representation(value)
+            value = value.astimezone(field_timezone).isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return convert
+    return bind
+
+
+class RowMapper:
+    def __init__(self, names, lookups, converters):
+        self.names = names
+        self.lookups = lookups
+        # (name, converter, is_factory) for every field whose value needs converting
+        self.converters = converters
+
+    def map(self, queryset, request=None):
+        return self._items(queryset.values_list(*self.lookups), request)
+
+    async def amap(self, queryset, request=None):
+        """``map()`` for async views: the rows are fetched through the async ORM."""
+        return self._items([row async for row in queryset.values_list(*self.lookups)], request)
+
+    def _items(self, rows, request):
+        converters = [(name, convert(request) if is_factory else convert) for name, convert, is_factory in self.converters]
+        names = self.names
+        items = []
+        for row in rows:
+            item = dict(zip(names, row))
+            for name, convert in converters:
+                value = item[name]
+                if value is not None:
+                    item[name] = convert(value)
+            items.append(item)
+        return items
+
+
+def _field_spec(model, field):
+    """``(lookup, converter, converter_is_factory)`` for ``field``, or ``None`` if unsupported."""
+    if isinstance(field, (serializers.SerializerMethodField, serializers.BaseSerializer, serializers.ManyRelatedField)):
+        return None
+    if field.source == '*':
+        return None
+    found = _column_lookup(model, field.source_attrs)
+    if found is None:
+        return None
+    lookup, model_field = found
+    if isinstance(field, serializers.RelatedField):
+        # A primary key is what values() returns for a foreign key
+        if type(field) is not serializers.PrimaryKeyRelatedField or field.pk_field is not None or not model_field.is_relation:
+            return None
+        return lookup, None, False
+    if model_field.is_relation:
+        return None
+    if isinstance(field, serializers.FileField):
+        if not getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+            return lookup, lambda name: name or None, False
+        return lookup, _file_url(model_field.storage), True
+    if type(field) is serializers.DateTimeField:
+        return lookup, _datetime(field), True
+    if type(field) in _IDENTITY_FIELDS:
+        return lookup, None, False
+    return lookup, field.to_representation, False
+
+
+@lru_cache(maxsize=256)
+def _compile(serializer_class, names):
+    # A context-free instance: nothing request-specific ends up in the cached mapper
+    fields = serializer_class().fields
+    model = serializer_class.Meta.model
+    lookups, converters = [], []
+    for name in names:
+        spec = _field_spec(model, fields[name])
+        if spec is None:
+            return None
+        lookup, convert, is_factory = spec
+        lookups.append(lookup)
+        if convert is not None:
+            converters.append((name, convert, is_factory))
+    return RowMapper(names, tuple(lookups), tuple(converters))
+
+
+def row_mapper(serializer):
+    """The compiled ``RowMapper`` for ``serializer``'s readable fields, or ``None``."""
+    if not isinstance(serializer, serializers.ModelSerializer):
+        return None
+    names = tuple(name for name, field in serializer.fields.items() if not field.write_only)
+    return _compile(type(serializer), names)
+
+
+class FastListMixin:
+    """Viewset mixin serving ``list`` from ``values_list()`` rows when the serializer allows it.
+
+    The response is identical to the regular path; paginated viewsets and
+    serializers without a mapper fall back to it.
+    """
+
+    def list(self, request, *args, **kwargs):
+        mapper = row_mapper(self.get_serializer())
+        if mapper is None or self.paginator is not None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(mapper.map(queryset, request))
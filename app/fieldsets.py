@@ -0,0 +1,158 @@
+"""Sparse fieldsets (``?fields=``) and opt-in expansion (``?expand=``) for the API.
+
+Without either parameter every serializer returns its usual payload. Once a
+GET request passes one of them, the response contains only the listed
+top-level ``fields`` (all of them if ``fields`` is omitted), and nested
+relations declared in ``expandable_fields`` are rendered as primary keys
+unless named in ``expand``::
+
+    /api/courses/?fields=id,title
+    /api/courses/?fields=id,title,teacher&expand=teacher
+    /api/projects/?expand=milestones
+
+``SparseFieldsetMixin`` then narrows the viewset queryset to match the
+serializer: ``only()`` the columns that are read, ``select_related`` for
+rendered foreign keys and ``prefetch_related`` for rendered to-many
+relations, so relations that were not asked for cost no queries at all.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+def requested_fieldset(request):
+    """``(fields, expand)`` from a GET request, or ``None`` when no sparse parameters were sent."""
+    if request is None or request.method != 'GET':
+        return None
+    params = request.query_params
+    if 'fields' not in params and 'expand' not in params:
+        return None
+    fields = {f for f in params.get('fields', '').split(',') if f} or None
+    expand = {f for f in params.get('expand', '').split(',') if f}
+    return fields, expand
+
+
+class DynamicFieldsMixin:
+    """Serializer mixin applying ``?fields=`` / ``?expand=`` from the request in its context.
+
+    ``expandable_fields`` names nested relations that are rendered as primary
+    keys unless expanded. ``field_requirements`` lists the model columns that
+    a ``SerializerMethodField`` reads, so the queryset can be narrowed safely.
+    """
+    expandable_fields = ()
+    field_requirements = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fieldset = requested_fieldset(self.context.get('request'))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.fieldset is None:
+            return fields
+        requested, expand = self.fieldset
+        if requested is not None:
+            fields = {name: field for name, field in fields.items() if name in requested}
+        for name in self.expandable_fields:
+            if name in fields and name not in expand:
+                fields[name] = self._collapsed_field(name, fields[name])
+        return fields
+
+    def _collapsed_field(self, name, field):
+        many = isinstance(field, serializers.ListSerializer)
+        return serializers.PrimaryKeyRelatedField(source=field.source if field.source != name else None, many=many, read_only=True)
+
+
+def _is_to_many(model_field):
+    return model_field.many_to_many or model_field.one_to_many
+
+
+def _plan(serializer, prefix=''):
+    """Return ``(only, select_related, prefetches)`` for rendering ``serializer``.
+
+    ``only`` is ``None`` when a field reads something that is not a model
+    column (a property, ``source='*'``), in which case nothing is deferred.
+    """
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    model = serializer.Meta.model
+    only = {prefix + model._meta.pk.name}
+    select, prefetch = set(), []
+    requirements = getattr(serializer, 'field_requirements', {})
+
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.SerializerMethodField):
+            if name not in requirements:
+                only = None
+            elif only is not None:
+                only.update(prefix + column for column in requirements[name])
+            continue
+        if field.source == '*':
+            only = None
+            continue
+        attrs = field.source_attrs
+        try:
+            model_field = model._meta.get_field(attrs[0])
+        except FieldDoesNotExist:
+            only = None
+            continue
+
+        if _is_to_many(model_field):
+            related = model_field.related_model
+            if isinstance(field, serializers.ListSerializer):
+                child_only, child_select, child_prefetch = _plan(field)
+                queryset = related._default_manager.select_related(*child_select).prefetch_related(*child_prefetch)
+            else:
+                child_only = {related._meta.pk.name}
+                queryset = related._default_manager.all()
+            if child_only is not None:
+                if model_field.one_to_many:
+                    # The reverse FK is how prefetched rows are matched back to their parent
+                    child_only.add(model_field.field.attname)
+                queryset = queryset.only(*child_only)
+            prefetch.append(Prefetch(prefix + model_field.name, queryset=queryset))
+        elif model_field.is_relation:
+            if isinstance(field, serializers.BaseSerializer):
+                select.add(prefix + attrs[0])
+                nested_only, nested_select, nested_prefetch = _plan(field, prefix + attrs[0] + '__')
+                select.update(nested_select)
+                prefetch.extend(nested_prefetch)
+                if only is not None:
+                    only.update(nested_only if nested_only is not None else {prefix + attrs[0]})
+            elif len(attrs) > 1:
+                select.add(prefix + attrs[0])
+                if only is not None:
+                    only.add(prefix + '__'.join(attrs[:2]))
+            elif only is not None:
+                only.add(prefix + attrs[0])
+        elif only is not None:
+            only.add(prefix + attrs[0])
+    return only, select, prefetch
+
+
+def optimize_queryset(queryset, serializer):
+    """Narrow ``queryset`` to what ``serializer`` will actually read."""
+    only, select, prefetch = _plan(serializer)
+    # The plan replaces the viewset's own joins and prefetches, which may
+    # traverse fields that only() defers or prefetch the same lookups differently
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    if only is not None:
+        queryset = queryset.only(*only)
+    return queryset
+
+
+class SparseFieldsetMixin:
+    """Viewset mixin narrowing list/retrieve querysets to the requested fieldset."""
+
+    def filter_queryset(self, queryset):
+        # filter_queryset rather than get_queryset: viewsets override the latter without calling super()
+        queryset = super().filter_queryset(queryset)
+        if self.action in ('list', 'retrieve') and requested_fieldset(self.request) is not None:
+            queryset = optimize_queryset(queryset, self.get_serializer())
+        return queryset
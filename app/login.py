@@ -0,0 +1,108 @@
+"""Bounded worker pool for password checks on login.
+
+Password hashing is deliberately slow. When a whole semester logs in at once,
+running it on the request threads lets login take every worker and starve the
+rest of the API. ``login_pool`` runs it on ``LOGIN_WORKERS`` threads of its
+own, with at most ``LOGIN_QUEUE_SIZE`` logins waiting. Every waiting login
+holds a request thread, so both the queue and the wait are kept short: a
+login is turned away with 429 and a ``Retry-After`` estimated from the queue
+depth at once when the queue is full or would not drain within
+``LOGIN_QUEUE_TIMEOUT`` seconds, and after waiting that long without
+starting.
+
+``login_metrics`` counts what happens, per process, for the admin metrics
+endpoint.
+"""
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from django.conf import settings
+from django.db import close_old_connections
+from rest_framework.exceptions import Throttled
+
+
+class LoginMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counters)
+
+
+login_metrics = LoginMetrics()
+
+
+class LoginPool:
+    def __init__(self, workers, queue_size, queue_timeout):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='login')
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._max_queued = 0
+        # Exponential moving average of how long one login takes
+        self._avg_seconds = 0.25
+
+    def run(self, fn, *args, **kwargs):
+        """Run ``fn`` on the pool and return its result. Raises ``Throttled`` when saturated."""
+        with self._lock:
+            if self._queued >= self.queue_size or self._queued * self._avg_seconds / self.workers > self.queue_timeout:
+                login_metrics.incr('rejected')
+                raise Throttled(wait=self.retry_after())
+            self._queued += 1
+            self._max_queued = max(self._max_queued, self._queued)
+
+        future = self._executor.submit(self._call, fn, args, kwargs)
+        try:
+            return future.result(timeout=self.queue_timeout)
+        except TimeoutError:
+            if future.cancel():
+                with self._lock:
+                    self._queued -= 1
+                login_metrics.incr('timed_out')
+                raise Throttled(wait=self.retry_after())
+            # Already running: let it finish
+            return future.result()
+
+    def _call(self, fn, args, kwargs):
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+        started = time.monotonic()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed = time.monotonic() - started
+            close_old_connections()
+            with self._lock:
+                self._running -= 1
+                self._avg_seconds = 0.9 * self._avg_seconds + 0.1 * elapsed
+            login_metrics.incr('completed')
+
+    def retry_after(self):
+        """Seconds until the current queue should have drained."""
+        return max(1, math.ceil((self._queued + self._running) * self._avg_seconds / self.workers))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'queued': self._queued,
+                'running': self._running,
+                'max_queued': self._max_queued,
+                'avg_login_seconds': round(self._avg_seconds, 4),
+            }
+
+
+login_pool = LoginPool(settings.LOGIN_WORKERS, settings.LOGIN_QUEUE_SIZE, settings.LOGIN_QUEUE_TIMEOUT)
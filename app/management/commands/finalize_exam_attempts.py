@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from app.exams import finalize_expired_attempts
+
+
+class Command(BaseCommand):
+    help = 'Flush buffered exam answers and finalize attempts whose deadline has passed.'
+
+    def handle(self, *args, **options):
+        count = finalize_expired_attempts()
+        self.stdout.write(f'Finalized {count} expired attempt(s)')
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app.exams import item_analysis
+from app.models import Exam
+
+
+class Command(BaseCommand):
+    help = 'Compute per-question difficulty and point-biserial discrimination for exams.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('exam_ids', nargs='*', type=int, help='Exams to analyse (default: all exams).')
+
+    def handle(self, *args, **options):
+        exams = Exam.objects.order_by('id')
+        if options['exam_ids']:
+            exams = exams.filter(id__in=options['exam_ids'])
+            missing = set(options['exam_ids']) - set(exams.values_list('id', flat=True))
+            if missing:
+                raise CommandError(f'Exams not found: {sorted(missing)}')
+
+        for exam in exams:
+            report = item_analysis(exam)
+            self.stdout.write(f"{exam.title} (id={exam.id}): {report['submissions']} submissions")
+            for item in report['items']:
+                self.stdout.write(
+                    f"  Q{item['question']:<6} answered={item['answered']:<6} "
+                    f"difficulty={_fmt(item['difficulty'])}  discrimination={_fmt(item['discrimination'])}"
+                )
+
+
+def _fmt(value):
+    return '   n/a' if value is None else f'{value:6.3f}'
@@ -0,0 +1,18 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from app.models import ChangeLog
+
+
+class Command(BaseCommand):
+    help = 'Delete sync change log entries older than --days. Clients holding older tokens get a full resync.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        deleted, _ = ChangeLog.objects.filter(changed_at__lt=cutoff).delete()
+        self.stdout.write(f'Deleted {deleted} change log entries')
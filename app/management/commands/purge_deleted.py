@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from app.purge import purge_deleted
+
+
+class Command(BaseCommand):
+    help = 'Delete soft-deleted courses and users with everything that cascades from them, in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--files-per-second', type=float, default=None)
+
+    def handle(self, *args, **options):
+        rows, files = purge_deleted(batch_size=options['batch_size'], files_per_second=options['files_per_second'])
+        self.stdout.write(f'Deleted {rows} rows and {files} files')
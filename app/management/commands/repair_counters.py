@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from app.counters import repair_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored enrollment counters on courses and users from the enrollment table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        courses, users = repair_counters(batch_size=options['batch_size'])
+        self.stdout.write(f'Fixed {courses} course and {users} user counters')
@@ -0,0 +1,231 @@
+"""Middleware serving the front end: the SPA shell and the static build.
+
+Every URL outside admin/, api/, static/ and media/ answers with the same
+``index.html``. Through the catch-all ``react_app`` view that means sessions,
+CSRF, auth, messages and a template render per page load. The shell only
+depends on the static file URLs, so ``SPAShellMiddleware``, ahead of the rest
+of the stack but behind ``SecurityMiddleware``, renders it once per process,
+keeps identity, gzip and (when the ``brotli`` package is installed) Brotli
+encodings of it in memory, and answers those URLs itself.
+
+The shell is served ``no-cache`` with an ETag: browsers revalidate it on every
+load, get a 304 while the build is unchanged, and pick up new hashed bundles
+right after a deploy restarts the workers. It must come right after
+``SecurityMiddleware`` in ``MIDDLEWARE``, which redirects to HTTPS and adds
+HSTS and the other security headers; the Host header is checked against
+``ALLOWED_HOSTS`` here as ``CommonMiddleware`` would, and the header
+``XFrameOptionsMiddleware`` would have added is set here. Disabled when
+``DEBUG`` is on, so template edits show up without a restart.
+
+``StaticAssetMiddleware`` takes WhiteNoise's place. WhiteNoise already builds
+its URL index (stat'ing every file once) at startup; this also reads the
+files and their ``.br``/``.gz`` variants into memory, up to
+``STATIC_PRELOAD_MAX_FILE_SIZE`` each, so a request for them touches no
+filesystem at all. Files collected with a Django content hash are immutable as
+before; so are the files the front-end build lists in ``asset-manifest.json``,
+which carry the build's own hash and are requested by those names (lazy
+chunks, images referenced from JS).
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse, HttpResponseNotModified
+from django.template.loader import render_to_string
+from django.utils.http import parse_etags
+from whitenoise.middleware import WhiteNoiseMiddleware
+from whitenoise.responders import StaticFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Paths (without the leading slash) that belong to the SPA; also routes react_app
+SPA_PATH_PATTERN = r'^(?!.*(?:admin/|api/|static/|media/)).*$'
+
+SHELL_TEMPLATE = 'index.html'
+
+
+def _accepted_encodings(header):
+    """Content codings the client accepts (q > 0), from an ``Accept-Encoding`` header."""
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        q = params.strip()
+        if q.startswith('q='):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding)
+    return accepted
+
+
+class SPAShell:
+    """The rendered shell, its encodings and the headers every response carries."""
+
+    def __init__(self, body):
+        self.etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        # Best compression first
+        self.encodings = []
+        if brotli is not None:
+            self.encodings.append(('br', brotli.compress(body, quality=11, mode=brotli.MODE_TEXT)))
+        self.encodings.append(('gzip', gzip.compress(body, compresslevel=9, mtime=0)))
+        self.body = body
+        self.headers = {
+            'Content-Type': 'text/html; charset=utf-8',
+            'Cache-Control': 'no-cache',
+            'Vary': 'Accept-Encoding',
+            'ETag': self.etag,
+            'X-Frame-Options': getattr(settings, 'X_FRAME_OPTIONS', 'DENY').upper(),
+        }
+
+    def response(self, request):
+        if self.etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            body, coding = self.body, None
+            accepted = _accepted_encodings(request.headers.get('Accept-Encoding', ''))
+            for name, encoded in self.encodings:
+                if name in accepted:
+                    body, coding = encoded, name
+                    break
+            response = HttpResponse(b'' if request.method == 'HEAD' else body)
+            response['Content-Length'] = len(body)
+            if coding is not None:
+                response['Content-Encoding'] = coding
+        for header, value in self.headers.items():
+            response[header] = value
+        return response
+
+
+class SPAShellMiddleware:
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        if settings.DEBUG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.path = re.compile(SPA_PATH_PATTERN)
+        self._shell = None
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if self.handles(request):
+            return self.shell.response(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if self.handles(request):
+            return self.shell.response(request)
+        return await self.get_response(request)
+
+    def handles(self, request):
+        if request.method not in ('GET', 'HEAD') or self.path.match(request.path_info.lstrip('/')) is None:
+            return False
+        # Raises DisallowedHost (a 400) for hosts outside ALLOWED_HOSTS
+        request.get_host()
+        return True
+
+    @property
+    def shell(self):
+        # Rendered on first use: the static manifest may not exist when workers boot
+        if self._shell is None:
+            self._shell = SPAShell(render_to_string(SHELL_TEMPLATE).encode())
+        return self._shell
+
+
+class StaticAssetMiddleware(WhiteNoiseMiddleware):
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        # Needed by immutable_file_test(), which super() calls for every file
+        self.build_assets = self.load_build_assets(settings)
+        super().__init__(get_response, settings)
+        self.contents = {}
+        if not self.autorefresh:
+            self.preload(settings.STATIC_PRELOAD_MAX_FILE_SIZE)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def load_build_assets(settings):
+        """URLs of the files ``asset-manifest.json`` lists; the build hashed their names."""
+        name = settings.STATIC_ASSET_MANIFEST
+        path = os.path.join(settings.STATIC_ROOT, name) if settings.STATIC_ROOT else None
+        if path is None or not os.path.isfile(path):
+            path = finders.find(name)
+        if not path:
+            return frozenset()
+        with open(path, encoding='utf-8') as f:
+            files = json.load(f).get('files', {})
+        # index.html is not hashed, and is served by SPAShellMiddleware anyway
+        return frozenset(url for key, url in files.items() if key != 'index.html')
+
+    def immutable_file_test(self, path, url):
+        return url in self.build_assets or super().immutable_file_test(path, url)
+
+    def preload(self, max_file_size):
+        for static_file in self.files.values():
+            if not isinstance(static_file, StaticFile):
+                continue
+            for _, path, headers in static_file.alternatives:
+                if int(dict(headers)['Content-Length']) <= max_file_size:
+                    with open(path, 'rb') as f:
+                        self.contents[path] = f.read()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        static_file = self.find_static_file(request)
+        if static_file is None:
+            return self.get_response(request)
+        response = self.from_memory(static_file, request)
+        return response if response is not None else self.serve(static_file, request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_static_file)(request)
+        else:
+            static_file = self.find_static_file(request)
+        if static_file is None:
+            return await self.get_response(request)
+        response = self.from_memory(static_file, request)
+        return response if response is not None else await sync_to_async(self.serve)(static_file, request)
+
+    def find_static_file(self, request):
+        if self.autorefresh:
+            return self.find_file(request.path_info)
+        return self.files.get(request.path_info)
+
+    def from_memory(self, static_file, request):
+        """The response for ``static_file`` when it needs no file access, else ``None``."""
+        if not isinstance(static_file, StaticFile) or 'HTTP_RANGE' in request.META:
+            return None
+        if request.method not in ('GET', 'HEAD') or static_file.is_not_modified(request.META):
+            # WhiteNoise answers 405 and 304 without opening the file
+            return self.serve(static_file, request)
+        path, headers = static_file.get_path_and_headers(request.META)
+        body = self.contents.get(path)
+        if body is None:
+            return None
+        response = HttpResponse(body if request.method == 'GET' else b'')
+        del response['Content-Type']
+        for key, value in headers:
+            response[key] = value
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_exam_alter_announcement_id_alter_assignment_id_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='examsubmission',
+            name='responses',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+SQLITE_FTS = [
+    """CREATE VIRTUAL TABLE app_searchentry_fts USING fts5(
+        title, body, content='app_searchentry', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER app_searchentry_ai AFTER INSERT ON app_searchentry BEGIN
+        INSERT INTO app_searchentry_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+    """CREATE TRIGGER app_searchentry_ad AFTER DELETE ON app_searchentry BEGIN
+        INSERT INTO app_searchentry_fts(app_searchentry_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+    END""",
+    """CREATE TRIGGER app_searchentry_au AFTER UPDATE ON app_searchentry BEGIN
+        INSERT INTO app_searchentry_fts(app_searchentry_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO app_searchentry_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+]
+
+SQLITE_FTS_DROP = [
+    'DROP TRIGGER IF EXISTS app_searchentry_au',
+    'DROP TRIGGER IF EXISTS app_searchentry_ad',
+    'DROP TRIGGER IF EXISTS app_searchentry_ai',
+    'DROP TABLE IF EXISTS app_searchentry_fts',
+]
+
+POSTGRES_FTS = [
+    """ALTER TABLE app_searchentry ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(body, '')), 'B')
+    ) STORED""",
+    'CREATE INDEX app_searchentry_vector_idx ON app_searchentry USING GIN (search_vector)',
+]
+
+POSTGRES_FTS_DROP = [
+    'DROP INDEX IF EXISTS app_searchentry_vector_idx',
+    'ALTER TABLE app_searchentry DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _run(schema_editor, SQLITE_FTS)
+    elif vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_FTS)
+
+
+def drop_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _run(schema_editor, SQLITE_FTS_DROP)
+    elif vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_FTS_DROP)
+
+
+def index_existing_rows(apps, schema_editor):
+    SearchEntry = apps.get_model('app', 'SearchEntry')
+    sources = [
+        ('course', apps.get_model('app', 'Course'), lambda o: dict(course_id=o.id, title=o.title, body=o.description)),
+        ('resource', apps.get_model('app', 'Resource'), lambda o: dict(course_id=o.course_id, title=o.title, body=o.content or '')),
+        ('announcement', apps.get_model('app', 'Announcement'), lambda o: dict(course_id=o.course_id, is_global=o.is_global, title=o.title, body=o.content)),
+        ('discussion', apps.get_model('app', 'DiscussionMessage'), lambda o: dict(course_id=o.course_id, body=o.content)),
+    ]
+    for kind, model, fields in sources:
+        SearchEntry.objects.bulk_create(
+            (SearchEntry(kind=kind, object_id=obj.id, **fields(obj)) for obj in model.objects.iterator()),
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_modelversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('course', 'Course'), ('resource', 'Resource'), ('announcement', 'Announcement'), ('discussion', 'Discussion Message')], max_length=20)),
+                ('object_id', models.PositiveIntegerField()),
+                ('is_global', models.BooleanField(default=False)),
+                ('title', models.CharField(blank=True, max_length=200)),
+                ('body', models.TextField(blank=True)),
+                ('course', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app.course')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='searchentry',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_search_entry'),
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+        migrations.RunPython(index_existing_rows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:52
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+def _normalize(text):
+    return unicodedata.normalize('NFKC', text or '').casefold()
+
+
+def fill_search_columns(apps, schema_editor):
+    CustomUser = apps.get_model('app', 'CustomUser')
+    batch = []
+    for user in CustomUser.objects.only('id', 'username', 'email').iterator(chunk_size=2000):
+        user.username_search = _normalize(user.username)
+        user.email_search = _normalize(user.email)
+        batch.append(user)
+        if len(batch) >= 2000:
+            CustomUser.objects.bulk_update(batch, ['username_search', 'email_search'])
+            batch = []
+    CustomUser.objects.bulk_update(batch, ['username_search', 'email_search'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_searchentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='email_search',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=254),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='username_search',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=150),
+        ),
+        migrations.RunPython(fill_search_columns, migrations.RunPython.noop),
+    ]
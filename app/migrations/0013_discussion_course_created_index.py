@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_customuser_search_columns'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='discussionmessage',
+            index=models.Index(fields=['course', 'created_at', 'id'], name='discussion_course_created'),
+        ),
+    ]
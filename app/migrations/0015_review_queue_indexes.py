@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_changelog'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(condition=models.Q(('grade__isnull', True)), fields=['course', 'created_at', 'id'], name='project_review_queue'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(condition=models.Q(('grade__isnull', True)), fields=['assignment', 'submitted_at', 'id'], name='submission_review_queue'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:49
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count(queryset, column):
+    counts = queryset.filter(**{column: OuterRef('pk')}).order_by().values(column).annotate(n=Count('*')).values('n')
+    return Coalesce(Subquery(counts), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Course = apps.get_model('app', 'Course')
+    CustomUser = apps.get_model('app', 'CustomUser')
+    Enrollment = Course.students.through
+    Course.objects.update(students_count=_count(Enrollment.objects.all(), 'course_id'))
+    CustomUser.objects.update(
+        courses_enrolled_count=_count(Enrollment.objects.all(), 'customuser_id'),
+        courses_taught_count=_count(Course.objects.all(), 'teacher_id'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0016_notifications'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='students_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='courses_enrolled_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='courses_taught_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
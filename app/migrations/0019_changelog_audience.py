@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0018_soft_delete'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changelog',
+            name='audience',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -1,19 +1,72 @@
+import unicodedata
+
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
-class CustomUser(AbstractUser):
+from .softdelete import LiveCourseManager, SoftDeleteManager, SoftDeleteModel, SoftDeleteQuerySet, SoftDeleteUserManager
+
+
+def normalize_search(text):
+    """Case- and width-insensitive form used by the prefix search columns."""
+    return unicodedata.normalize('NFKC', text or '').casefold()
+
+
+def safe_update_fields(instance, update_fields):
+    """The ``update_fields`` for saving ``instance`` without writing its ``update_only_fields``.
+
+    Those columns (the ``app.counters`` counters, ``deleted_at``,
+    ``Exam.content_version``) change through UPDATE statements; writing back the values loaded with an
+    existing row would undo changes since.
+    """
+    if update_fields is not None or instance._state.adding:
+        return update_fields
+    deferred = instance.get_deferred_fields()
+    return [
+        f.name for f in instance._meta.concrete_fields
+        if not f.primary_key and f.name not in instance.update_only_fields and f.attname not in deferred
+    ]
+
+class CustomUser(AbstractUser, SoftDeleteModel):
     USER_TYPE_CHOICES = (
         ('student', 'Student'),
         ('teacher', 'Teacher'),
         ('admin', 'Admin'),
     )
     user_type = models.CharField(max_length=10, choices=USER_TYPE_CHOICES, default='student')
-
-class Course(models.Model):
+    # Normalized copies of username/email backing indexed prefix (autocomplete) lookups
+    username_search = models.CharField(max_length=150, db_index=True, editable=False, default='')
+    email_search = models.CharField(max_length=254, db_index=True, editable=False, default='')
+    # Maintained by app.counters
+    courses_enrolled_count = models.PositiveIntegerField(default=0, editable=False)
+    courses_taught_count = models.PositiveIntegerField(default=0, editable=False)
+    update_only_fields = ('courses_enrolled_count', 'courses_taught_count', 'deleted_at')
+
+    objects = SoftDeleteUserManager()
+    all_objects = SoftDeleteQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        self.username_search = normalize_search(self.username)
+        self.email_search = normalize_search(self.email)
+        update_fields = safe_update_fields(self, kwargs.get('update_fields'))
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'username_search', 'email_search'}
+        super().save(*args, **kwargs)
+
+class Course(SoftDeleteModel):
     title = models.CharField(max_length=200)
     description = models.TextField()
     teacher = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='courses_taught', limit_choices_to={'user_type': 'teacher'})
     students = models.ManyToManyField(CustomUser, related_name='courses_enrolled', limit_choices_to={'user_type': 'student'}, blank=True)
+    # Maintained by app.counters
+    students_count = models.PositiveIntegerField(default=0, editable=False)
+    update_only_fields = ('students_count', 'deleted_at')
+
+    objects = SoftDeleteManager()
+    all_objects = SoftDeleteQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        kwargs['update_fields'] = safe_update_fields(self, kwargs.get('update_fields'))
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.title
@@ -23,6 +76,8 @@ class Unit(models.Model):
     title = models.CharField(max_length=200)
     order = models.PositiveIntegerField(default=0)
 
+    objects = LiveCourseManager()
+
     def __str__(self):
         return f"{self.course.title} - {self.title}"
 
@@ -42,6 +97,8 @@ class Resource(models.Model):
     content = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = LiveCourseManager()
+
     def __str__(self):
         return self.title
 
@@ -53,6 +110,8 @@ class Assignment(models.Model):
     file = models.FileField(upload_to='assignments/', blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = LiveCourseManager()
+
     def __str__(self):
         return self.title
 
@@ -64,6 +123,15 @@ class Submission(models.Model):
     grade = models.CharField(max_length=10, blank=True, null=True)
     feedback = models.TextField(blank=True, null=True)
 
+    course_lookup = 'assignment__course'
+    objects = LiveCourseManager()
+
+    class Meta:
+        indexes = [
+            # Teacher review queue: holds only ungraded rows, so it stays small as graded history grows
+            models.Index(fields=['assignment', 'submitted_at', 'id'], condition=models.Q(grade__isnull=True), name='submission_review_queue'),
+        ]
+
     def __str__(self):
         return f"{self.student.username} - {self.assignment.title}"
 
@@ -76,18 +144,57 @@ class Announcement(models.Model):
     priority = models.IntegerField(default=0)  # Higher number = higher priority
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = LiveCourseManager()
+
     class Meta:
         ordering = ['-priority', '-created_at']
 
     def __str__(self):
         return self.title
 
+class Notification(models.Model):
+    # One row per recipient, bulk-inserted when an announcement is published
+    # (see app.notifications); read state lives here, the content stays on the announcement.
+    recipient = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='notifications')
+    announcement = models.ForeignKey(Announcement, on_delete=models.CASCADE, related_name='notifications')
+    is_read = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    course_lookup = 'announcement__course'
+    objects = LiveCourseManager()
+
+    class Meta:
+        indexes = [
+            # Backs the newest-first inbox page and its keyset cursor
+            models.Index(fields=['recipient', 'created_at', 'id'], name='notification_inbox'),
+        ]
+
+    def __str__(self):
+        return f"{self.recipient_id}: {self.announcement_id}"
+
+class NotificationInbox(models.Model):
+    # Denormalized unread count per user, so "anything new?" is a primary key lookup.
+    # Maintained by app.notifications alongside every change to Notification.is_read.
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, primary_key=True, related_name='inbox')
+    unread_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread_count} unread"
+
 class DiscussionMessage(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='discussions')
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
-    
+
+    objects = LiveCourseManager()
+
+    class Meta:
+        indexes = [
+            # Backs keyset paging and "since" polling within a course
+            models.Index(fields=['course', 'created_at', 'id'], name='discussion_course_created'),
+        ]
+
     def __str__(self):
         return f"{self.user.username}: {self.content[:20]}"
 
@@ -115,16 +222,28 @@ class Project(models.Model):
     feedback = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = LiveCourseManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['course', 'created_at', 'id'], condition=models.Q(grade__isnull=True), name='project_review_queue'),
+        ]
+
     def __str__(self):
         return f"{self.title} - {self.student.username}"
 
 class ProjectMilestone(models.Model):
+    STATUSES = ('pending', 'active', 'completed')
+
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='milestones')
     title = models.CharField(max_length=200)
     date = models.DateField()
     status = models.CharField(max_length=20, default='pending') # pending, active, completed
     description = models.TextField(blank=True, null=True)
 
+    course_lookup = 'project__course'
+    objects = LiveCourseManager()
+
     def __str__(self):
         return f"{self.project.title} - {self.title}"
 
@@ -134,6 +253,9 @@ class ProjectFile(models.Model):
     file = models.FileField(upload_to='project_files/')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    course_lookup = 'project__course'
+    objects = LiveCourseManager()
+
     def __str__(self):
         return f"{self.project.title} - {self.file.name}"
 
@@ -145,6 +267,14 @@ class Exam(models.Model):
     duration_minutes = models.IntegerField(default=60)
     total_marks = models.IntegerField(default=100)
     created_at = models.DateTimeField(auto_now_add=True)
+    content_version = models.PositiveIntegerField(default=1, editable=False)  # bumped by app.signals on any change to the exam payload
+    update_only_fields = ('content_version',)
+
+    objects = LiveCourseManager()
+
+    def save(self, *args, **kwargs):
+        kwargs['update_fields'] = safe_update_fields(self, kwargs.get('update_fields'))
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.title
@@ -173,7 +303,93 @@ class ExamSubmission(models.Model):
     exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name='submissions')
     student = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='exam_submissions')
     score = models.IntegerField(default=0)
+    responses = models.JSONField(default=list, blank=True)  # chosen Choice ids, one per answered question
     submitted_at = models.DateTimeField(auto_now_add=True)
 
+    course_lookup = 'exam__course'
+    objects = LiveCourseManager()
+
+    def __str__(self):
+        return f"{self.student.username} - {self.exam.title}"
+
+class ExamAttempt(models.Model):
+    STATUS_CHOICES = (
+        ('in_progress', 'In Progress'),
+        ('submitted', 'Submitted'),
+        ('expired', 'Expired'),
+    )
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name='attempts')
+    student = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='exam_attempts')
+    started_at = models.DateTimeField(auto_now_add=True)
+    deadline = models.DateTimeField()
+    answers = models.JSONField(default=dict, blank=True)  # {question_id: choice_id}, written by the autosave buffer
+    saved_at = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='in_progress')
+    submission = models.OneToOneField(ExamSubmission, on_delete=models.SET_NULL, related_name='attempt', null=True, blank=True)
+
+    course_lookup = 'exam__course'
+    objects = LiveCourseManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['exam', 'student'], condition=models.Q(status='in_progress'), name='unique_open_exam_attempt'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'deadline'], name='examattempt_status_deadline'),
+        ]
+
+    def __str__(self):
+        return f"{self.student.username} - {self.exam.title} ({self.status})"
+
+class ModelVersion(models.Model):
+    # One counter per model label, bumped on every write (see app.caching).
+    # Used as a cheap validator for conditional GETs and cache keys.
+    label = models.CharField(max_length=100, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+    changed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.label} v{self.version}"
+
+class SearchEntry(models.Model):
+    # Denormalized text of searchable rows, kept in sync by app.signals.
+    # The full-text index over title/body is created by migration 0011
+    # (FTS5 table on SQLite, tsvector column on PostgreSQL); see app.search.
+    KIND_CHOICES = (
+        ('course', 'Course'),
+        ('resource', 'Resource'),
+        ('announcement', 'Announcement'),
+        ('discussion', 'Discussion Message'),
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveIntegerField()
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+', null=True, blank=True)
+    is_global = models.BooleanField(default=False)  # visible to everyone (global announcements)
+    title = models.CharField(max_length=200, blank=True)
+    body = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_search_entry'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id}"
+
+class ChangeLog(models.Model):
+    # Append-only record of writes to the models served by the sync endpoint
+    # (see app.sync). The id is the sync position handed to clients.
+    ACTION_CHOICES = (
+        ('upsert', 'Created or updated'),
+        ('delete', 'Deleted'),
+        ('scope', 'Visibility changed'),  # object_id is the user whose course membership changed
+    )
+    model = models.CharField(max_length=50)
+    object_id = models.PositiveIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    # {"users": [...], "courses": [...]} the row was visible to; null when visible to everybody
+    audience = models.JSONField(null=True, blank=True)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
     def __str__(self):
-        return f"{self.student.username} - {self.exam.title}"
\ No newline at end of file
+        return f"#{self.id} {self.action} {self.model} {self.object_id}"
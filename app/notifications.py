@@ -0,0 +1,115 @@
+"""Announcement notifications, fanned out to one row per recipient.
+
+Publishing an announcement gives each recipient a ``Notification`` row and
+adds one to their ``NotificationInbox.unread_count``. Recipients are the
+enrolled students of the announcement's course, or every student for a
+global one, never the author. Rows are written ``NOTIFICATION_CHUNK_SIZE``
+recipients at a time, each chunk one ``bulk_create`` and one counter
+``update()`` in its own short transaction. Announcements reaching more than
+``NOTIFICATION_INLINE_LIMIT`` users are fanned out on a background worker
+thread instead of in the request that published them.
+
+The unread counter is only right if every change to ``Notification.is_read``
+goes through ``mark_notifications_read``, and deleting announcements
+through ``withdraw_notifications`` (``app.signals`` does the latter).
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .models import Announcement, CustomUser, Notification, NotificationInbox
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=settings.NOTIFICATION_WORKERS, thread_name_prefix='notify')
+
+
+def recipients(announcement):
+    """The users ``announcement`` notifies."""
+    if announcement.is_global:
+        users = CustomUser.objects.filter(user_type='student')
+    elif announcement.course_id is not None:
+        users = CustomUser.objects.filter(courses_enrolled=announcement.course_id)
+    else:
+        return CustomUser.objects.none()
+    return users.filter(is_active=True).exclude(pk=announcement.author_id)
+
+
+def fan_out(announcement, chunk_size=None):
+    """Create the notifications for ``announcement`` and return how many were created."""
+    chunk_size = chunk_size or settings.NOTIFICATION_CHUNK_SIZE
+    user_ids = recipients(announcement).order_by('pk').values_list('pk', flat=True)
+    total, last = 0, 0
+    while True:
+        # Keyset chunks: never more than one chunk of ids in memory
+        chunk = list(user_ids.filter(pk__gt=last)[:chunk_size])
+        if not chunk:
+            return total
+        with transaction.atomic():
+            Notification.objects.bulk_create(
+                [Notification(recipient_id=pk, announcement_id=announcement.pk) for pk in chunk], batch_size=chunk_size
+            )
+            NotificationInbox.objects.bulk_create([NotificationInbox(user_id=pk) for pk in chunk], ignore_conflicts=True)
+            NotificationInbox.objects.filter(user_id__in=chunk).update(unread_count=F('unread_count') + 1)
+        total += len(chunk)
+        last = chunk[-1]
+
+
+def publish(announcement):
+    """Fan ``announcement`` out now, or on the worker when it reaches many users."""
+    if recipients(announcement).count() > settings.NOTIFICATION_INLINE_LIMIT:
+        _executor.submit(_fan_out_job, announcement.pk)
+    else:
+        fan_out(announcement)
+
+
+def _fan_out_job(announcement_id):
+    try:
+        announcement = Announcement.objects.filter(pk=announcement_id).first()
+        # Deleted before the worker got to it
+        if announcement is not None:
+            fan_out(announcement)
+    except Exception:
+        logger.exception('Could not fan out notifications for announcement %s', announcement_id)
+    finally:
+        close_old_connections()
+
+
+def mark_notifications_read(user, ids=None):
+    """Mark ``user``'s unread notifications (all, or those in ``ids``) read; returns how many."""
+    unread = Notification.objects.filter(recipient=user, is_read=False)
+    if ids is not None:
+        unread = unread.filter(pk__in=ids)
+    with transaction.atomic():
+        # Counts only rows this call flipped, so concurrent calls never decrement twice
+        updated = unread.update(is_read=True)
+        if updated:
+            NotificationInbox.objects.filter(pk=user.pk).update(unread_count=Greatest(F('unread_count') - updated, 0))
+    return updated
+
+
+def withdraw_notifications(announcement_ids):
+    """Mark the unread notifications of ``announcement_ids`` read and take them off the counters.
+
+    Call before the announcements are deleted; calling it again changes nothing.
+    """
+    # Including those of soft-deleted courses, which the default manager hides
+    unread = Notification._base_manager.filter(announcement_id__in=announcement_ids, is_read=False)
+    with transaction.atomic():
+        by_count = {}
+        for user_id, count in unread.order_by().values('recipient_id').annotate(n=Count('*')).values_list('recipient_id', 'n'):
+            by_count.setdefault(count, []).append(user_id)
+        unread.update(is_read=True)
+        for count, user_ids in by_count.items():
+            for start in range(0, len(user_ids), settings.NOTIFICATION_CHUNK_SIZE):
+                NotificationInbox.objects.filter(user_id__in=user_ids[start:start + settings.NOTIFICATION_CHUNK_SIZE]).update(
+                    unread_count=Greatest(F('unread_count') - count, 0)
+                )
+
+
+def unread_notifications(user):
+    return NotificationInbox.objects.filter(pk=user.pk).values_list('unread_count', flat=True).first() or 0
@@ -0,0 +1,149 @@
+"""Removes soft-deleted courses and users (``app.softdelete``) for real.
+
+A course or user sits at the root of a large cascade: units, resources,
+assignments, submissions, announcements, notifications, exams with their
+questions and choices, attempts, projects and the uploaded files. Deleting
+one in a single ``delete()`` holds one transaction open across all of it.
+The purge walks the same CASCADE relations children first instead, and
+deletes ``PURGE_BATCH_SIZE`` rows per transaction, pausing
+``PURGE_BATCH_PAUSE`` seconds between batches so other writers get the
+database in between. By the time a row is deleted its children are gone, so
+Django's own cascading ``delete()`` of the row only finds what was added
+meanwhile. Files of deleted rows are unlinked after their batch commits, at
+most ``PURGE_FILES_PER_SECOND`` per second.
+
+Every soft delete queues a purge on a background thread once its transaction
+commits. ``manage.py purge_deleted`` does the same in the foreground, e.g.
+after a restart interrupted a purge. Purging is idempotent: whatever a failed
+or interrupted run left behind, the next run removes.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, models, transaction
+
+from .models import Course, CustomUser
+
+logger = logging.getLogger(__name__)
+
+# Courses first: deleting a user cascades to the courses they teach
+PURGED_MODELS = (Course, CustomUser)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='purge')
+_lock = threading.Lock()
+_queued = False
+# One purge per process at a time
+_running = threading.Lock()
+# Seconds to wait before retrying a background purge that hit a locked database
+RETRY_DELAYS = (1, 5, 30)
+
+
+class FileUnlinker:
+    """Deletes stored files, no more than ``per_second`` per second."""
+
+    def __init__(self, per_second):
+        self.interval = 1 / per_second
+        self.next_at = time.monotonic()
+        self.unlinked = 0
+
+    def unlink(self, files):
+        for storage, name in files:
+            delay = self.next_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                storage.delete(name)
+                self.unlinked += 1
+            except OSError:
+                logger.warning('Could not delete file %s', name, exc_info=True)
+            self.next_at = max(self.next_at, time.monotonic()) + self.interval
+
+
+@lru_cache(maxsize=None)
+def _cascades(model):
+    """The relations whose rows are deleted along with ``model``'s, enrollment tables included."""
+    return tuple(
+        relation for relation in model._meta.get_fields(include_hidden=True)
+        if (relation.one_to_many or relation.one_to_one) and relation.auto_created and not relation.concrete
+        and relation.on_delete is models.CASCADE
+    )
+
+
+@lru_cache(maxsize=None)
+def _file_fields(model):
+    return tuple(f for f in model._meta.concrete_fields if isinstance(f, models.FileField))
+
+
+def _purge(queryset, batch_size, pause, unlinker):
+    """Delete ``queryset``'s rows and their cascade, children first; returns rows deleted."""
+    model = queryset.model
+    pks = queryset.order_by('pk').values_list('pk', flat=True)
+    file_fields = _file_fields(model)
+    total = 0
+    while True:
+        # Deleted rows drop out, so the first rows are always the next batch
+        chunk = list(pks[:batch_size])
+        if not chunk:
+            return total
+        for relation in _cascades(model):
+            children = relation.related_model._base_manager.filter(**{f'{relation.field.name}__in': chunk})
+            total += _purge(children, batch_size, pause, unlinker)
+        files = []
+        if file_fields:
+            for names in model._base_manager.filter(pk__in=chunk).values_list(*(f.attname for f in file_fields)):
+                files.extend((f.storage, name) for f, name in zip(file_fields, names) if name)
+        with transaction.atomic():
+            deleted, _ = model._base_manager.filter(pk__in=chunk).delete()
+        total += deleted
+        unlinker.unlink(files)
+        time.sleep(pause)
+
+
+def purge_deleted(batch_size=None, files_per_second=None, pause=None):
+    """Delete every soft-deleted course and user with their cascade; returns ``(rows, files)`` deleted."""
+    batch_size = batch_size or settings.PURGE_BATCH_SIZE
+    pause = settings.PURGE_BATCH_PAUSE if pause is None else pause
+    unlinker = FileUnlinker(files_per_second or settings.PURGE_FILES_PER_SECOND)
+    total = 0
+    with _running:
+        for model in PURGED_MODELS:
+            total += _purge(model.all_objects.filter(deleted_at__isnull=False), batch_size, pause, unlinker)
+    return total, unlinker.unlinked
+
+
+def schedule_purge():
+    """Run ``purge_deleted`` on the background thread, unless a run is already waiting."""
+    global _queued
+    with _lock:
+        if _queued:
+            return
+        _queued = True
+    _executor.submit(_purge_job)
+
+
+def _purge_job():
+    global _queued
+    with _lock:
+        # Deletes from here on need another run
+        _queued = False
+    try:
+        for delay in (*RETRY_DELAYS, None):
+            try:
+                rows, files = purge_deleted()
+                break
+            except OperationalError:
+                # SQLite fails a write at once when another connection holds the lock
+                if delay is None:
+                    raise
+                logger.warning('Purge of soft-deleted rows failed, retrying in %ss', delay, exc_info=True)
+                time.sleep(delay)
+        if rows:
+            logger.info('Purged %s rows and %s files', rows, files)
+    except Exception:
+        logger.exception('Purge of soft-deleted rows failed')
+    finally:
+        close_old_connections()
@@ -0,0 +1,78 @@
+"""orjson-backed JSON renderer and parser.
+
+Drop-in replacements for DRF's ``JSONRenderer`` / ``JSONParser`` that produce
+byte-identical output for the API's payloads: UTC datetimes end in ``Z``,
+decimals and anything else orjson does not know natively go through DRF's own
+``JSONEncoder``, and U+2028/U+2029 are escaped the same way.
+
+Both classes fall back to the stdlib implementation when orjson is not
+installed, when indented output is requested (the browsable API) and for
+values orjson rejects, such as integers wider than 64 bits. Two differences
+are left, both for floats:
+
+* exponents carry no ``+`` or zero padding (``1e20`` and ``1e-7`` where the
+  stdlib writes ``1e+20`` and ``1e-07``), which parse to the same numbers;
+* NaN and the infinities are written as ``null``, where DRF's strict
+  renderer raises ``ValueError``. Finding them would mean walking every
+  payload, which costs several times the rendering itself, so views must not
+  return them (``app.exams.item_analysis`` turns them into ``None``).
+"""
+import codecs
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without orjson
+    orjson = None
+
+_ORJSON_OPTIONS = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+
+def _default(obj, _encoder=encoders.JSONEncoder()):
+    # Decimal, lazy strings, querysets, timedeltas, ...: exactly what DRF does.
+    return _encoder.default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if not self._orjson_compatible(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_default, option=_ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+    def _orjson_compatible(self, accepted_media_type, renderer_context):
+        # orjson only writes compact, UTF-8, unindented JSON with its own encoder
+        return (
+            orjson is not None
+            and self.encoder_class is encoders.JSONEncoder
+            and self.compact
+            and not self.ensure_ascii
+            and not self.get_indent(accepted_media_type or '', renderer_context or {})
+        )
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,155 @@
+"""Full-text search over courses, resources, announcements and discussions.
+
+Searchable rows are mirrored into ``SearchEntry`` by ``app.signals``. The
+full-text index over it is an external-content FTS5 table on SQLite and a
+generated ``tsvector`` column with a GIN index on PostgreSQL (both created by
+migration 0011). Other backends fall back to ``icontains``.
+
+Results are ranked (bm25 / ts_rank) and limited to what the caller can see:
+entries of courses they are enrolled in or teach, plus global announcements
+(whether or not attached to a course) and announcements they wrote, as in
+``AnnouncementViewSet``. Admins see everything.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Announcement, Course, DiscussionMessage, Resource, SearchEntry
+
+KIND_BY_MODEL = {
+    Course: 'course',
+    Resource: 'resource',
+    Announcement: 'announcement',
+    DiscussionMessage: 'discussion',
+}
+
+MAX_RESULTS = 50
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def entry_fields(instance):
+    """The ``SearchEntry`` fields mirroring ``instance``."""
+    if isinstance(instance, Course):
+        return {'course_id': instance.id, 'title': instance.title, 'body': instance.description}
+    if isinstance(instance, Resource):
+        return {'course_id': instance.course_id, 'title': instance.title, 'body': instance.content or ''}
+    if isinstance(instance, Announcement):
+        return {'course_id': instance.course_id, 'is_global': instance.is_global, 'title': instance.title, 'body': instance.content}
+    return {'course_id': instance.course_id, 'title': '', 'body': instance.content}
+
+
+def index_object(instance):
+    SearchEntry.objects.update_or_create(
+        kind=KIND_BY_MODEL[type(instance)], object_id=instance.pk, defaults=entry_fields(instance)
+    )
+
+
+def unindex_object(instance):
+    SearchEntry.objects.filter(kind=KIND_BY_MODEL[type(instance)], object_id=instance.pk).delete()
+
+
+def rebuild_index(batch_size=2000):
+    """Drop and re-create every ``SearchEntry``. Returns the number indexed."""
+    SearchEntry.objects.all().delete()
+    total = 0
+    for model, kind in KIND_BY_MODEL.items():
+        batch = []
+        for instance in model.objects.iterator(chunk_size=batch_size):
+            batch.append(SearchEntry(kind=kind, object_id=instance.pk, **entry_fields(instance)))
+            if len(batch) >= batch_size:
+                SearchEntry.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        SearchEntry.objects.bulk_create(batch)
+        total += len(batch)
+    return total
+
+
+def _visibility_sql(user):
+    """SQL restricting ``e`` (app_searchentry) to rows ``user`` may see, and its params."""
+    if user.user_type == 'admin' or user.is_staff:
+        return '1 = 1', []
+    enrollments = Course.students.through._meta.db_table
+    courses = Course._meta.db_table
+    announcements = Announcement._meta.db_table
+    sql = (
+        '(e.is_global'
+        f' OR e.course_id IN (SELECT course_id FROM {enrollments} WHERE customuser_id = %s)'
+        f' OR e.course_id IN (SELECT id FROM {courses} WHERE teacher_id = %s)'
+        f" OR (e.kind = 'announcement' AND e.object_id IN (SELECT id FROM {announcements} WHERE author_id = %s)))"
+    )
+    return sql, [user.id, user.id, user.id]
+
+
+def _fts5_query(text):
+    # Quote every word so user input can never be parsed as FTS5 syntax; the
+    # last word is a prefix match so results follow the user while typing.
+    words = _WORD.findall(text)
+    if not words:
+        return None
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def search(user, text, kinds=None, limit=20):
+    """Ranked search results visible to ``user``, best first."""
+    limit = max(1, min(limit, MAX_RESULTS))
+    visibility, params = _visibility_sql(user)
+    kind_sql = ''
+    if kinds:
+        kind_sql = f" AND e.kind IN ({', '.join(['%s'] * len(kinds))})"
+        params = params + list(kinds)
+
+    vendor = connection.vendor
+    if vendor == 'sqlite':
+        match = _fts5_query(text)
+        if match is None:
+            return []
+        sql = (
+            "SELECT e.kind, e.object_id, e.course_id, e.title,"
+            " snippet(app_searchentry_fts, 1, '[', ']', '...', 16), bm25(app_searchentry_fts, 4.0, 1.0) AS rank"
+            " FROM app_searchentry_fts JOIN app_searchentry e ON e.id = app_searchentry_fts.rowid"
+            f" WHERE app_searchentry_fts MATCH %s AND {visibility}{kind_sql}"
+            " ORDER BY rank LIMIT %s"
+        )
+        params = [match] + params + [limit]
+    elif vendor == 'postgresql':
+        if not text.strip():
+            return []
+        sql = (
+            "SELECT e.kind, e.object_id, e.course_id, e.title,"
+            " ts_headline('english', e.body, q, 'StartSel=[,StopSel=],MaxWords=16,MinWords=5'),"
+            " -ts_rank(e.search_vector, q) AS rank"
+            " FROM app_searchentry e, websearch_to_tsquery('english', %s) q"
+            f" WHERE e.search_vector @@ q AND {visibility}{kind_sql}"
+            " ORDER BY rank LIMIT %s"
+        )
+        params = [text] + params + [limit]
+    else:
+        return _search_fallback(user, text, kinds, limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    return [
+        {'kind': kind, 'id': object_id, 'course': course_id, 'title': title, 'snippet': snippet, 'rank': round(-rank, 6)}
+        for kind, object_id, course_id, title, snippet, rank in rows
+    ]
+
+
+def _search_fallback(user, text, kinds, limit):
+    entries = SearchEntry.objects.filter(Q(title__icontains=text) | Q(body__icontains=text))
+    if not (user.user_type == 'admin' or user.is_staff):
+        entries = entries.filter(
+            Q(is_global=True) | Q(course__students=user) | Q(course__teacher=user)
+            | Q(kind='announcement', object_id__in=Announcement.objects.filter(author=user).values('id'))
+        ).distinct()
+    if kinds:
+        entries = entries.filter(kind__in=kinds)
+    return [
+        {'kind': e.kind, 'id': e.object_id, 'course': e.course_id, 'title': e.title, 'snippet': e.body[:120], 'rank': None}
+        for e in entries[:limit]
+    ]
@@ -1,6 +1,9 @@
 from rest_framework import serializers
-from .models import CustomUser, Course, Assignment, Message, Submission, Project, ProjectMilestone, ProjectFile, Announcement, Exam, Question, Choice, ExamSubmission
+from .models import CustomUser, Course, Unit, Resource, Assignment, Message, Submission, Project, ProjectMilestone, ProjectFile, Announcement, Notification, Exam, Question, Choice, ExamSubmission, ExamAttempt, DiscussionMessage
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from django.utils import timezone
+from .exams import grade_responses
+from .fieldsets import DynamicFieldsMixin
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     def validate(self, attrs):
@@ -13,21 +16,12 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         })
         return data
 
-class CustomUserSerializer(serializers.ModelSerializer):
-    courses_enrolled_count = serializers.SerializerMethodField()
-    courses_taught_count = serializers.SerializerMethodField()
-    
+class CustomUserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = CustomUser
         fields = ['id', 'username', 'email', 'password', 'user_type', 'is_active', 'date_joined', 'last_login', 'courses_enrolled_count', 'courses_taught_count']
         extra_kwargs = {'password': {'write_only': True, 'required': False}}
 
-    def get_courses_enrolled_count(self, obj):
-        return obj.courses_enrolled.count() if hasattr(obj, 'courses_enrolled') else 0
-
-    def get_courses_taught_count(self, obj):
-        return obj.courses_taught.count() if hasattr(obj, 'courses_taught') else 0
-
     def create(self, validated_data):
         user = CustomUser.objects.create_user(
             username=validated_data['username'],
@@ -46,19 +40,16 @@ class CustomUserSerializer(serializers.ModelSerializer):
         instance.save()
         return instance
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     teacher = CustomUserSerializer(read_only=True)
     teacher_id = serializers.IntegerField(write_only=True, required=False)
     students = CustomUserSerializer(many=True, read_only=True)
-    students_count = serializers.SerializerMethodField()
+    expandable_fields = ('teacher', 'students')
 
     class Meta:
         model = Course
         fields = ['id', 'title', 'description', 'teacher', 'teacher_id', 'students', 'students_count']
 
-    def get_students_count(self, obj):
-        return obj.students.count()
-
     def create(self, validated_data):
         teacher_id = validated_data.pop('teacher_id', None)
         course = Course.objects.create(**validated_data)
@@ -76,13 +67,24 @@ class CourseSerializer(serializers.ModelSerializer):
         instance.save()
         return instance
 
-class AssignmentSerializer(serializers.ModelSerializer):
+class UnitSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Unit
+        fields = ['id', 'course', 'title', 'order']
+
+class ResourceSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Resource
+        fields = ['id', 'course', 'unit', 'title', 'type', 'file', 'url', 'content', 'created_at']
+        read_only_fields = ['created_at']
+
+class AssignmentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Assignment
         fields = ['id', 'course', 'title', 'description', 'due_date', 'file', 'created_at']
         read_only_fields = ['created_at']
 
-class MessageSerializer(serializers.ModelSerializer):
+class MessageSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     sender_name = serializers.CharField(source='sender.username', read_only=True)
     receiver_name = serializers.CharField(source='receiver.username', read_only=True)
 
@@ -91,7 +93,7 @@ class MessageSerializer(serializers.ModelSerializer):
         fields = ['id', 'sender', 'sender_name', 'receiver', 'receiver_name', 'content', 'timestamp', 'is_read']
         read_only_fields = ['sender', 'timestamp', 'is_read']
 
-class SubmissionSerializer(serializers.ModelSerializer):
+class SubmissionSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     student_name = serializers.CharField(source='student.username', read_only=True)
     assignment_title = serializers.CharField(source='assignment.title', read_only=True)
 
@@ -100,12 +102,18 @@ class SubmissionSerializer(serializers.ModelSerializer):
         fields = ['id', 'assignment', 'assignment_title', 'student', 'student_name', 'file', 'submitted_at', 'grade', 'feedback']
         read_only_fields = ['student', 'submitted_at', 'student_name', 'assignment_title']
 
-class ProjectMilestoneSerializer(serializers.ModelSerializer):
+class BulkGradeEntrySerializer(serializers.Serializer):
+    # One entry of a bulk grade request; feedback is left unchanged when omitted
+    id = serializers.IntegerField()
+    grade = serializers.CharField(max_length=10, allow_null=True, allow_blank=True)
+    feedback = serializers.CharField(allow_null=True, allow_blank=True, required=False, trim_whitespace=False)
+
+class ProjectMilestoneSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = ProjectMilestone
         fields = ['id', 'project', 'title', 'date', 'status', 'description']
 
-class ProjectFileSerializer(serializers.ModelSerializer):
+class ProjectFileSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     uploader_name = serializers.CharField(source='uploader.username', read_only=True)
 
     class Meta:
@@ -113,18 +121,33 @@ class ProjectFileSerializer(serializers.ModelSerializer):
         fields = ['id', 'project', 'uploader', 'uploader_name', 'file', 'created_at']
         read_only_fields = ['uploader', 'created_at']
 
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     student_name = serializers.CharField(source='student.username', read_only=True)
     course_title = serializers.CharField(source='course.title', read_only=True)
     milestones = ProjectMilestoneSerializer(many=True, read_only=True)
     files = ProjectFileSerializer(many=True, read_only=True)
+    expandable_fields = ('milestones', 'files')
 
     class Meta:
         model = Project
         fields = ['id', 'title', 'description', 'student', 'student_name', 'course', 'course_title', 'status', 'deadline', 'grade', 'feedback', 'created_at', 'milestones', 'files']
         read_only_fields = ['created_at', 'student_name', 'course_title']
 
-class AnnouncementSerializer(serializers.ModelSerializer):
+class ProjectTimelineSerializer(ProjectSerializer):
+    # Compact ?view=timeline form: milestone counts per status (annotated by
+    # ProjectViewSet) instead of the nested milestone and file lists
+    milestone_counts = serializers.SerializerMethodField()
+    expandable_fields = ()
+
+    class Meta(ProjectSerializer.Meta):
+        fields = [f for f in ProjectSerializer.Meta.fields if f not in ('milestones', 'files')] + ['milestone_counts']
+
+    def get_milestone_counts(self, obj):
+        counts = {status: getattr(obj, f'milestones_{status}') for status in ProjectMilestone.STATUSES}
+        counts['total'] = obj.milestones_total
+        return counts
+
+class AnnouncementSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     author_name = serializers.CharField(source='author.username', read_only=True)
     author_type = serializers.CharField(source='author.user_type', read_only=True)
     course_title = serializers.CharField(source='course.title', read_only=True, allow_null=True)
@@ -134,33 +157,95 @@ class AnnouncementSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'content', 'author', 'author_name', 'author_type', 'course', 'course_title', 'is_global', 'priority', 'created_at']
         read_only_fields = ['created_at', 'author_name', 'author_type', 'course_title']
 
-class ChoiceSerializer(serializers.ModelSerializer):
+class NotificationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    announcement_title = serializers.CharField(source='announcement.title', read_only=True)
+    course = serializers.IntegerField(source='announcement.course_id', read_only=True, allow_null=True)
+
+    class Meta:
+        model = Notification
+        fields = ['id', 'announcement', 'announcement_title', 'course', 'is_read', 'created_at']
+        read_only_fields = fields
+
+class DiscussionMessageSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    user_name = serializers.CharField(source='user.username', read_only=True)
+
+    class Meta:
+        model = DiscussionMessage
+        fields = ['id', 'course', 'user', 'user_name', 'content', 'created_at']
+        read_only_fields = ['user', 'user_name', 'created_at']
+
+class ChoiceSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Choice
         fields = ['id', 'text', 'is_correct']
 
-class QuestionSerializer(serializers.ModelSerializer):
+class QuestionSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     choices = ChoiceSerializer(many=True)
+    expandable_fields = ('choices',)
 
     class Meta:
         model = Question
         fields = ['id', 'text', 'marks', 'question_type', 'choices']
 
-class ExamSerializer(serializers.ModelSerializer):
+class ExamSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     questions = QuestionSerializer(many=True, read_only=True)
     created_by_name = serializers.CharField(source='created_by.username', read_only=True)
     course_title = serializers.CharField(source='course.title', read_only=True, allow_null=True)
+    expandable_fields = ('questions',)
 
     class Meta:
         model = Exam
         fields = ['id', 'title', 'description', 'course', 'course_title', 'created_by', 'created_by_name', 'duration_minutes', 'total_marks', 'created_at', 'questions']
         read_only_fields = ['created_at', 'created_by', 'created_by_name', 'course_title']
 
-class ExamSubmissionSerializer(serializers.ModelSerializer):
+class StudentChoiceSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Choice
+        fields = ['id', 'text']
+
+class StudentQuestionSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    choices = StudentChoiceSerializer(many=True, read_only=True)
+    expandable_fields = ('choices',)
+
+    class Meta:
+        model = Question
+        fields = ['id', 'text', 'marks', 'question_type', 'choices']
+
+class StudentExamSerializer(ExamSerializer):
+    # Same payload as ExamSerializer with the correct answers left out
+    questions = StudentQuestionSerializer(many=True, read_only=True)
+
+class ExamSubmissionSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     student_name = serializers.CharField(source='student.username', read_only=True)
     exam_title = serializers.CharField(source='exam.title', read_only=True)
+    responses = serializers.ListField(child=serializers.IntegerField(), required=False)
 
     class Meta:
         model = ExamSubmission
-        fields = ['id', 'exam', 'exam_title', 'student', 'student_name', 'score', 'submitted_at']
-        read_only_fields = ['student', 'submitted_at', 'student_name', 'exam_title']
+        fields = ['id', 'exam', 'exam_title', 'student', 'student_name', 'score', 'responses', 'submitted_at']
+        read_only_fields = ['student', 'score', 'submitted_at', 'student_name', 'exam_title']
+
+    def validate(self, attrs):
+        # The score is only ever computed server-side, from the chosen answers
+        if 'responses' in attrs:
+            exam = attrs.get('exam') or self.instance.exam
+            try:
+                attrs['score'], attrs['responses'] = grade_responses(exam, attrs['responses'])
+            except ValueError as exc:
+                raise serializers.ValidationError({'responses': str(exc)})
+        return attrs
+
+class ExamAttemptSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    exam_title = serializers.CharField(source='exam.title', read_only=True)
+    seconds_remaining = serializers.SerializerMethodField()
+    field_requirements = {'seconds_remaining': ('status', 'deadline')}
+
+    class Meta:
+        model = ExamAttempt
+        fields = ['id', 'exam', 'exam_title', 'student', 'started_at', 'deadline', 'seconds_remaining', 'status', 'answers', 'saved_at', 'submission']
+        read_only_fields = fields
+
+    def get_seconds_remaining(self, obj):
+        if obj.status != 'in_progress':
+            return 0
+        return max(0, int((obj.deadline - timezone.now()).total_seconds()))
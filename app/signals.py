@@ -0,0 +1,271 @@
+from django.db import transaction
+from django.db.models import CharField, F, Value
+from django.db.models.functions import Cast, Concat
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_users
+from .caching import bump_cache_version, bump_versions
+from .counters import refresh_course_counters, refresh_user_counters
+from .notifications import publish, withdraw_notifications
+from .purge import schedule_purge
+from .models import Announcement, Assignment, Choice, Course, CustomUser, Exam, Question, Resource, SearchEntry, Unit
+from .search import KIND_BY_MODEL, index_object, unindex_object
+from .softdelete import soft_deleted
+from .sync import AUDIENCE_FIELDS, SYNC_MODELS, audiences, record_changes, record_embedded_changes, record_scope_changes
+
+# Models whose ModelVersion counter validates cached/conditional API responses.
+VERSIONED_MODELS = (Course, CustomUser, Assignment, Announcement)
+
+
+def model_changed(sender, **kwargs):
+    bump_versions(sender)
+
+
+for _model in VERSIONED_MODELS:
+    post_save.connect(model_changed, sender=_model, dispatch_uid=f'version-save-{_model.__name__}')
+    post_delete.connect(model_changed, sender=_model, dispatch_uid=f'version-delete-{_model.__name__}')
+
+
+@receiver(m2m_changed, sender=Course.students.through, dispatch_uid='enrollment-changed')
+def enrollment_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        # pk_set is not provided for clears; remember who is being removed
+        related = instance.courses_enrolled if reverse else instance.students
+        instance._cleared_pks = set(related.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    bump_versions(Course, CustomUser)
+
+    pks = instance._cleared_pks if action == 'post_clear' else (pk_set or set())
+    if reverse:
+        record_changes(Course, pks)
+        record_scope_changes([instance.pk])
+        refresh_course_counters(pks)
+        refresh_user_counters([instance.pk])
+    else:
+        record_changes(Course, [instance.pk])
+        record_scope_changes(pks)
+        refresh_course_counters([instance.pk])
+        refresh_user_counters(pks)
+
+
+# Enrollment counters (app.counters). Deletes remove enrollment rows without
+# m2m_changed, so the other side is remembered before and refreshed after.
+
+@receiver(post_save, sender=Course, dispatch_uid='counters-course-saved')
+def course_teacher_changed(sender, instance, created, **kwargs):
+    old = getattr(instance, '_resync_old', None)
+    if created or old is None:
+        refresh_user_counters([instance.teacher_id])
+    elif old['teacher_id'] != instance.teacher_id:
+        refresh_user_counters([old['teacher_id'], instance.teacher_id])
+
+
+@receiver(pre_delete, sender=Course, dispatch_uid='counters-course-deleting')
+def remember_course_members(sender, instance, **kwargs):
+    instance._member_pks = {instance.teacher_id, *instance.students.values_list('pk', flat=True)}
+
+
+@receiver(post_delete, sender=Course, dispatch_uid='counters-course-deleted')
+def course_deleted(sender, instance, **kwargs):
+    refresh_user_counters(getattr(instance, '_member_pks', [instance.teacher_id]))
+
+
+@receiver(pre_delete, sender=CustomUser, dispatch_uid='counters-user-deleting')
+def remember_user_courses(sender, instance, **kwargs):
+    instance._enrolled_pks = set(instance.courses_enrolled.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=CustomUser, dispatch_uid='counters-user-deleted')
+def user_deleted(sender, instance, **kwargs):
+    refresh_course_counters(getattr(instance, '_enrolled_pks', ()))
+
+
+@receiver(post_save, sender=CustomUser, dispatch_uid='auth-user-saved')
+@receiver(post_delete, sender=CustomUser, dispatch_uid='auth-user-deleted')
+def user_auth_changed(sender, instance, **kwargs):
+    # Covers deactivation and password changes; after commit, so no process reloads the old row
+    pk = instance.pk
+    transaction.on_commit(lambda: invalidate_users(pk))
+
+
+# Cached course content trees (see course_content_payload in app.views)
+
+@receiver(post_save, sender=Unit, dispatch_uid='content-unit-saved')
+@receiver(post_delete, sender=Unit, dispatch_uid='content-unit-deleted')
+@receiver(post_save, sender=Resource, dispatch_uid='content-resource-saved')
+@receiver(post_delete, sender=Resource, dispatch_uid='content-resource-deleted')
+def course_content_changed(sender, instance, **kwargs):
+    key = f'course-content-version:{instance.course_id}'
+    bump_cache_version(key)
+    # Again after commit, in case the tree was rebuilt from the old rows meanwhile
+    transaction.on_commit(lambda: bump_cache_version(key))
+
+
+# Delta sync change log
+
+def remember_audience(sender, instance, **kwargs):
+    # Who could see the row before, so they hear about it if they no longer can
+    if instance.pk:
+        instance._sync_audience = audiences(sender, [instance.pk])
+
+
+def synced_model_saved(sender, instance, **kwargs):
+    record_changes(sender, [instance.pk], previous=getattr(instance, '_sync_audience', None))
+
+
+def synced_model_deleted(sender, instance, **kwargs):
+    record_changes(sender, [instance.pk], action='delete', previous=getattr(instance, '_sync_audience', None))
+
+
+for _model in SYNC_MODELS.values():
+    post_save.connect(synced_model_saved, sender=_model, dispatch_uid=f'sync-save-{_model.__name__}')
+    post_delete.connect(synced_model_deleted, sender=_model, dispatch_uid=f'sync-delete-{_model.__name__}')
+    if _model in AUDIENCE_FIELDS:
+        pre_save.connect(remember_audience, sender=_model, dispatch_uid=f'sync-audience-save-{_model.__name__}')
+        pre_delete.connect(remember_audience, sender=_model, dispatch_uid=f'sync-audience-delete-{_model.__name__}')
+
+
+# Fields embedded in other models' payloads (course_title, assignment_title,
+# *_name), the course teacher, which decides who can see course content, and
+# the user type, which decides what a user can see.
+RESYNC_FIELDS = {
+    Course: ('title', 'teacher_id'),
+    Assignment: ('title',),
+    CustomUser: ('username', 'user_type'),
+}
+
+
+def remember_resync_fields(sender, instance, **kwargs):
+    if instance.pk:
+        instance._resync_old = sender.objects.filter(pk=instance.pk).values(*RESYNC_FIELDS[sender]).first()
+
+
+def check_resync_fields(sender, instance, created, **kwargs):
+    old = getattr(instance, '_resync_old', None)
+    if created or not old:
+        return
+    changed = [f for f in RESYNC_FIELDS[sender] if old[f] != getattr(instance, f)]
+    if 'teacher_id' in changed:
+        record_scope_changes([old['teacher_id'], instance.teacher_id])
+    if 'user_type' in changed:
+        record_scope_changes([instance.pk])
+    record_embedded_changes(sender, instance.pk, changed)
+
+
+for _model in RESYNC_FIELDS:
+    pre_save.connect(remember_resync_fields, sender=_model, dispatch_uid=f'resync-pre-{_model.__name__}')
+    post_save.connect(check_resync_fields, sender=_model, dispatch_uid=f'resync-post-{_model.__name__}')
+
+
+# Exam.content_version keys the cached student exam payload, so it must move
+# whenever anything rendered into that payload changes.
+
+def bump_exam_version(**filters):
+    exam_ids = list(Exam.objects.filter(**filters).values_list('id', flat=True))
+    Exam.objects.filter(id__in=exam_ids).update(content_version=F('content_version') + 1)
+    record_changes(Exam, exam_ids)
+
+
+@receiver(post_save, sender=Exam, dispatch_uid='exam-version-exam')
+def exam_changed(sender, instance, created, **kwargs):
+    # In the database: save() never writes content_version, so a stale
+    # instance cannot hand out a version another change already used
+    if not created:
+        Exam.objects.filter(pk=instance.pk).update(content_version=F('content_version') + 1)
+
+
+@receiver(post_save, sender=Question, dispatch_uid='exam-version-question-save')
+@receiver(post_delete, sender=Question, dispatch_uid='exam-version-question-delete')
+def question_changed(sender, instance, **kwargs):
+    bump_exam_version(pk=instance.exam_id)
+
+
+@receiver(post_save, sender=Choice, dispatch_uid='exam-version-choice-save')
+@receiver(post_delete, sender=Choice, dispatch_uid='exam-version-choice-delete')
+def choice_changed(sender, instance, **kwargs):
+    bump_exam_version(questions__id=instance.question_id)
+
+
+def embedded_field_changed(instance, field):
+    # The value before the save, remembered by remember_resync_fields
+    old = getattr(instance, '_resync_old', None)
+    return old is not None and old[field] != getattr(instance, field)
+
+
+@receiver(post_save, sender=Course, dispatch_uid='exam-version-course')
+def course_changed(sender, instance, created, **kwargs):
+    # Only course_title is rendered into the payload
+    if not created and embedded_field_changed(instance, 'title'):
+        bump_exam_version(course=instance)
+
+
+@receiver(post_save, sender=CustomUser, dispatch_uid='exam-version-user')
+def user_changed(sender, instance, created, **kwargs):
+    # Only created_by_name is rendered into the payload
+    if not created and instance.user_type != 'student' and embedded_field_changed(instance, 'username'):
+        bump_exam_version(created_by=instance)
+
+
+def searchable_saved(sender, instance, **kwargs):
+    index_object(instance)
+
+
+def searchable_deleted(sender, instance, **kwargs):
+    unindex_object(instance)
+
+
+for _model in KIND_BY_MODEL:
+    post_save.connect(searchable_saved, sender=_model, dispatch_uid=f'search-save-{_model.__name__}')
+    post_delete.connect(searchable_deleted, sender=_model, dispatch_uid=f'search-delete-{_model.__name__}')
+
+
+# Announcement notifications (app.notifications)
+
+@receiver(post_save, sender=Announcement, dispatch_uid='notify-announcement-saved')
+def announcement_published(sender, instance, created, **kwargs):
+    if created:
+        # Workers must see the announcement, and a rolled back one notifies nobody
+        transaction.on_commit(lambda: publish(instance))
+
+
+@receiver(pre_delete, sender=Announcement, dispatch_uid='notify-announcement-deleted')
+def announcement_withdrawn(sender, instance, **kwargs):
+    # Before the cascade removes the notifications the counters are derived from
+    withdraw_notifications([instance.pk])
+
+
+# Soft delete (app.softdelete): the rows stay until app.purge removes them, so
+# undo here what a delete would have done to everything that refers to them.
+
+@receiver(soft_deleted, sender=Course, dispatch_uid='soft-delete-course')
+def courses_soft_deleted(sender, pks, **kwargs):
+    enrollments = Course.students.through.objects.filter(course_id__in=pks)
+    members = {*enrollments.values_list('customuser_id', flat=True), *Course.all_objects.filter(pk__in=pks).values_list('teacher_id', flat=True)}
+    # The default manager already hides announcements of the deleted courses
+    withdraw_notifications(Announcement._base_manager.filter(course_id__in=pks).values('pk'))
+    SearchEntry.objects.filter(course_id__in=pks).delete()
+    refresh_user_counters(members)
+    # Their assignments and announcements drop out of the lists too
+    bump_versions(*VERSIONED_MODELS)
+    record_changes(Course, pks, action='delete')
+    record_scope_changes(members)
+    transaction.on_commit(schedule_purge)
+
+
+@receiver(soft_deleted, sender=CustomUser, dispatch_uid='soft-delete-user')
+def users_soft_deleted(sender, pks, **kwargs):
+    # Frees the username for new accounts; ':' is never valid in a real one
+    tombstone = Concat(Value('deleted:'), Cast('pk', CharField()))
+    CustomUser.all_objects.filter(pk__in=pks).update(username=tombstone, username_search=tombstone)
+    # As the CASCADE on Course.teacher would
+    Course.objects.filter(teacher_id__in=pks).delete()
+    enrolled = Course.students.through.objects.filter(customuser_id__in=pks).values_list('course_id', flat=True)
+    withdraw_notifications(Announcement._base_manager.filter(author_id__in=pks).values('pk'))
+    refresh_course_counters(set(enrolled))
+    bump_versions(CustomUser, Course)
+    record_scope_changes(pks)
+    transaction.on_commit(lambda: invalidate_users(*pks))
+    transaction.on_commit(schedule_purge)
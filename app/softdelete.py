@@ -0,0 +1,94 @@
+"""Soft delete for models whose hard delete cascades through large trees.
+
+Deleting a soft-deletable row (``instance.delete()``, ``queryset.delete()``,
+the admin, the API) only stamps ``deleted_at``, in one UPDATE.
+``soft_deleted`` is sent with the primary keys inside the same transaction,
+and ``app.signals`` undoes everything the row affected elsewhere: caches,
+sync, search, counters, notifications. ``objects`` and every related manager
+built on it exclude deleted rows; ``all_objects`` includes them. Models that
+belong to a course use ``LiveCourseManager``, which hides the rows of deleted
+courses the same way.
+
+The rows and everything that cascades from them are removed later by
+``app.purge``, in bounded chunks. ``hard_delete()`` removes rows right away
+through Django's usual cascading delete.
+"""
+from django.contrib.auth.models import UserManager
+from django.db import models, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+# Sent with sender=<model> and pks=<list of primary keys> after the UPDATE
+soft_deleted = Signal()
+
+
+def _soft_delete(model, pks):
+    """Stamp ``deleted_at`` on ``pks`` and send ``soft_deleted``; returns ``(count, deleted_at)``."""
+    now = timezone.now()
+    with transaction.atomic():
+        count = model.all_objects.filter(pk__in=pks, deleted_at__isnull=True).update(deleted_at=now)
+        soft_deleted.send(sender=model, pks=pks)
+    return count, now
+
+
+class SoftDeleteQuerySet(models.QuerySet):
+
+    def delete(self):
+        pks = list(self.filter(deleted_at__isnull=True).values_list('pk', flat=True))
+        if not pks:
+            return 0, {}
+        count, _ = _soft_delete(self.model, pks)
+        return count, {self.model._meta.label: count}
+
+    delete.alters_data = True
+
+    def hard_delete(self):
+        return super().delete()
+
+    hard_delete.alters_data = True
+
+
+class SoftDeleteManager(models.Manager.from_queryset(SoftDeleteQuerySet)):
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class SoftDeleteUserManager(UserManager.from_queryset(SoftDeleteQuerySet)):
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class LiveCourseManager(models.Manager):
+    """Default manager of rows that belong to a course: hides those of soft-deleted courses.
+
+    The model's ``course_lookup`` is the path to the course (``'course'``
+    unless set, e.g. ``'assignment__course'``). Rows without a course (a null
+    foreign key) are kept.
+    """
+
+    def get_queryset(self):
+        lookup = getattr(self.model, 'course_lookup', 'course')
+        return super().get_queryset().filter(**{f'{lookup}__deleted_at__isnull': True})
+
+
+class SoftDeleteModel(models.Model):
+    """Adds ``deleted_at``; subclasses declare ``objects`` (a soft delete manager) and ``all_objects``."""
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False, db_index=True)
+
+    class Meta:
+        abstract = True
+
+    def delete(self, using=None, keep_parents=False):
+        if self.deleted_at is not None:
+            return 0, {}
+        count, self.deleted_at = _soft_delete(type(self), [self.pk])
+        return count, {self._meta.label: count}
+
+    delete.alters_data = True
+
+    def hard_delete(self, using=None, keep_parents=False):
+        return super().delete(using, keep_parents)
+
+    hard_delete.alters_data = True
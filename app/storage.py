@@ -0,0 +1,28 @@
+"""collectstatic storage writing Brotli and gzip variants at maximum compression.
+
+Static files are compressed once per deploy and served many times, so
+compression time is no concern: Brotli runs at quality 11 with the largest
+window, gzip at level 9. WhiteNoise only keeps a variant that is at least 5%
+smaller than the original. Without the ``brotli`` package only gzip variants
+are written.
+"""
+from whitenoise.compress import Compressor
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class MaxCompressor(Compressor):
+
+    @staticmethod
+    def compress_brotli(data):
+        return brotli.compress(data, quality=11, lgwin=24)
+
+
+class PrecompressedManifestStaticFilesStorage(CompressedManifestStaticFilesStorage):
+
+    def create_compressor(self, **kwargs):
+        return MaxCompressor(**kwargs)
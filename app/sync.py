@@ -0,0 +1,205 @@
+"""Change log behind the delta sync endpoint (``/api/sync/``).
+
+``app.signals`` appends a ``ChangeLog`` row for every create, update and
+delete of the synced models. A client keeps the id of the last entry it has
+seen as an opaque token and asks only for what changed after it.
+
+Course membership changes are logged as ``scope`` entries for the affected
+user. A client whose scope changed gets a full resync, because rows it could
+not see before (or can no longer see) were not necessarily written. Renames
+that other payloads embed (course and assignment titles, usernames) log an
+upsert for every row embedding them; when there are more than a sync can
+carry, a ``scope`` entry for user 0 resyncs everybody instead.
+
+Entries of private rows (messages, submissions, projects, course
+announcements and exams) carry the row's ``audience`` before and after the
+change: the users and courses it was visible to. A client only hears about
+rows it could have seen, so ids of other users' rows never reach it.
+"""
+import base64
+
+from django.conf import settings
+
+from .models import Announcement, Assignment, ChangeLog, Course, CustomUser, Exam, Message, Project, Submission
+
+SYNC_MODELS = {
+    'courses': Course,
+    'assignments': Assignment,
+    'announcements': Announcement,
+    'messages': Message,
+    'submissions': Submission,
+    'projects': Project,
+    'exams': Exam,
+}
+
+MODEL_KEYS = {model._meta.model_name: key for key, model in SYNC_MODELS.items()}
+
+# Columns that decide who besides admins can see a row. Models left out are
+# visible to everybody.
+AUDIENCE_FIELDS = {
+    Message: ('sender_id', 'receiver_id'),
+    Submission: ('student_id', 'assignment__course__teacher_id'),
+    Project: ('student_id', 'course__teacher_id'),
+    Announcement: ('author_id', 'course_id', 'is_global'),
+    Exam: ('created_by_id', 'course_id'),
+}
+
+# Synced rows whose payload embeds a field of another row, as
+# {model: {field: [(synced model, lookup of the row embedded), ...]}}.
+EMBEDDED_FIELDS = {
+    Course: {
+        'title': [(Project, 'course'), (Announcement, 'course'), (Exam, 'course')],
+    },
+    Assignment: {
+        'title': [(Submission, 'assignment')],
+    },
+    CustomUser: {
+        'username': [
+            (Course, 'teacher'), (Message, 'sender'), (Message, 'receiver'), (Submission, 'student'),
+            (Project, 'student'), (Announcement, 'author'), (Exam, 'created_by'),
+        ],
+        'user_type': [(Announcement, 'author')],
+    },
+}
+
+
+def _audience(model, row):
+    if model is Announcement:
+        if row['is_global']:
+            return None
+        return {'users': [row['author_id']], 'courses': [row['course_id']] if row['course_id'] else []}
+    if model is Exam:
+        if row['course_id'] is None:
+            return None
+        return {'users': [row['created_by_id']], 'courses': [row['course_id']]}
+    return {'users': [row[field] for field in AUDIENCE_FIELDS[model] if row[field]], 'courses': []}
+
+
+def audiences(model, pks):
+    """``{pk: audience}`` for the rows of ``model`` in ``pks``; ``None`` means visible to everybody."""
+    if model not in AUDIENCE_FIELDS:
+        return dict.fromkeys(pks)
+    rows = model._base_manager.filter(pk__in=pks).values('pk', *AUDIENCE_FIELDS[model])
+    return {row['pk']: _audience(model, row) for row in rows}
+
+
+def _merge(*found):
+    """Who could see a row in any of the ``found`` audiences (``False`` where it was not found)."""
+    found = [audience for audience in found if audience is not False]
+    if not found or None in found:
+        return None
+    return {
+        'users': sorted({user for audience in found for user in audience['users']}),
+        'courses': sorted({course for audience in found for course in audience['courses']}),
+    }
+
+
+def record_changes(model, pks, action='upsert', previous=None):
+    """Log ``action`` for ``pks``; ``previous`` holds their ``audiences()`` from before the change."""
+    previous = previous or {}
+    current = audiences(model, pks) if action != 'delete' else {}
+    ChangeLog.objects.bulk_create(
+        ChangeLog(
+            model=model._meta.model_name, object_id=pk, action=action,
+            audience=_merge(previous.get(pk, False), current.get(pk, False)),
+        )
+        for pk in pks
+    )
+
+
+def record_embedded_changes(model, pk, fields):
+    """Log an upsert of every synced row whose payload embeds ``fields`` of ``model`` row ``pk``."""
+    limit = settings.SYNC_MAX_CHANGES
+    dependents = {}
+    for field in fields:
+        for synced, lookup in EMBEDDED_FIELDS[model].get(field, ()):
+            pks = synced._base_manager.filter(**{lookup: pk}).order_by().values_list('pk', flat=True)
+            dependents.setdefault(synced, set()).update(pks[:limit + 1])
+    if sum(map(len, dependents.values())) > limit:
+        # More than a delta can hold: clients would get a full snapshot anyway
+        record_global_resync()
+        return
+    for synced, pks in dependents.items():
+        record_changes(synced, sorted(pks))
+
+
+def record_scope_changes(user_ids):
+    ChangeLog.objects.bulk_create(
+        ChangeLog(model='customuser', object_id=user_id, action='scope') for user_id in user_ids if user_id
+    )
+
+
+def record_global_resync():
+    """Force every client to resync, e.g. after a rename denormalized into other models' payloads."""
+    ChangeLog.objects.create(model='customuser', object_id=0, action='scope')
+
+
+def encode_token(position):
+    return base64.urlsafe_b64encode(f'v1:{position}'.encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    """Return the change log position in ``token``. Raises ``ValueError`` if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        version, position = raw.split(':')
+        if version != 'v1':
+            raise ValueError(version)
+        return int(position)
+    except (TypeError, UnicodeDecodeError, ValueError) as exc:
+        raise ValueError('Invalid sync token') from exc
+
+
+def current_position():
+    return ChangeLog.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def member_courses(user):
+    """Ids of the courses ``user`` is enrolled in or teaches."""
+    enrolled = Course.students.through.objects.filter(customuser_id=user.id).values_list('course_id', flat=True)
+    return {*enrolled, *Course.all_objects.filter(teacher_id=user.id).values_list('pk', flat=True)}
+
+
+def changes_since(position, user):
+    """Collapse the log after ``position`` into per-model changes for ``user``.
+
+    Returns ``(changes, new_position)`` with ``changes`` mapping sync keys to
+    ``{'upsert': set(ids), 'delete': set(ids)}`` of the rows ``user`` could
+    see before or after the change, or ``(None, position)`` when
+    the client must resync from scratch: its position was pruned, the backlog
+    exceeds ``SYNC_MAX_CHANGES`` or its course membership changed.
+    """
+    limit = settings.SYNC_MAX_CHANGES
+    # Read from the client's own entry to confirm it still exists (not pruned).
+    entries = list(
+        ChangeLog.objects.filter(id__gte=position).order_by('id').values_list('id', 'model', 'object_id', 'action', 'audience')[:limit + 2]
+    )
+    if position:
+        if not entries or entries[0][0] != position:
+            return None, position
+        entries = entries[1:]
+    if len(entries) > limit:
+        return None, position
+
+    sees_all = user.user_type == 'admin' or user.is_staff
+    courses = None
+    changes = {}
+    for entry_id, model, object_id, action, audience in entries:
+        if action == 'scope':
+            if object_id in (0, user.id):
+                return None, position
+            continue
+        key = MODEL_KEYS.get(model)
+        if key is None:
+            continue
+        if audience is not None and not sees_all and user.id not in audience['users']:
+            if courses is None:
+                courses = member_courses(user)
+            if courses.isdisjoint(audience['courses']):
+                # Never visible to this user
+                continue
+        bucket = changes.setdefault(key, {'upsert': set(), 'delete': set()})
+        # Later entries win: an object updated then deleted is only a delete.
+        bucket['delete' if action == 'delete' else 'upsert'].add(object_id)
+        bucket['upsert' if action == 'delete' else 'delete'].discard(object_id)
+    return changes, (entries[-1][0] if entries else position)
@@ -1,3 +1,1198 @@
-from django.test import TestCase
+import gc
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.signals import post_delete, post_save
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.exceptions import Throttled
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import authentication, notifications, purge, signals
+
+from .counters import repair_counters
+from .exams import AnswerBuffer, finalize_attempt, finalize_expired_attempts, grade_responses, item_analysis, start_attempt
+from .login import LoginPool
+from .middleware import StaticAssetMiddleware
+from .models import Announcement, Assignment, Choice, Course, CustomUser, DiscussionMessage, Exam, ExamAttempt, ExamSubmission, Message, Notification, Project, ProjectFile, ProjectMilestone, Question, Resource, Submission, Unit
+from .renderers import FastJSONRenderer
+from .serializers import AnnouncementSerializer, ExamSubmissionSerializer, MessageSerializer, SubmissionSerializer
+from .views import AnnouncementViewSet, ExamSubmissionViewSet, MessageViewSet, SubmissionViewSet
+
+
+class FastListConformanceTests(TestCase):
+    """The values()-based list path must render exactly what the serializers render."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user('admin', 'admin@example.com', 'pw', user_type='admin', is_staff=True)
+        cls.teacher = CustomUser.objects.create_user('teacher', 'teacher@example.com', 'pw', user_type='teacher')
+        cls.student = CustomUser.objects.create_user('stüdent', 'student@example.com', 'pw', user_type='student')
+        course = Course.objects.create(title='Algebra', description='Rings', teacher=cls.teacher)
+        course.students.add(cls.student)
+        assignment = Assignment.objects.create(course=course, title='Homework 1', description='x', due_date=timezone.now() + timedelta(days=3))
+        Submission.objects.create(assignment=assignment, student=cls.student, file='submissions/hw 1.pdf', grade='A', feedback='Good')
+        Submission.objects.create(assignment=assignment, student=cls.student, file='')
+        Message.objects.create(sender=cls.teacher, receiver=cls.student, content='Hi   there')
+        Message.objects.create(sender=cls.student, receiver=cls.teacher, content='Hello', is_read=True)
+        Announcement.objects.create(title='Global', content='All', author=cls.admin, is_global=True)
+        Announcement.objects.create(title='Course', content='Only', author=cls.teacher, course=course)
+        exam = Exam.objects.create(title='Midterm', course=course, created_by=cls.teacher)
+        ExamSubmission.objects.create(exam=exam, student=cls.student, score=3, responses=[1, 5, 9])
+
+    def assertConforms(self, url, viewset, serializer_class, user, query=''):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get(url + query)
+        self.assertEqual(response.status_code, 200)
+        request = Request(response.wsgi_request)
+        request.user = user
+        view = viewset(request=request, format_kwarg=None, action='list', kwargs={})
+        expected = serializer_class(view.get_queryset(), many=True, context={'request': request}).data
+        self.assertTrue(expected)
+        self.assertEqual(response.content, JSONRenderer().render(expected))
+
+    def test_lists_match_serializers(self):
+        cases = [
+            ('/api/submissions/', SubmissionViewSet, SubmissionSerializer, self.admin),
+            ('/api/messages/', MessageViewSet, MessageSerializer, self.student),
+            ('/api/announcements/', AnnouncementViewSet, AnnouncementSerializer, self.student),
+            ('/api/announcements/', AnnouncementViewSet, AnnouncementSerializer, self.admin),
+            ('/api/exam-submissions/', ExamSubmissionViewSet, ExamSubmissionSerializer, self.teacher),
+        ]
+        for url, viewset, serializer_class, user in cases:
+            with self.subTest(url=url, user=user.username):
+                self.assertConforms(url, viewset, serializer_class, user)
+                self.assertConforms(url, viewset, serializer_class, user, '?fields=id,' + serializer_class.Meta.fields[-1])
+
+    def test_list_is_one_query(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        with self.assertNumQueries(1):
+            client.get('/api/submissions/')
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    """Cached users must be dropped as soon as the user row changes."""
+
+    def setUp(self):
+        authentication._users.clear()
+        # Users are only cached with a cache every worker shares
+        caches = {**settings.CACHES, 'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': self.enterContext(tempfile.TemporaryDirectory()),
+        }}
+        self.enterContext(override_settings(CACHES=caches))
+        # Receivers are held weakly; they must survive a collection
+        gc.collect()
+        self.user = CustomUser.objects.create_user('student', 'student@example.com', 'old-pw', user_type='student')
+        self.client = APIClient()
+
+    def get(self, token):
+        return self.client.get('/api/users/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_receivers_are_not_shadowed(self):
+        # A receiver whose module-level name is reused has no strong reference
+        # left and is silently dropped once garbage collected
+        for signal in (post_save, post_delete):
+            for receiver in signal._live_receivers(CustomUser):
+                if receiver.__module__ == signals.__name__:
+                    self.assertIs(getattr(signals, receiver.__name__), receiver, receiver.__name__)
+
+    @override_settings(DEBUG=False)
+    def test_deactivated_user_is_rejected(self):
+        token = AccessToken.for_user(self.user)
+        self.assertEqual(self.get(token).status_code, 200)
+        self.assertEqual(self.get(token).status_code, 200)  # served from the cache
+        self.assertIn(str(self.user.pk), authentication._users)
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(self.get(token).status_code, 401)
+
+    @override_settings(DEBUG=False)
+    def test_password_change_revokes_token(self):
+        token = AccessToken.for_user(self.user)
+        self.assertEqual(self.get(token).status_code, 200)
+        self.user.set_password('new-pw')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(self.get(token).status_code, 401)
+        self.assertEqual(self.get(AccessToken.for_user(self.user)).status_code, 200)
+
+    @override_settings(DEBUG=False)
+    def test_process_local_cache_is_not_used(self):
+        token = AccessToken.for_user(self.user)
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual(self.get(token).status_code, 200)
+            self.assertEqual(authentication._users, {})
+            # Deactivated through another process: nothing here was told
+            CustomUser.objects.filter(pk=self.user.pk).update(is_active=False)
+            self.assertEqual(self.get(token).status_code, 401)
+
+
+class SoftDeleteTests(TestCase):
+    """Deleted courses and users disappear at once; app.purge removes their rows later."""
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user('admin', 'admin@example.com', 'pw', user_type='admin', is_staff=True)
+        self.teacher = CustomUser.objects.create_user('teacher', 'teacher@example.com', 'pw', user_type='teacher')
+        self.student = CustomUser.objects.create_user('student', 'student@example.com', 'pw', user_type='student')
+        self.course = Course.objects.create(title='Algebra', description='Rings', teacher=self.teacher)
+        self.course.students.add(self.student)
+        self.assignment = Assignment.objects.create(course=self.course, title='Homework 1', description='x', due_date=timezone.now())
+        Submission.objects.create(assignment=self.assignment, student=self.student, file='')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_course_dependents_are_hidden(self):
+        anonymous = APIClient()
+        self.assertEqual(len(anonymous.get('/api/assignments/').json()), 1)
+        with self.captureOnCommitCallbacks():
+            self.course.delete()
+        self.assertEqual(anonymous.get('/api/assignments/').json(), [])
+        self.assertEqual(self.client.get(f'/api/assignments/{self.assignment.pk}/').status_code, 404)
+        self.assertEqual(self.client.get('/api/submissions/').json(), [])
+        self.assertFalse(Submission.objects.exists())
+        self.assertEqual(Submission._base_manager.count(), 1)
+
+    def test_counters_skip_deleted_rows(self):
+        with self.captureOnCommitCallbacks():
+            self.course.delete()
+        self.student.refresh_from_db()
+        self.teacher.refresh_from_db()
+        self.assertEqual((self.student.courses_enrolled_count, self.teacher.courses_taught_count), (0, 0))
+
+    def test_username_of_deleted_user_is_reusable(self):
+        with self.captureOnCommitCallbacks():
+            self.student.delete()
+        self.assertFalse(CustomUser.objects.filter(pk=self.student.pk).exists())
+        response = self.client.post('/api/users/', {'username': 'student', 'email': 'student@example.com', 'password': 'pw'})
+        self.assertEqual(response.status_code, 201)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.students_count, 0)
+
+    def test_deleting_teacher_deletes_their_courses(self):
+        with self.captureOnCommitCallbacks():
+            self.teacher.delete()
+        self.assertFalse(Course.objects.exists())
+        self.assertFalse(Assignment.objects.exists())
+
+    def test_course_notifications_are_withdrawn(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Announcement.objects.create(title='News', content='x', author=self.teacher, course=self.course)
+        self.assertEqual(notifications.unread_notifications(self.student), 1)
+        with self.captureOnCommitCallbacks():
+            self.course.delete()
+        self.assertEqual(notifications.unread_notifications(self.student), 0)
+
+    def test_purge_removes_rows(self):
+        with self.captureOnCommitCallbacks():
+            self.teacher.delete()
+        rows, _ = purge.purge_deleted(pause=0)
+        self.assertGreater(rows, 0)
+        self.assertFalse(Course.all_objects.exists())
+        self.assertFalse(CustomUser.all_objects.filter(pk=self.teacher.pk).exists())
+        self.assertFalse(Submission._base_manager.exists())
+        self.assertTrue(CustomUser.objects.filter(pk=self.student.pk).exists())
+        self.assertEqual(purge.purge_deleted(pause=0), (0, 0))
+
+
+def create_exam(teacher, course=None, questions=3, duration_minutes=60):
+    """An exam of one-mark questions with two choices each; returns ``(exam, [(right, wrong), ...])``."""
+    exam = Exam.objects.create(title='Quiz', course=course, created_by=teacher, duration_minutes=duration_minutes)
+    choices = []
+    for number in range(questions):
+        question = Question.objects.create(exam=exam, text=f'Q{number}', marks=1)
+        choices.append((
+            Choice.objects.create(question=question, text='right', is_correct=True),
+            Choice.objects.create(question=question, text='wrong'),
+        ))
+    return exam, choices
+
+
+class ExamAttemptTests(TestCase):
+    """Students take exams through timed attempts; autosaves are buffered."""
+
+    def setUp(self):
+        self.teacher = CustomUser.objects.create_user('teacher', 'teacher@example.com', 'pw', user_type='teacher')
+        self.student = CustomUser.objects.create_user('student', 'student@example.com', 'pw', user_type='student')
+        course = Course.objects.create(title='Algebra', description='Rings', teacher=self.teacher)
+        course.students.add(self.student)
+        self.exam, self.choices = create_exam(self.teacher, course)
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def answers(self, *choices):
+        return {str(choice.question_id): choice.id for choice in choices}
+
+    def test_students_cannot_post_submissions(self):
+        response = self.client.post('/api/exam-submissions/', {'exam': self.exam.pk, 'score': 999}, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(ExamSubmission.objects.exists())
+
+    def test_score_is_read_only(self):
+        self.client.force_authenticate(self.teacher)
+        response = self.client.post('/api/exam-submissions/', {'exam': self.exam.pk, 'score': 999}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['score'], 0)
+
+    def test_submit_grades_attempt(self):
+        attempt_id = self.client.post(f'/api/exams/{self.exam.pk}/start/').json()['id']
+        (right, _), (_, wrong), _ = self.choices
+        response = self.client.post(f'/api/exam-attempts/{attempt_id}/submit/', {'answers': self.answers(right, wrong)}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['score'], 1)
+        self.assertEqual(ExamAttempt.objects.get(pk=attempt_id).status, 'submitted')
+
+    def test_attempts_are_limited(self):
+        attempt_id = self.client.post(f'/api/exams/{self.exam.pk}/start/').json()['id']
+        self.client.post(f'/api/exam-attempts/{attempt_id}/submit/', {'answers': {}}, format='json')
+        response = self.client.post(f'/api/exams/{self.exam.pk}/start/')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['submission'], ExamSubmission.objects.get().pk)
+        self.assertEqual(ExamAttempt.objects.count(), 1)
+
+    def test_flush_merges_answers(self):
+        attempt = start_attempt(self.exam, self.student)
+        buffer = AnswerBuffer(flush_size=100, flush_interval=3600)
+        (first, _), (second, _), _ = self.choices
+        buffer.put(attempt.pk, self.answers(first))
+        other = AnswerBuffer(flush_size=100, flush_interval=3600)
+        other.put(attempt.pk, self.answers(second))
+        self.assertEqual((buffer.flush(), other.flush()), (1, 1))
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.answers, self.answers(first, second))
+        self.assertEqual(buffer.flush(), 0)
+
+    def test_put_does_not_finalize_expired_attempts(self):
+        expired = ExamAttempt.objects.create(exam=self.exam, student=self.teacher, deadline=timezone.now() - timedelta(hours=1))
+        buffer = AnswerBuffer(flush_size=1, flush_interval=3600)
+        buffer.put(start_attempt(self.exam, self.student).pk, {})
+        expired.refresh_from_db()
+        self.assertEqual(expired.status, 'in_progress')
+        self.assertEqual(finalize_expired_attempts(), 1)
+
+    def test_abandoned_attempt_counts_in_item_analysis(self):
+        attempt_id = self.client.post(f'/api/exams/{self.exam.pk}/start/').json()['id']
+        (right, _), _, _ = self.choices
+        self.client.post(f'/api/exam-attempts/{attempt_id}/autosave/', {'answers': self.answers(right)}, format='json')
+        # The student walks away and never comes back
+        ExamAttempt.objects.filter(pk=attempt_id).update(deadline=timezone.now() - timedelta(hours=1))
+
+        teacher = APIClient()
+        teacher.force_authenticate(self.teacher)
+        report = teacher.get(f'/api/exams/{self.exam.pk}/item-analysis/').json()
+        self.assertEqual(report['submissions'], 1)
+        self.assertEqual([item['answered'] for item in report['items']], [1, 0, 0])
+        self.assertEqual(ExamAttempt.objects.get(pk=attempt_id).status, 'expired')
+        self.assertEqual([row['score'] for row in teacher.get('/api/exam-submissions/').json()], [1])
+
+    def test_answers_flushed_after_finalize_are_graded(self):
+        attempt = start_attempt(self.exam, self.student)
+        (first, _), (second, _), _ = self.choices
+        # Autosaved to another process before this one finalizes
+        other = AnswerBuffer(flush_size=100, flush_interval=3600)
+        other.put(attempt.pk, {**self.answers(second), str(first.question_id): None})
+        submission = finalize_attempt(attempt, answers=self.answers(first))
+        self.assertEqual(submission.score, 1)
+        other.flush()
+        submission.refresh_from_db()
+        self.assertEqual((submission.score, submission.responses), (2, [first.pk, second.pk]))
+
+
+class UserAutocompleteTests(TestCase):
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user('admin', 'admin@example.com', 'pw', user_type='admin', is_staff=True)
+        for number in range(3):
+            CustomUser.objects.create_user(f'Ann{number}', f'ann{number}@example.com', 'pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def get(self, **params):
+        return self.client.get('/api/users/autocomplete/', {'q': 'ann', **params})
+
+    def test_prefix_matches(self):
+        self.assertEqual([row['username'] for row in self.get().json()], ['Ann0', 'Ann1', 'Ann2'])
+
+    def test_limit_is_clamped(self):
+        self.assertEqual(len(self.get(limit=2).json()), 2)
+        self.assertEqual(len(self.get(limit=-5).json()), 1)
+        self.assertEqual(len(self.get(limit=0).json()), 1)
+        self.assertEqual(self.get(limit='x').status_code, 400)
+
+
+class LoginPoolTests(TestCase):
+
+    def test_full_queue_is_rejected_at_once(self):
+        pool = LoginPool(workers=1, queue_size=1, queue_timeout=5)
+        release = threading.Event()
+        threads = []
+        # One login running, then one waiting
+        for state in ('running', 'queued'):
+            threads.append(threading.Thread(target=pool.run, args=(release.wait,)))
+            threads[-1].start()
+            while pool.stats()[state] < 1:
+                time.sleep(0.01)
+        started = time.monotonic()
+        with self.assertRaises(Throttled):
+            pool.run(lambda: None)
+        self.assertLess(time.monotonic() - started, 1)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(pool.run(lambda: 'ok'), 'ok')
+
+
+class SyncTests(TestCase):
+    """Deltas only carry rows the client could see."""
+
+    def setUp(self):
+        self.teacher = CustomUser.objects.create_user('teacher', 'teacher@example.com', 'pw', user_type='teacher')
+        self.student = CustomUser.objects.create_user('student', 'student@example.com', 'pw', user_type='student')
+        self.other = CustomUser.objects.create_user('other', 'other@example.com', 'pw', user_type='student')
+        self.course = Course.objects.create(title='Algebra', description='Rings', teacher=self.teacher)
+        self.course.students.add(self.student)
+        self.announcement = Announcement.objects.create(title='Quiz', content='Friday', author=self.teacher, course=self.course)
+        self.client = APIClient()
+
+    def sync(self, user, token=None):
+        self.client.force_authenticate(user)
+        return self.client.get('/api/sync/', {'token': token} if token else {}).json()
+
+    def test_other_users_rows_are_not_reported(self):
+        tokens = {user: self.sync(user)['token'] for user in (self.student, self.other)}
+        private = Message.objects.create(sender=self.teacher, receiver=self.other, content='Hi')
+        mine = Message.objects.create(sender=self.teacher, receiver=self.student, content='Hi')
+        ids = private.pk, mine.pk, self.announcement.pk
+        private.delete()
+        mine.delete()
+        self.announcement.delete()
+        delta = self.sync(self.student, tokens[self.student])
+        self.assertFalse(delta['reset'])
+        self.assertEqual(delta['changes']['messages']['deleted'], [ids[1]])
+        self.assertEqual(delta['changes']['announcements']['deleted'], [ids[2]])
+        delta = self.sync(self.other, tokens[self.other])
+        self.assertEqual(delta['changes']['messages']['deleted'], [ids[0]])
+        self.assertNotIn('announcements', delta['changes'])
+
+    def test_row_moved_away_is_reported_deleted(self):
+        message = Message.objects.create(sender=self.teacher, receiver=self.student, content='Hi')
+        token = self.sync(self.student)['token']
+        message.receiver = self.other
+        message.save()
+        self.assertEqual(self.sync(self.student, token)['changes']['messages'], {'updated': [], 'deleted': [message.pk]})
+
+    def test_rename_updates_embedding_rows_only(self):
+        tokens = {user: self.sync(user)['token'] for user in (self.student, self.other)}
+        self.course.title = 'Linear algebra'
+        self.course.save()
+        delta = self.sync(self.student, tokens[self.student])
+        self.assertFalse(delta['reset'])
+        self.assertEqual(delta['changes']['announcements']['updated'][0]['course_title'], 'Linear algebra')
+        delta = self.sync(self.other, tokens[self.other])
+        self.assertFalse(delta['reset'])
+        self.assertNotIn('announcements', delta['changes'])
+
+    def test_user_type_change_resyncs_that_user(self):
+        tokens = {user: self.sync(user)['token'] for user in (self.student, self.other)}
+        self.student.user_type = 'teacher'
+        self.student.save()
+        self.assertTrue(self.sync(self.student, tokens[self.student])['reset'])
+        self.assertFalse(self.sync(self.other, tokens[self.other])['reset'])
+
+
+class ExamPayloadCacheTests(TestCase):
+    """Students get the exam payload rendered once per Exam.content_version."""
+
+    def setUp(self):
+        # Payloads are keyed by exam id and version, which repeat across tests
+        cache.clear()
+        self.teacher = CustomUser.objects.create_user('teacher', 'teacher@example.com', 'pw', user_type='teacher')
+        self.student = CustomUser.objects.create_user('student', 'student@example.com', 'pw', user_type='student')
+        self.exam, self.choices = create_exam(self.teacher)
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+        self.url = f'/api/exams/{self.exam.pk}/'
+
+    def test_payload_has_no_answers(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(b'is_correct', response.content)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_question_change_refreshes_payload(self):
+        etag = self.client.get(self.url)['ETag']
+        question = self.exam.questions.first()
+        question.text = 'Reworded'
+        question.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Reworded', response.content)
+
+    def test_stale_save_gets_a_new_version(self):
+        stale = Exam.objects.get(pk=self.exam.pk)
+        version = stale.content_version
+        self.client.get(self.url)
+        signals.bump_exam_version(pk=self.exam.pk)
+        bumped = self.client.get(self.url)
+        stale.description = 'Open book'
+        stale.save()
+        self.assertEqual(Exam.objects.get(pk=self.exam.pk).content_version, version + 2)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=bumped['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['description'], 'Open book')
+
+
+    def test_only_embedded_fields_refresh_payload(self):
+        course = Course.objects.create(title='Algebra', description='Rings', teacher=self.teacher)
+        course.students.add(self.student)
+        Exam.objects.filter(pk=self.exam.pk).update(course=course)
+        version = Exam.objects.get(pk=self.exam.pk).content_version
+        self.teacher.last_login = timezone.now()
+        self.teacher.save()
+        course.description = 'Fields'
+        course.save()
+        self.assertEqual(Exam.objects.get(pk=self.exam.pk).content_version, version)
+        course.title = 'Algebra II'
+        course.save()
+        self.teacher.username = 'prof'
+        self.teacher.save()
+        self.assertEqual(Exam.objects.get(pk=self.exam.pk).content_version, version + 2)
+        payload = self.client.get(self.url).json()
+        self.assertEqual((payload['course_title'], payload['created_by_name']), ('Algebra II', 'prof'))
+
+class GradingTests(TestCase):
+
+    def setUp(self):
+        self.teacher = CustomUser.objects.create_user('teacher', 'teacher@example.com', 'pw', user_type='teacher')
+        self.exam, self.choices = create_exam(self.teacher)
+
+    def test_grade_responses(self):
+        (right0, _), (_, wrong1), (right2, _) = self.choices
+        self.assertEqual(grade_responses(self.exam, [right2.pk, wrong1.pk, right0.pk, right0.pk]), (2, [right0.pk, wrong1.pk, right2.pk]))
+
+    def test_invalid_responses(self):
+        (right0, wrong0), _, _ = self.choices
+        other, other_choices = create_exam(self.teacher, questions=1)
+        with self.assertRaises(ValueError):
+            grade_responses(self.exam, [right0.pk, wrong0.pk])
+        with self.assertRaises(ValueError):
+            grade_responses(self.exam, [other_choices[0][0].pk])
+        self.assertEqual(grade_responses(self.exam, [right0.pk, wrong0.pk, other_choices[0][0].pk], strict=False), (1, [right0.pk]))
+
+    def test_item_analysis(self):
+        patterns = [(1, 1, 1), (1, 1, 0), (1, 0, 0), (0, 0, 1), (1, 0, 0)]
+        for number, pattern in enumerate(patterns):
+            student = CustomUser.objects.create_user(f'student{number}', f's{number}@example.com', 'pw')
+            responses = [choices[0 if correct else 1].pk for choices, correct in zip(self.choices, pattern)]
+            ExamSubmission.objects.create(exam=self.exam, student=student, responses=responses)
+        # A choice deleted after submitting is ignored
+        ExamSubmission.objects.create(exam=self.exam, student=self.teacher, responses=[10 ** 6])
+
+        result = item_analysis(self.exam)
+        self.assertEqual(result['submissions'], len(patterns) + 1)
+        rows = [*patterns, (0, 0, 0)]
+        for index, item in enumerate(result['items']):
+            column = [row[index] for row in rows]
+            rest = [sum(row) - row[index] for row in rows]
+            self.assertEqual(item['answered'], len(patterns))
+            self.assertEqual(item['difficulty'], round(sum(column) / len(rows), 4))
+            self.assertAlmostEqual(item['discrimination'], statistics.correlation(column, rest), places=4)
+
+    def test_item_analysis_without_variance(self):
+        student = CustomUser.objects.create_user('student', 'student@example.com', 'pw')
+        ExamSubmission.objects.create(exam=self.exam, student=student, responses=[right.pk for right, _ in self.choices])
+        self.assertEqual([(item['difficulty'], item['discrimination']) for item in item_analysis(self.exam)['items']], [(1.0, None)] * 3)
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        self.teacher = CustomUser.objects.create_user('teacher', 'teacher@example.com', 'pw', user_type='teacher')
+        Announcement.objects.create(title='Global', content='All', author=self.teacher, is_global=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def test_etag_revalidation(self):
+        response = self.client.get('/api/announcements/')
+        etag = response['ETag']
+        self.assertNotIn('Last-Modified', response)
+        self.assertEqual(self.client.get('/api/announcements/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Announcement.objects.create(title='Later', content='Same second', author=self.teacher, is_global=True)
+        response = self.client.get('/api/announcements/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 2)
+
+    def test_if_modified_since_is_ignored(self):
+        since = http_date(time.time() + 60)
+        self.assertEqual(self.client.get('/api/announcements/', HTTP_IF_MODIFIED_SINCE=since).status_code, 200)
+
+    def test_anonymous_cache_follows_writes(self):
+        anonymous = APIClient()
+        self.assertEqual(anonymous.get('/api/courses/').json(), [])
+        Course.objects.create(title='Algebra', description='Rings', teacher=self.teacher)
+        self.assertEqual([course['title'] for course in anonymous.get('/api/courses/').json()], ['Algebra'])
+
+
+@override_settings(
+    DEBUG=False, SECURE_HSTS_SECONDS=3600,
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+)
+class SPAShellTests(TestCase):
+    """The in-memory shell still goes through SecurityMiddleware and the host check."""
+
+    def test_security_headers(self):
+        response = Client().get('/courses/', secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Strict-Transport-Security'], 'max-age=3600')
+        self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+        self.assertEqual(response['X-Frame-Options'], 'DENY')
+        self.assertEqual(Client().get('/courses/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_disallowed_host(self):
+        self.assertEqual(Client().get('/courses/', HTTP_HOST='evil.example').status_code, 400)
+
+    @override_settings(SECURE_SSL_REDIRECT=True)
+    def test_https_redirect(self):
+        self.assertEqual(Client().get('/courses/').status_code, 301)
+
+
+class FastJSONRendererTests(TestCase):
+
+    def test_matches_drf(self):
+        data = {'text': 'a\u2028b é', 'when': timezone.now(), 'price': Decimal('1.50'), 'ratio': 0.1, 'nested': [None, True, 2 ** 70]}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_documented_float_differences(self):
+        self.assertEqual(FastJSONRenderer().render([1e20, 1e-7]), b'[1e20,1e-7]')
+        self.assertEqual(json.loads(FastJSONRenderer().render([1e20, 1e-7])), [1e20, 1e-7])
+        self.assertEqual(FastJSONRenderer().render([float('nan'), float('inf')]), b'[null,null]')
+        with self.assertRaises(ValueError):
+            JSONRenderer().render([float('nan')])
+
+
+class SearchVisibilityTests(TestCase):
+    """Search shows the announcements the announcements API shows, no more."""
+
+    def setUp(self):
+        self.teacher = CustomUser.objects.create_user('teacher', 'teacher@example.com', 'pw', user_type='teacher')
+        self.student = CustomUser.objects.create_user('student', 'student@example.com', 'pw', user_type='student')
+        course = Course.objects.create(title='Algebra', description='Rings', teacher=self.teacher)
+        Announcement.objects.create(title='Holiday closure', content='Campus', author=self.teacher, course=course, is_global=True)
+        Announcement.objects.create(title='Holiday homework', content='Rings', author=self.teacher, course=course)
+        Announcement.objects.create(title='Holiday draft', content='Notes', author=self.teacher)
+
+    def titles(self, user):
+        request = APIClient()
+        request.force_authenticate(user)
+        found = {row['title'] for row in request.get('/api/search/', {'q': 'holiday'}).json()['results']}
+        listed = {row['title'] for row in request.get('/api/announcements/').json()}
+        self.assertEqual(found, listed)
+        return found
+
+    def test_student_outside_the_course(self):
+        self.assertEqual(self.titles(self.student), {'Holiday closure'})
+
+    def test_author(self):
+        self.assertEqual(self.titles(self.teacher), {'Holiday closure', 'Holiday homework', 'Holiday draft'})
+
+    def test_parameters(self):
+        client = APIClient()
+        client.force_authenticate(self.teacher)
+        self.assertEqual(len(client.get('/api/search/', {'q': 'holiday', 'limit': 1}).json()['results']), 1)
+        self.assertEqual(len(client.get('/api/search/', {'q': 'holiday', 'limit': 0}).json()['results']), 1)
+        self.assertEqual(client.get('/api/search/', {'q': 'holiday', 'limit': 'x'}).status_code, 400)
+        self.assertEqual(len(client.get('/api/search/', {'q': 'holiday', 'kind': 'announcement,course'}).json()['results']), 3)
+        self.assertEqual(client.get('/api/search/', {'q': 'holiday', 'kind': 'announcement,user'}).status_code, 400)
+
+
+class EnrollmentCounterTests(TestCase):
+    """Stored enrollment counters follow every kind of change."""
+
+    def setUp(self):
+        self.teacher = CustomUser.objects.create_user('teacher', 'teacher@example.com', 'pw', user_type='teacher')
+        self.students = [CustomUser.objects.create_user(f'student{n}', f's{n}@example.com', 'pw') for n in range(3)]
+        self.course = Course.objects.create(title='Algebra', description='Rings', teacher=self.teacher)
+
+    def counts(self):
+        self.course.refresh_from_db()
+        return self.course.students_count, [
+            (user.courses_enrolled_count, user.courses_taught_count)
+            for user in CustomUser.objects.filter(pk__in=[self.teacher.pk, *(s.pk for s in self.students)]).order_by('pk')
+        ]
+
+    def test_enrollment_changes(self):
+        self.course.students.add(*self.students)
+        self.assertEqual(self.counts(), (3, [(0, 1), (1, 0), (1, 0), (1, 0)]))
+        self.course.students.remove(self.students[0])
+        self.students[1].courses_enrolled.clear()
+        self.assertEqual(self.counts(), (1, [(0, 1), (0, 0), (0, 0), (1, 0)]))
+        self.course.students.clear()
+        self.assertEqual(self.counts(), (0, [(0, 1), (0, 0), (0, 0), (0, 0)]))
+
+    def test_teacher_change_and_stale_save(self):
+        other = CustomUser.objects.create_user('other', 'other@example.com', 'pw', user_type='teacher')
+        stale = Course.objects.get(pk=self.course.pk)
+        self.course.students.add(self.students[0])
+        stale.teacher = other
+        stale.save()
+        other.refresh_from_db()
+        self.assertEqual(other.courses_taught_count, 1)
+        # The stale instance must not write back students_count=0
+        self.assertEqual(self.counts(), (1, [(0, 0), (1, 0), (0, 0), (0, 0)]))
+
+    def test_repair_counters(self):
+        self.course.students.add(*self.students)
+        Course.objects.update(students_count=7)
+        CustomUser.objects.update(courses_enrolled_count=5, courses_taught_count=5)
+        self.assertEqual(repair_counters(batch_size=2), (1, 4))
+        self.assertEqual(self.counts(), (3, [(0, 1), (1, 0), (1, 0), (1, 0)]))
+        self.assertEqual(repair_counters(), (0, 0))
+
+    def test_serializers_read_the_columns(self):
+        self.course.students.add(*self.students)
+        with CaptureQueriesContext(connection) as queries:
+            courses = APIClient().get('/api/courses/').json()
+        self.assertEqual(courses[0]['students_count'], 3)
+        self.assertFalse([query for query in queries if 'COUNT(' in query['sql']])
+
+
+class BulkGradeTests(TestCase):
+    """One bulk grade request writes every owned row in a fixed number of queries."""
+
+    def setUp(self):
+        self.teacher = CustomUser.objects.create_user('teacher', 'teacher@example.com', 'pw', user_type='teacher')
+        self.other = CustomUser.objects.create_user('other', 'other@example.com', 'pw', user_type='teacher')
+        self.student = CustomUser.objects.create_user('student', 'student@example.com', 'pw', user_type='student')
+        self.assignment = self.create_assignment(self.teacher)
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def create_assignment(self, teacher):
+        course = Course.objects.create(title='Algebra', description='Rings', teacher=teacher)
+        return Assignment.objects.create(course=course, title='Homework', description='x', due_date=timezone.now() + timedelta(days=3))
+
+    def create_submissions(self, count, assignment=None):
+        return [
+            Submission.objects.create(assignment=assignment or self.assignment, student=self.student, file='', feedback='Saved')
+            for _ in range(count)
+        ]
+
+    def grade(self, grades):
+        response = self.client.post('/api/submissions/bulk-grade/', {'grades': grades}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_outcomes(self):
+        own, = self.create_submissions(1)
+        foreign, = self.create_submissions(1, self.create_assignment(self.other))
+        result = self.grade([
+            {'id': own.pk, 'grade': 'A'},
+            {'id': foreign.pk, 'grade': 'A'},
+            {'id': own.pk, 'grade': 'B'},
+            {'id': own.pk, 'grade': 'x' * 11},
+            {'grade': 'A'},
+        ])
+        self.assertEqual(result['updated'], 1)
+        self.assertEqual([row['status'] for row in result['results']], ['updated', 'not_found', 'invalid', 'invalid', 'invalid'])
+        self.assertEqual(Submission.objects.get(pk=own.pk).grade, 'A')
+        self.assertIsNone(Submission.objects.get(pk=foreign.pk).grade)
+
+    def test_omitted_feedback_is_kept(self):
+        first, second = self.create_submissions(2)
+        original_save = Submission.objects.bulk_update
+
+        def save_feedback_meanwhile(*args, **kwargs):
+            # Another teacher saves feedback after the rows were loaded
+            Submission.objects.filter(pk=first.pk).update(feedback='Newer')
+            return original_save(*args, **kwargs)
+
+        Submission.objects.bulk_update = save_feedback_meanwhile
+        try:
+            self.grade([{'id': first.pk, 'grade': 'A'}, {'id': second.pk, 'grade': 'B', 'feedback': 'Good'}])
+        finally:
+            del Submission.objects.bulk_update
+        self.assertEqual(
+            list(Submission.objects.order_by('pk').values_list('grade', 'feedback')),
+            [('A', 'Newer'), ('B', 'Good')],
+        )
+
+    def test_fixed_number_of_queries(self):
+        for count in (2, 40):
+            grades = [{'id': s.pk, 'grade': 'A', **({'feedback': 'Ok'} if s.pk % 2 else {})} for s in self.create_submissions(count)]
+            # Owned rows, two bulk updates and the change log, inside a savepoint
+            with self.subTest(count=count), self.assertNumQueries(7):
+                self.grade(grades)
+
+
+class QueuedExecutor:
+    # Stands in for the notification worker pool; jobs run when the test says so
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, fn, *args):
+        self.jobs.append((fn, args))
+
+    def run(self):
+        for fn, args in self.jobs:
+            fn(*args)
+        self.jobs.clear()
+
+
+class NotificationTests(TestCase):
+    """NotificationInbox.unread_count always equals the unread Notification rows."""
+
+    def setUp(self):
+        self.teacher = CustomUser.objects.create_user('teacher', 'teacher@example.com', 'pw', user_type='teacher')
+        self.students = [CustomUser.objects.create_user(f'student{n}', f's{n}@example.com', 'pw', user_type='student') for n in range(3)]
+        self.course = Course.objects.create(title='Algebra', description='Rings', teacher=self.teacher)
+        self.course.students.add(*self.students[:2])
+        self.client = APIClient()
+        self.client.force_authenticate(self.students[0])
+
+    def announce(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Announcement.objects.create(title='News', content='x', author=self.teacher, **kwargs)
+
+    def assertCountersMatch(self, *expected):
+        counters = [notifications.unread_notifications(user) for user in self.students]
+        unread = [Notification.objects.filter(recipient=user, is_read=False).count() for user in self.students]
+        self.assertEqual(counters, unread)
+        self.assertEqual(counters, list(expected))
+
+    def test_inline_fan_out(self):
+        self.announce(course=self.course)
+        self.assertCountersMatch(1, 1, 0)
+        self.announce(is_global=True)
+        self.assertCountersMatch(2, 2, 1)
+        self.assertFalse(Notification.objects.filter(recipient=self.teacher).exists())
+
+    @override_settings(NOTIFICATION_INLINE_LIMIT=2)
+    def test_large_fan_out_runs_on_the_worker(self):
+        queue = QueuedExecutor()
+        with mock.patch.object(notifications, '_executor', queue):
+            self.announce(course=self.course)
+            self.assertCountersMatch(1, 1, 0)
+            self.announce(is_global=True)
+            self.assertEqual(len(queue.jobs), 1)
+            self.assertCountersMatch(1, 1, 0)
+            queue.run()
+        self.assertCountersMatch(2, 2, 1)
+
+    def test_mark_read(self):
+        first = self.announce(course=self.course)
+        self.announce(course=self.course)
+        self.announce(course=self.course)
+        notification = Notification.objects.get(recipient=self.students[0], announcement=first)
+        for _ in range(2):
+            response = self.client.post('/api/notifications/mark-read/', {'ids': [notification.pk]}, format='json')
+            self.assertCountersMatch(2, 3, 0)
+        self.assertEqual(response.json(), {'updated': 0, 'unread': 2})
+        for _ in range(2):
+            self.client.post('/api/notifications/mark-read/', {'all': True}, format='json')
+            self.assertCountersMatch(0, 3, 0)
+        self.assertEqual(self.client.get('/api/notifications/unread-count/').json(), {'unread': 0})
+
+    def test_deleted_announcement_and_course(self):
+        first = self.announce(course=self.course)
+        self.announce(course=self.course)
+        self.announce(is_global=True)
+        self.client.post('/api/notifications/mark-read/', {'ids': list(
+            Notification.objects.filter(recipient=self.students[0], announcement=first).values_list('pk', flat=True)
+        )}, format='json')
+        first.delete()
+        self.assertCountersMatch(2, 2, 1)
+        with self.captureOnCommitCallbacks():
+            self.course.delete()
+        self.assertCountersMatch(1, 1, 1)
+
+    def test_keyset_pages(self):
+        for _ in range(5):
+            self.announce(course=self.course)
+        # Ties on created_at must be broken by id
+        tied = list(Notification.objects.filter(recipient=self.students[0]).values_list('pk', flat=True)[:3])
+        Notification.objects.filter(pk__in=tied).update(created_at=timezone.now())
+        expected = list(
+            Notification.objects.filter(recipient=self.students[0]).order_by('-created_at', '-id').values_list('pk', flat=True)
+        )
+        seen, params = [], {'limit': 2}
+        while True:
+            page = self.client.get('/api/notifications/', params).json()
+            seen += [row['id'] for row in page['results']]
+            if page['next'] is None:
+                break
+            params['before'] = page['next']
+        self.assertEqual(seen, expected)
+        self.client.post('/api/notifications/mark-read/', {'ids': seen[:2]}, format='json')
+        unread = self.client.get('/api/notifications/', {'unread': '1'}).json()['results']
+        self.assertEqual([row['id'] for row in unread], seen[2:])
+
+
+class ReviewQueueTests(TestCase):
+    """Teachers review ungraded work from their own courses, oldest first."""
+
+    def setUp(self):
+        self.teacher = CustomUser.objects.create_user('teacher', 'teacher@example.com', 'pw', user_type='teacher')
+        other = CustomUser.objects.create_user('other', 'other@example.com', 'pw', user_type='teacher')
+        self.student = CustomUser.objects.create_user('student', 'student@example.com', 'pw', user_type='student')
+        self.courses = [Course.objects.create(title=f'Course {n}', description='x', teacher=teacher) for n, teacher in enumerate([self.teacher, self.teacher, other])]
+        self.submissions, self.projects = [], []
+        for course in self.courses:
+            assignment = Assignment.objects.create(course=course, title='Homework', description='x', due_date=timezone.now())
+            for grade in (None, 'A', None):
+                self.submissions.append(Submission.objects.create(assignment=assignment, student=self.student, file='', grade=grade))
+                self.projects.append(Project.objects.create(
+                    title='Project', description='x', student=self.student, course=course, deadline=timezone.now().date(), grade=grade
+                ))
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def ids(self, url, params=None):
+        return [row['id'] for row in self.client.get(url, params).json()]
+
+    def queue(self, url, **params):
+        seen = []
+        while True:
+            page = self.client.get(url, params).json()
+            seen += [row['id'] for row in page['results']]
+            if page['next'] is None:
+                return seen
+            params['after'] = page['next']
+
+    def test_teachers_see_only_their_courses(self):
+        for url, rows in (('/api/submissions/', self.submissions), ('/api/projects/', self.projects)):
+            with self.subTest(url=url):
+                self.assertEqual(sorted(self.ids(url)), [row.pk for row in rows[:6]])
+                self.assertEqual(self.client.get(f'{url}{rows[-1].pk}/').status_code, 404)
+                self.assertNotIn(rows[-1].pk, self.queue(url + 'review-queue/'))
+
+    def test_queue_holds_ungraded_rows_oldest_first(self):
+        # Created first, submitted last
+        for index, submission in enumerate(self.submissions):
+            Submission.objects.filter(pk=submission.pk).update(submitted_at=timezone.now() - timedelta(hours=index))
+        expected = [s.pk for s in reversed(self.submissions[:6]) if s.grade is None]
+        self.assertEqual(self.queue('/api/submissions/review-queue/'), expected)
+
+    def test_paging_through_tied_timestamps(self):
+        Submission.objects.update(submitted_at=timezone.now())
+        Project.objects.update(created_at=timezone.now())
+        for url, rows in (('/api/submissions/', self.submissions), ('/api/projects/', self.projects)):
+            with self.subTest(url=url):
+                expected = [row.pk for row in rows[:6] if row.grade is None]
+                self.assertEqual(self.queue(url + 'review-queue/', limit=1), expected)
+                self.assertEqual(self.queue(url + 'review-queue/', limit=3), expected)
+
+    def test_course_filter(self):
+        course = self.courses[1]
+        for url, rows in (('/api/submissions/', self.submissions), ('/api/projects/', self.projects)):
+            with self.subTest(url=url):
+                expected = [row.pk for row in rows[3:6] if row.grade is None]
+                self.assertEqual(sorted(self.queue(url + 'review-queue/', course=course.pk)), expected)
+                self.assertEqual(self.queue(url + 'review-queue/', course=self.courses[2].pk), [])
+        self.assertEqual(self.client.get('/api/submissions/review-queue/', {'course': 'x'}).status_code, 400)
+
+
+class ProjectListTests(TestCase):
+    """Project lists take a fixed number of queries however many projects there are."""
+
+    def setUp(self):
+        self.teacher = CustomUser.objects.create_user('teacher', 'teacher@example.com', 'pw', user_type='teacher')
+        self.student = CustomUser.objects.create_user('student', 'student@example.com', 'pw', user_type='student')
+        self.course = Course.objects.create(title='Algebra', description='Rings', teacher=self.teacher)
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def create_project(self, *statuses):
+        project = Project.objects.create(title='Project', description='x', student=self.student, course=self.course, deadline=timezone.now().date())
+        for status in statuses:
+            ProjectMilestone.objects.create(project=project, title='Step', date=timezone.now().date(), status=status)
+        ProjectFile.objects.create(project=project, uploader=self.student, file='project_files/report.pdf')
+        return project
+
+    def test_list_queries_do_not_grow(self):
+        for count in (1, 6):
+            while Project.objects.count() < count:
+                self.create_project('pending', 'completed')
+            # Projects with student and course, then milestones, then files with uploaders
+            with self.subTest(count=count), self.assertNumQueries(3):
+                rows = self.client.get('/api/projects/').json()
+            self.assertEqual(len(rows), count)
+            self.assertEqual([len(row['files']) for row in rows], [1] * count)
+
+    def test_timeline_counts(self):
+        first = self.create_project('pending', 'active', 'completed', 'completed')
+        second = self.create_project()
+        with self.assertNumQueries(1):
+            rows = {row['id']: row for row in self.client.get('/api/projects/', {'view': 'timeline'}).json()}
+        self.assertEqual(rows[first.pk]['milestone_counts'], {'pending': 1, 'active': 1, 'completed': 2, 'total': 4})
+        self.assertEqual(rows[second.pk]['milestone_counts'], {'pending': 0, 'active': 0, 'completed': 0, 'total': 0})
+        self.assertNotIn('milestones', rows[first.pk])
+
+
+class StudentDashboardTests(TestCase):
+    """The dashboard is five queries when built and none when cached."""
+
+    def setUp(self):
+        cache.clear()
+        self.teacher = CustomUser.objects.create_user('teacher', 'teacher@example.com', 'pw', user_type='teacher')
+        self.student = CustomUser.objects.create_user('student', 'student@example.com', 'pw', user_type='student')
+        self.course = Course.objects.create(title='Algebra', description='Rings', teacher=self.teacher)
+        other = Course.objects.create(title='Biology', description='Cells', teacher=self.teacher)
+        self.course.students.add(self.student)
+        now = timezone.now()
+        self.due = Assignment.objects.create(course=self.course, title='Due soon', description='x', due_date=now + timedelta(days=2))
+        done = Assignment.objects.create(course=self.course, title='Handed in', description='x', due_date=now + timedelta(days=2))
+        Submission.objects.create(assignment=done, student=self.student, file='')
+        Assignment.objects.create(course=self.course, title='Later', description='x', due_date=now + timedelta(days=30))
+        Assignment.objects.create(course=other, title='Not enrolled', description='x', due_date=now + timedelta(days=2))
+        Message.objects.create(sender=self.teacher, receiver=self.student, content='Hi')
+        Message.objects.create(sender=self.teacher, receiver=self.student, content='Read', is_read=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            Announcement.objects.create(title='Course news', content='x', author=self.teacher, course=self.course)
+            Announcement.objects.create(title='Other news', content='x', author=self.teacher, course=other)
+        self.exam, _ = create_exam(self.teacher, self.course)
+        submitted, _ = create_exam(self.teacher, self.course)
+        ExamSubmission.objects.create(exam=submitted, student=self.student, score=0, responses=[])
+        self.attempt = start_attempt(self.exam, self.student)
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def test_contents_and_queries(self):
+        with self.assertNumQueries(5):
+            data = self.client.get('/api/dashboard/').json()
+        self.assertEqual([course['title'] for course in data['courses']], ['Algebra'])
+        self.assertEqual([row['id'] for row in data['due_assignments']], [self.due.pk])
+        self.assertEqual(data['unread_messages'], 1)
+        self.assertEqual([row['title'] for row in data['announcements']], ['Course news'])
+        self.assertEqual([(row['id'], row['attempt']) for row in data['open_exams']], [(self.exam.pk, self.attempt.pk)])
+        self.assertEqual(len(self.client.get('/api/dashboard/', {'days': 60}).json()['due_assignments']), 2)
+
+    def test_cached_response_takes_no_queries(self):
+        first = self.client.get('/api/dashboard/').content
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/dashboard/').content, first)
+
+    def test_non_students_are_refused(self):
+        self.client.force_authenticate(self.teacher)
+        self.assertEqual(self.client.get('/api/dashboard/').status_code, 403)
+
+
+class CourseContentTests(TestCase):
+    """The content tree is cached per course version and open to course members only."""
+
+    def setUp(self):
+        cache.clear()
+        self.teacher = CustomUser.objects.create_user('teacher', 'teacher@example.com', 'pw', user_type='teacher')
+        self.student = CustomUser.objects.create_user('student', 'student@example.com', 'pw', user_type='student')
+        self.course = Course.objects.create(title='Algebra', description='Rings', teacher=self.teacher)
+        self.course.students.add(self.student)
+        self.second = Unit.objects.create(course=self.course, title='Second', order=2)
+        self.first = Unit.objects.create(course=self.course, title='First', order=1)
+        Resource.objects.create(course=self.course, unit=self.second, title='Slides', type='link', url='https://example.com/')
+        Resource.objects.create(course=self.course, title='Syllabus', type='note', content='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+        self.url = f'/api/courses/{self.course.pk}/content/'
+
+    def test_tree_is_ordered(self):
+        data = self.client.get(self.url).json()
+        self.assertEqual([(unit['title'], [r['title'] for r in unit['resources']]) for unit in data['units']], [('First', []), ('Second', ['Slides'])])
+        self.assertEqual([resource['title'] for resource in data['resources']], ['Syllabus'])
+
+    def test_matching_etag_is_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def move_first_to_the_end(self):
+        self.first.order = 3
+        self.first.save()
+
+    def test_saves_refresh_the_tree(self):
+        for change in (
+            lambda: Unit.objects.create(course=self.course, title='Zeroth', order=0),
+            lambda: Resource.objects.create(course=self.course, unit=self.first, title='Notes', type='note', content='x'),
+            self.move_first_to_the_end,
+        ):
+            etag = self.client.get(self.url)['ETag']
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([unit['title'] for unit in data['units']], ['Zeroth', 'Second', 'First'])
+        self.assertEqual([r['title'] for r in data['units'][2]['resources']], ['Notes'])
+
+    def test_outsiders_are_refused(self):
+        outsider = CustomUser.objects.create_user('outsider', 'outsider@example.com', 'pw', user_type='student')
+        self.client.force_authenticate(outsider)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class DiscussionTests(TestCase):
+    """Course discussions page by cursor and are open to course members only."""
+
+    def setUp(self):
+        self.teacher = CustomUser.objects.create_user('teacher', 'teacher@example.com', 'pw', user_type='teacher')
+        self.student = CustomUser.objects.create_user('student', 'student@example.com', 'pw', user_type='student')
+        self.course = Course.objects.create(title='Algebra', description='Rings', teacher=self.teacher)
+        self.course.students.add(self.student)
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def post(self, content):
+        response = self.client.post('/api/discussions/', {'course': self.course.pk, 'content': content}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.json()['id']
+
+    def get(self, **params):
+        return self.client.get('/api/discussions/', {'course': self.course.pk, **params}).json()
+
+    def test_before_pages_back_through_history(self):
+        ids = [self.post(f'Message {n}') for n in range(5)]
+        # Ties on created_at must be broken by id
+        DiscussionMessage.objects.filter(pk__in=ids[1:4]).update(created_at=timezone.now())
+        expected = list(DiscussionMessage.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+        seen, params = [], {'limit': 2}
+        while True:
+            page = self.get(**params)
+            seen += [row['id'] for row in page['results']]
+            if page['next'] is None:
+                break
+            params['before'] = page['next']
+        self.assertEqual(seen, expected)
+
+    def test_since_returns_newer_messages(self):
+        self.post('Old')
+        cursor = self.get()['cursor']
+        self.assertEqual(self.get(since=cursor), {'results': [], 'cursor': cursor, 'has_more': False})
+        new = [self.post('New 1'), self.post('New 2'), self.post('New 3')]
+        page = self.get(since=cursor, limit=2)
+        self.assertEqual(([row['id'] for row in page['results']], page['has_more']), (new[:2], True))
+        page = self.get(since=page['cursor'], limit=2)
+        self.assertEqual(([row['id'] for row in page['results']], page['has_more']), (new[2:], False))
+        self.assertEqual(self.client.get('/api/discussions/', {'course': self.course.pk, 'since': 'x'}).status_code, 400)
+
+    def test_only_the_author_can_edit(self):
+        message_id = self.post('Typo')
+        self.client.force_authenticate(self.teacher)
+        response = self.client.patch(f'/api/discussions/{message_id}/', {'content': 'Changed'}, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.client.force_authenticate(self.student)
+        response = self.client.patch(f'/api/discussions/{message_id}/', {'content': 'Fixed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(DiscussionMessage.objects.get(pk=message_id).content, 'Fixed')
+
+    def test_non_members_are_refused(self):
+        self.post('Members only')
+        outsider = CustomUser.objects.create_user('outsider', 'outsider@example.com', 'pw', user_type='student')
+        self.client.force_authenticate(outsider)
+        self.assertEqual(self.client.get('/api/discussions/', {'course': self.course.pk}).status_code, 403)
+        response = self.client.post('/api/discussions/', {'course': self.course.pk, 'content': 'Hi'}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class AsyncViewTests(TestCase):
+    """The /api/async/ endpoints return the same bytes as their DRF counterparts."""
+
+    def setUp(self):
+        self.teacher = CustomUser.objects.create_user('teacher', 'teacher@example.com', 'pw', user_type='teacher')
+        self.student = CustomUser.objects.create_user('student', 'student@example.com', 'pw', user_type='student')
+        course = Course.objects.create(title='Algebra', description='Rings', teacher=self.teacher)
+        course.students.add(self.student)
+        Assignment.objects.create(course=course, title='Due soon', description='x', due_date=timezone.now() + timedelta(days=1))
+        Message.objects.create(sender=self.teacher, receiver=self.student, content='Hi')
+        with self.captureOnCommitCallbacks(execute=True):
+            Announcement.objects.create(title='Global', content='All', author=self.teacher, is_global=True)
+            Announcement.objects.create(title='Course', content='Only', author=self.teacher, course=course)
+        self.exam, _ = create_exam(self.teacher, course)
+        create_exam(self.teacher)
+
+    def get(self, user, url):
+        # Both paths share the dashboard and exam payload caches
+        cache.clear()
+        response = Client().get(url, HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200, url)
+        return response.content
+
+    def test_same_bytes_as_drf(self):
+        cases = [
+            (self.student, 'announcements/'),
+            (self.teacher, 'announcements/'),
+            (self.student, 'messages/'),
+            (self.student, 'exams/'),
+            (self.teacher, 'exams/'),
+            (self.student, f'exams/{self.exam.pk}/'),
+            (self.teacher, f'exams/{self.exam.pk}/'),
+            (self.student, 'dashboard/'),
+        ]
+        for user, path in cases:
+            with self.subTest(user=user.username, path=path):
+                self.assertEqual(self.get(user, '/api/async/' + path), self.get(user, '/api/' + path))
+
+    def test_requires_a_token(self):
+        response = Client().get('/api/async/messages/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json(), APIClient().get('/api/messages/').json())
+
+
+class StaticAssetMiddlewareTests(TestCase):
+    """Build assets are served from memory with immutable caching; ranges go to WhiteNoise."""
+
+    def setUp(self):
+        root = self.enterContext(tempfile.TemporaryDirectory())
+        os.makedirs(os.path.join(root, 'js'))
+        self.body = b'console.log("app");' * 100
+        for name, content in (('main.1a2b3c.js', self.body), ('main.1a2b3c.js.br', b'br'), ('main.1a2b3c.js.gz', b'gzip!')):
+            with open(os.path.join(root, 'js', name), 'wb') as f:
+                f.write(content)
+        with open(os.path.join(root, 'asset-manifest.json'), 'w') as f:
+            json.dump({'files': {'main.js': '/static/js/main.1a2b3c.js', 'index.html': '/index.html'}}, f)
+        with open(os.path.join(root, 'robots.txt'), 'wb') as f:
+            f.write(b'User-agent: *')
+        self.enterContext(override_settings(STATIC_ROOT=root, WHITENOISE_AUTOREFRESH=False, WHITENOISE_USE_FINDERS=False))
+        self.middleware = StaticAssetMiddleware(lambda request: HttpResponse(status=404))
+        self.factory = RequestFactory()
+
+    def get(self, path, **headers):
+        return self.middleware(self.factory.get(path, **headers))
+
+    def test_manifest_entries_are_immutable(self):
+        response = self.get('/static/js/main.1a2b3c.js')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertNotIn('immutable', self.get('/static/robots.txt')['Cache-Control'])
+
+    def test_preloaded_files_match_the_encoding(self):
+        alternatives = self.middleware.files['/static/js/main.1a2b3c.js'].alternatives
+        self.assertLessEqual({path for _, path, _ in alternatives}, set(self.middleware.contents))
+        # WhiteNoise picks the smallest encoding the client accepts
+        for accept, encoding, body in (('gzip, br', 'br', b'br'), ('gzip', 'gzip', b'gzip!'), ('', None, self.body)):
+            with self.subTest(accept=accept):
+                response = self.get('/static/js/main.1a2b3c.js', HTTP_ACCEPT_ENCODING=accept)
+                self.assertFalse(response.streaming)
+                self.assertEqual(response.get('Content-Encoding'), encoding)
+                self.assertEqual(response.content, body)
+
+    def test_range_requests_fall_back_to_whitenoise(self):
+        response = self.get('/static/js/main.1a2b3c.js', HTTP_RANGE='bytes=0-6')
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response.streaming)
+        self.assertEqual(b''.join(response.streaming_content), self.body[:7])
+        response.close()
@@ -0,0 +1,68 @@
+"""Token-bucket throttles for the login endpoint.
+
+A bucket holds up to ``capacity`` tokens and refills at ``refill_rate``
+tokens per second; every attempt takes one. Bursts up to the capacity go
+through (a lecture hall logging in behind one campus NAT), sustained
+hammering is held to the refill rate. Buckets live in the default cache, so
+they are shared by all workers when REDIS_URL is set. The read-modify-write is
+not atomic, which can let a few extra attempts through under contention but
+never blocks a legitimate one.
+"""
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+from .login import login_metrics
+
+
+class TokenBucketThrottle(BaseThrottle):
+    scope = None
+    setting = None
+
+    def get_ident_key(self, request, view):
+        """The identity being limited, or ``None`` to skip throttling."""
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        ident = self.get_ident_key(request, view)
+        if ident is None:
+            return True
+        capacity, refill_rate = getattr(settings, self.setting)
+        key = f'throttle:{self.scope}:' + hashlib.sha1(ident.encode()).hexdigest()
+        now = time.time()
+
+        tokens, updated_at = cache.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated_at) * refill_rate)
+        if tokens < 1:
+            self.retry_after = math.ceil((1 - tokens) / refill_rate)
+            login_metrics.incr(f'throttled_{self.scope}')
+            return False
+        # Long enough for an empty bucket to refill completely
+        cache.set(key, (tokens - 1, now), timeout=math.ceil(capacity / refill_rate))
+        return True
+
+    def wait(self):
+        return self.retry_after
+
+
+class LoginIPThrottle(TokenBucketThrottle):
+    scope = 'ip'
+    setting = 'LOGIN_IP_BUCKET'
+
+    def get_ident_key(self, request, view):
+        return self.get_ident(request)
+
+
+class LoginAccountThrottle(TokenBucketThrottle):
+    scope = 'account'
+    setting = 'LOGIN_ACCOUNT_BUCKET'
+
+    def get_ident_key(self, request, view):
+        username = request.data.get('username') if hasattr(request.data, 'get') else None
+        if not isinstance(username, str) or not username:
+            return None
+        return username.strip().casefold()
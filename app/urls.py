@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CustomUserViewSet, CourseViewSet, CustomTokenObtainPairView, AssignmentViewSet, MessageViewSet, SubmissionViewSet, ProjectViewSet, ProjectMilestoneViewSet, ProjectFileViewSet, DashboardStatsView, AnnouncementViewSet, ExamViewSet, ExamSubmissionViewSet, BulkUserActionView, AssignCourseView
+from . import async_views
+from .views import CustomUserViewSet, CourseViewSet, CustomTokenObtainPairView, AssignmentViewSet, MessageViewSet, SubmissionViewSet, ProjectViewSet, ProjectMilestoneViewSet, ProjectFileViewSet, DashboardStatsView, AnnouncementViewSet, NotificationViewSet, ExamViewSet, ExamSubmissionViewSet, ExamAttemptViewSet, DiscussionMessageViewSet, BulkUserActionView, AssignCourseView, LoginMetricsView, SearchView, SyncView, StudentDashboardView
 
 router = DefaultRouter()
 router.register(r'users', CustomUserViewSet)
@@ -12,12 +13,24 @@ router.register(r'projects', ProjectViewSet, basename='project')
 router.register(r'project-milestones', ProjectMilestoneViewSet)
 router.register(r'project-files', ProjectFileViewSet)
 router.register(r'announcements', AnnouncementViewSet, basename='announcement')
+router.register(r'notifications', NotificationViewSet, basename='notification')
 router.register(r'exams', ExamViewSet, basename='exam')
 router.register(r'exam-submissions', ExamSubmissionViewSet, basename='exam-submission')
+router.register(r'exam-attempts', ExamAttemptViewSet, basename='exam-attempt')
+router.register(r'discussions', DiscussionMessageViewSet, basename='discussion')
 
 urlpatterns = [
     path('admin/stats/', DashboardStatsView.as_view(), name='admin-stats'),
     path('admin/bulk-user-action/', BulkUserActionView.as_view(), name='bulk-user-action'),
+    path('admin/login-metrics/', LoginMetricsView.as_view(), name='login-metrics'),
     path('admin/assign-course/', AssignCourseView.as_view(), name='assign-course'),
+    path('dashboard/', StudentDashboardView.as_view(), name='student-dashboard'),
+    path('async/announcements/', async_views.announcements, name='async-announcements'),
+    path('async/messages/', async_views.messages, name='async-messages'),
+    path('async/exams/', async_views.exams, name='async-exams'),
+    path('async/exams/<int:pk>/', async_views.exam_detail, name='async-exam-detail'),
+    path('async/dashboard/', async_views.dashboard, name='async-dashboard'),
+    path('search/', SearchView.as_view(), name='search'),
+    path('sync/', SyncView.as_view(), name='sync'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
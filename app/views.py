@@ -1,10 +1,35 @@
+import hashlib
+from datetime import timedelta
+
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from rest_framework_simplejwt.views import TokenObtainPairView
-from django.db.models import Q
-from .models import CustomUser, Course, Assignment, Message, Submission, Project, ProjectMilestone, ProjectFile, Announcement, Exam, Question, Choice, ExamSubmission
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Prefetch, Q, Subquery
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils import timezone
+from django.utils.http import parse_etags
+from .authentication import invalidate_users
+from .counters import refresh_user_counters
+from .caching import AnonymousResponseCacheMixin, ConditionalGetMixin, bump_versions, cache_version
+from .fastlist import FastListMixin, row_mapper
+from .fieldsets import SparseFieldsetMixin, requested_fieldset
+from .login import login_metrics, login_pool
+from .renderers import FastJSONRenderer
+from .pagination import encode_cursor, decode_cursor, after, before
+from .search import KIND_BY_MODEL, MAX_RESULTS as SEARCH_MAX_RESULTS, search
+from .throttling import LoginAccountThrottle, LoginIPThrottle
+from .sync import SYNC_MODELS, changes_since, current_position, decode_token, encode_token, record_changes, record_scope_changes
+from .notifications import mark_notifications_read, unread_notifications
+from .exams import item_analysis, start_attempt, finalize_attempt, finalize_expired_attempts, validate_answers, is_expired, answer_buffer
+from .models import CustomUser, Course, Unit, Resource, Assignment, Message, Submission, Project, ProjectMilestone, ProjectFile, Announcement, Notification, Exam, Question, Choice, ExamSubmission, ExamAttempt, DiscussionMessage, normalize_search
 from .serializers import (
     CustomUserSerializer, 
     CourseSerializer, 
@@ -17,20 +42,49 @@ from .serializers import (
     ProjectFileSerializer,
     ProjectFileSerializer,
     AnnouncementSerializer,
+    NotificationSerializer,
     ExamSerializer,
+    StudentExamSerializer,
     QuestionSerializer,
     ChoiceSerializer,
-    ExamSubmissionSerializer
+    ExamSubmissionSerializer,
+    ExamAttemptSerializer,
+    DiscussionMessageSerializer,
+    UnitSerializer,
+    ResourceSerializer,
+    BulkGradeEntrySerializer,
+    ProjectTimelineSerializer
 )
 
 from django.shortcuts import render
 def react_app(request):
     return render(request, "index.html")
 
+AUTOCOMPLETE_MAX_RESULTS = 20
+
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
+    throttle_classes = [LoginIPThrottle, LoginAccountThrottle]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        try:
+            # Password hashing runs on the login pool, not on the request thread
+            login_pool.run(serializer.is_valid, raise_exception=True)
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+        return Response(serializer.validated_data, status=200)
+
+class LoginMetricsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        user = request.user
+        if user.user_type != 'admin' and not user.is_staff:
+            return Response({'error': 'Unauthorized'}, status=403)
+        return Response({'pool': login_pool.stats(), 'counters': login_metrics.snapshot()})
 
-class CustomUserViewSet(viewsets.ModelViewSet):
+class CustomUserViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = CustomUser.objects.all()
     serializer_class = CustomUserSerializer
     
@@ -67,6 +121,39 @@ class CustomUserViewSet(viewsets.ModelViewSet):
             return [AllowAny()]
         return [IsAuthenticated()]
 
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        # Prefix match on the indexed, normalized username/email columns.
+        # Each lookup is a bounded index range scan, unlike ?search= (icontains).
+        user = request.user
+        if user.user_type != 'admin' and not user.is_staff:
+            return Response({'error': 'Unauthorized'}, status=403)
+
+        prefix = normalize_search(request.query_params.get('q', '').strip())
+        if not prefix:
+            return Response([])
+        limit = page_limit(request, default=AUTOCOMPLETE_MAX_RESULTS, maximum=AUTOCOMPLETE_MAX_RESULTS)
+
+        queryset = CustomUser.objects.all()
+        user_type_param = request.query_params.get('user_type')
+        if user_type_param:
+            queryset = queryset.filter(user_type=user_type_param)
+
+        upper = prefix + '\U0010ffff'
+        fields = ('id', 'username', 'email', 'user_type')
+        matches = {}
+        for column in ('username_search', 'email_search'):
+            rows = (
+                queryset.filter(**{f'{column}__gte': prefix, f'{column}__lt': upper})
+                .order_by(column)
+                .values(*fields)[:limit]
+            )
+            for row in rows:
+                matches.setdefault(row['id'], row)
+            if len(matches) >= limit:
+                break
+        return Response(list(matches.values())[:limit])
+
 class BulkUserActionView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -85,14 +172,17 @@ class BulkUserActionView(APIView):
         
         if action == 'activate':
             users.update(is_active=True)
+            bump_versions(CustomUser)
+            invalidate_users(*users.values_list('id', flat=True))
             return Response({'message': f'{users.count()} users activated'})
         elif action == 'deactivate':
             users.update(is_active=False)
+            bump_versions(CustomUser)
+            invalidate_users(*users.values_list('id', flat=True))
             return Response({'message': f'{users.count()} users deactivated'})
         elif action == 'delete':
-            count = users.count()
-            users.delete()
-            return Response({'message': f'{count} users permanently deleted'})
+            count, _ = users.delete()
+            return Response({'message': f'{count} users deleted'})
         else:
             return Response({'error': 'Invalid action'}, status=400)
 
@@ -125,64 +215,229 @@ class AssignCourseView(APIView):
         elif target_user.user_type == 'teacher':
             # For teachers, we set them as course teacher (one teacher per course)
             if action == 'assign':
+                previous_teachers = set(courses.values_list('teacher_id', flat=True))
+                course_ids = list(courses.values_list('id', flat=True))
                 courses.update(teacher=target_user)
+                refresh_user_counters(previous_teachers | {target_user.id})
+                bump_versions(Course, CustomUser)
+                record_changes(Course, course_ids)
+                record_scope_changes(previous_teachers | {target_user.id})
             # Remove teacher assignment not implemented (would need to set to null)
         
         return Response({'message': f'Course assignment updated for {target_user.username}'})
 
-class CourseViewSet(viewsets.ModelViewSet):
+def course_content_payload(course_id, request):
+    """Rendered unit/resource tree of a course and its ETag, built once per content version."""
+    version = cache_version(f'course-content-version:{course_id}')
+    # File URLs are absolute, so the host is part of the key
+    key = f'course-content:{course_id}:{version}:{request.build_absolute_uri("/")}'
+    cached = cache.get(key)
+    if cached is None:
+        context = {'request': request}
+        units = [
+            dict(UnitSerializer(unit, context=context).data, resources=[])
+            for unit in Unit.objects.filter(course_id=course_id).order_by('order', 'id')
+        ]
+        by_id = {unit['id']: unit for unit in units}
+        unassigned = []
+        for resource in ResourceSerializer(Resource.objects.filter(course_id=course_id).order_by('created_at', 'id'), many=True, context=context).data:
+            unit = by_id.get(resource['unit'])
+            (unit['resources'] if unit else unassigned).append(resource)
+        body = FastJSONRenderer().render({'course': int(course_id), 'units': units, 'resources': unassigned})
+        cached = (f'"{hashlib.sha1(body).hexdigest()}"', body)
+        cache.set(key, cached, timeout=settings.COURSE_CONTENT_CACHE_TIMEOUT)
+    return cached
+
+class CourseViewSet(AnonymousResponseCacheMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
     permission_classes = [AllowAny]
+    conditional_models = (Course, CustomUser)
+
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
+    def content(self, request, pk=None):
+        # Units in order with their resources; resources outside any unit under "resources"
+        if not pk.isdigit() or not can_access_course(request.user, pk):
+            return Response({'error': 'Unauthorized'}, status=403)
+        etag, body = course_content_payload(pk, request)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
 
-class AssignmentViewSet(viewsets.ModelViewSet):
+class AssignmentViewSet(AnonymousResponseCacheMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Assignment.objects.all()
     serializer_class = AssignmentSerializer
     permission_classes = [AllowAny]
+    conditional_models = (Assignment,)
 
-class MessageViewSet(viewsets.ModelViewSet):
+def visible_messages(user):
+    # Messages the user either sent or received
+    return Message.objects.filter(Q(sender=user) | Q(receiver=user))
+
+class MessageViewSet(FastListMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = MessageSerializer
     permission_classes = [IsAuthenticated] # Messages should be private
 
     def get_queryset(self):
-        user = self.request.user
-        # Filter messages where the user is either sender or receiver
-        return Message.objects.filter(Q(sender=user) | Q(receiver=user))
+        return visible_messages(self.request.user)
 
     def perform_create(self, serializer):
         serializer.save(sender=self.request.user)
 
-class SubmissionViewSet(viewsets.ModelViewSet):
+class ReviewQueueMixin:
+    """Adds ``GET .../review-queue/``: ungraded items from ``get_queryset()``, oldest first.
+
+    Keyset paged on ``(review_field, id)``: ``?after=<cursor>`` continues from
+    the ``next`` cursor of the previous page, ``?course=<id>`` narrows to one
+    course. The partial ``*_review_queue`` indexes hold only ungraded rows, so
+    the queue is read without touching graded history.
+    """
+    review_field = None
+    review_course_lookup = None
+    review_select_related = ()
+
+    @action(detail=False, methods=['get'], url_path='review-queue')
+    def review_queue(self, request):
+        if request.user.user_type == 'student':
+            return Response({'error': 'Unauthorized'}, status=403)
+        queryset = self.get_queryset().filter(grade__isnull=True).select_related(*self.review_select_related)
+        course_id = request.query_params.get('course')
+        if course_id:
+            if not course_id.isdigit():
+                return Response({'error': 'Invalid course'}, status=400)
+            queryset = queryset.filter(**{self.review_course_lookup: course_id})
+        cursor = request.query_params.get('after')
+        if cursor:
+            try:
+                queryset = queryset.filter(after(self.review_field, *decode_cursor(cursor)))
+            except ValueError:
+                return Response({'error': 'Invalid cursor'}, status=400)
+
+        limit = page_limit(request)
+        rows = list(queryset.order_by(self.review_field, 'id')[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return Response({
+            'results': self.get_serializer(rows, many=True).data,
+            'next': encode_cursor(getattr(rows[-1], self.review_field), rows[-1].id) if has_more else None,
+        })
+
+class BulkGradeMixin:
+    """Adds ``POST .../bulk-grade/`` taking ``{"grades": [{"id", "grade", "feedback"?}, ...]}``.
+
+    Ownership of every row is checked with one query against
+    ``get_queryset()``, then all grades are written in one transaction with
+    ``bulk_update``. Entries without ``feedback`` only write ``grade``, so
+    feedback saved meanwhile is kept. Each entry gets an outcome: ``updated``,
+    ``not_found`` (missing or not in the caller's courses) or ``invalid``.
+    """
+
+    @action(detail=False, methods=['post'], url_path='bulk-grade')
+    def bulk_grade(self, request):
+        if request.user.user_type == 'student':
+            return Response({'error': 'Unauthorized'}, status=403)
+        entries = request.data.get('grades') if hasattr(request.data, 'get') else None
+        if not isinstance(entries, list) or not entries:
+            return Response({'error': 'grades must be a non-empty list'}, status=400)
+        if len(entries) > settings.BULK_GRADE_MAX_ROWS:
+            return Response({'error': f'At most {settings.BULK_GRADE_MAX_ROWS} grades per request'}, status=400)
+
+        outcomes, valid = [], {}
+        for entry in entries:
+            serializer = BulkGradeEntrySerializer(data=entry)
+            if not serializer.is_valid():
+                outcomes.append({'id': entry.get('id') if isinstance(entry, dict) else None, 'status': 'invalid', 'errors': serializer.errors})
+                continue
+            data = serializer.validated_data
+            if data['id'] in valid:
+                outcomes.append({'id': data['id'], 'status': 'invalid', 'errors': {'id': ['Duplicate id.']}})
+                continue
+            valid[data['id']] = data
+            outcomes.append({'id': data['id'], 'status': None})
+
+        model = self.get_queryset().model
+        rows = {obj.id: obj for obj in self.get_queryset().filter(id__in=list(valid)).only('id', 'grade', 'feedback')}
+        graded, with_feedback = [], []
+        for obj_id, data in valid.items():
+            obj = rows.get(obj_id)
+            if obj is None:
+                continue
+            obj.grade = data['grade']
+            if 'feedback' in data:
+                obj.feedback = data['feedback']
+                with_feedback.append(obj)
+            else:
+                graded.append(obj)
+        with transaction.atomic():
+            model.objects.bulk_update(graded, ['grade'], batch_size=500)
+            model.objects.bulk_update(with_feedback, ['grade', 'feedback'], batch_size=500)
+            # bulk_update sends no signals
+            record_changes(model, list(rows))
+
+        for outcome in outcomes:
+            if outcome['status'] is None:
+                outcome['status'] = 'updated' if outcome['id'] in rows else 'not_found'
+        return Response({'updated': len(rows), 'results': outcomes})
+
+class SubmissionViewSet(BulkGradeMixin, ReviewQueueMixin, FastListMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = SubmissionSerializer
     permission_classes = [IsAuthenticated]
+    review_field = 'submitted_at'
+    review_course_lookup = 'assignment__course'
+    review_select_related = ('student', 'assignment')
 
     def get_queryset(self):
         user = self.request.user
         if user.user_type == 'student':
             return Submission.objects.filter(student=user)
-        # Teachers/Admins see all (or filtered by course, simplified for now)
+        elif user.user_type == 'teacher':
+            return Submission.objects.filter(assignment__course__teacher=user)
         return Submission.objects.all()
 
     def perform_create(self, serializer):
         serializer.save(student=self.request.user)
 
-class ProjectViewSet(viewsets.ModelViewSet):
+class ProjectViewSet(BulkGradeMixin, ReviewQueueMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = ProjectSerializer
     permission_classes = [IsAuthenticated]
+    review_field = 'created_at'
+    review_course_lookup = 'course'
+    review_select_related = ('student', 'course')
 
     def get_queryset(self):
         user = self.request.user
         if user.user_type == 'student':
-            return Project.objects.filter(student=user)
-        # For teacher, return projects in courses they teach (or all for MVP simplicity)
-        return Project.objects.all()
+            queryset = Project.objects.filter(student=user)
+        elif user.user_type == 'teacher':
+            queryset = Project.objects.filter(course__teacher=user)
+        else:
+            queryset = Project.objects.all()
+        if self.action not in ('list', 'retrieve', 'review_queue'):
+            return queryset
+
+        # A fixed number of queries however many projects are listed
+        queryset = queryset.select_related('student', 'course')
+        if self.is_timeline():
+            counts = {f'milestones_{status}': Count('milestones', filter=Q(milestones__status=status)) for status in ProjectMilestone.STATUSES}
+            return queryset.annotate(milestones_total=Count('milestones'), **counts)
+        return queryset.prefetch_related('milestones', Prefetch('files', queryset=ProjectFile.objects.select_related('uploader')))
+
+    def is_timeline(self):
+        return self.action in ('list', 'retrieve') and self.request.query_params.get('view') == 'timeline'
+
+    def get_serializer_class(self):
+        return ProjectTimelineSerializer if self.is_timeline() else ProjectSerializer
 
-class ProjectMilestoneViewSet(viewsets.ModelViewSet):
+class ProjectMilestoneViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = ProjectMilestone.objects.all()
     serializer_class = ProjectMilestoneSerializer
     permission_classes = [IsAuthenticated]
 
-class ProjectFileViewSet(viewsets.ModelViewSet):
+class ProjectFileViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = ProjectFile.objects.all()
     serializer_class = ProjectFileSerializer
     permission_classes = [IsAuthenticated]
@@ -190,45 +445,135 @@ class ProjectFileViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(uploader=self.request.user)
 
-class AnnouncementViewSet(viewsets.ModelViewSet):
+def visible_announcements(user):
+    if user.user_type == 'student':
+        # Students see global announcements + announcements from their enrolled courses
+        enrolled_courses = user.courses_enrolled.all()
+        return Announcement.objects.filter(
+            Q(is_global=True) | Q(course__in=enrolled_courses)
+        ).distinct()
+    elif user.user_type == 'teacher':
+        # Teachers see all announcements from courses they teach + global announcements
+        teaching_courses = user.courses_taught.all()
+        return Announcement.objects.filter(
+            Q(is_global=True) | Q(author=user) | Q(course__in=teaching_courses)
+        ).distinct()
+    else:
+        # Admins see all announcements
+        return Announcement.objects.all()
+
+class AnnouncementViewSet(ConditionalGetMixin, FastListMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = AnnouncementSerializer
     permission_classes = [IsAuthenticated]
+    conditional_models = (Announcement, Course, CustomUser)
 
     def get_queryset(self):
-        user = self.request.user
-        
-        if user.user_type == 'student':
-            # Students see global announcements + announcements from their enrolled courses
-            enrolled_courses = user.courses_enrolled.all()
-            return Announcement.objects.filter(
-                Q(is_global=True) | Q(course__in=enrolled_courses)
-            ).distinct()
-        elif user.user_type == 'teacher':
-            # Teachers see all announcements from courses they teach + global announcements
-            teaching_courses = user.courses_taught.all()
-            return Announcement.objects.filter(
-                Q(is_global=True) | Q(author=user) | Q(course__in=teaching_courses)
-            ).distinct()
-        else:
-            # Admins see all announcements
-            return Announcement.objects.all()
+        return visible_announcements(self.request.user)
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
-class ExamViewSet(viewsets.ModelViewSet):
+class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
+    """The caller's announcement notifications, newest first.
+
+    Keyset paged on ``(created_at, id)``: ``?before=<cursor>`` continues from
+    the ``next`` cursor of the previous page, ``?unread=1`` lists unread ones
+    only. ``unread-count`` reads the caller's inbox row instead of counting.
+    """
+    serializer_class = NotificationSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return Notification.objects.filter(recipient=self.request.user).select_related('announcement')
+
+    def list(self, request):
+        queryset = self.get_queryset()
+        if request.query_params.get('unread') in ('1', 'true'):
+            queryset = queryset.filter(is_read=False)
+        cursor = request.query_params.get('before')
+        if cursor:
+            try:
+                queryset = queryset.filter(before('created_at', *decode_cursor(cursor)))
+            except ValueError:
+                return Response({'error': 'Invalid cursor'}, status=400)
+
+        limit = page_limit(request)
+        rows = list(queryset.order_by('-created_at', '-id')[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return Response({
+            'results': self.get_serializer(rows, many=True).data,
+            'next': encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None,
+        })
+
+    @action(detail=False, methods=['get'], url_path='unread-count')
+    def unread_count(self, request):
+        return Response({'unread': unread_notifications(request.user)})
+
+    @action(detail=False, methods=['post'], url_path='mark-read')
+    def mark_read(self, request):
+        """Takes ``{"ids": [...]}`` or ``{"all": true}``."""
+        ids = request.data.get('ids')
+        if ids is None and request.data.get('all') is not True:
+            return Response({'error': 'Provide ids or all'}, status=400)
+        if ids is not None and (not isinstance(ids, list) or not all(type(pk) is int for pk in ids)):
+            return Response({'error': 'ids must be a list of integers'}, status=400)
+        updated = mark_notifications_read(request.user, ids)
+        return Response({'updated': updated, 'unread': unread_notifications(request.user)})
+
+def student_exam_payload(exam):
+    """Rendered answer-free exam JSON and its ETag, built once per exam version."""
+    key = f'exam-payload:{exam.pk}:{exam.content_version}'
+    cached = cache.get(key)
+    if cached is None:
+        exam = Exam.objects.select_related('course', 'created_by').prefetch_related('questions__choices').get(pk=exam.pk)
+        body = FastJSONRenderer().render(StudentExamSerializer(exam).data)
+        cached = (f'"{hashlib.sha1(body).hexdigest()}"', body)
+        cache.set(key, cached, timeout=settings.EXAM_PAYLOAD_CACHE_TIMEOUT)
+    return cached
+
+def visible_exams(user):
+    if user.user_type == 'teacher':
+        return Exam.objects.filter(created_by=user)
+    elif user.user_type == 'student':
+        # Students can see exams from their enrolled courses or global mock tests (no course)
+        enrolled_courses = user.courses_enrolled.all()
+        return Exam.objects.filter(Q(course__in=enrolled_courses) | Q(course__isnull=True))
+    return Exam.objects.all() # Admin
+
+def with_questions(queryset):
+    # Everything the exam serializers read, so serializing takes no further queries
+    return queryset.select_related('course', 'created_by').prefetch_related('questions__choices')
+
+class ExamViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = ExamSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_serializer_class(self):
+        if self.request.user.user_type == 'student':
+            return StudentExamSerializer
+        return ExamSerializer
+
+    def retrieve(self, request, *args, **kwargs):
+        if request.user.user_type != 'student' or requested_fieldset(request) is not None:
+            return super().retrieve(request, *args, **kwargs)
+
+        # Students all open the same exam at once: serve pre-rendered bytes
+        etag, body = student_exam_payload(self.get_object())
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
     def get_queryset(self):
-        user = self.request.user
-        if user.user_type == 'teacher':
-            return Exam.objects.filter(created_by=user)
-        elif user.user_type == 'student':
-            # Students can see exams from their enrolled courses or global mock tests (no course)
-            enrolled_courses = user.courses_enrolled.all()
-            return Exam.objects.filter(Q(course__in=enrolled_courses) | Q(course__isnull=True))
-        return Exam.objects.all() # Admin
+        queryset = visible_exams(self.request.user)
+        # Students retrieve the cached payload instead
+        if self.action == 'list' or (self.action == 'retrieve' and self.request.user.user_type != 'student'):
+            return with_questions(queryset)
+        return queryset
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
@@ -249,7 +594,25 @@ class ExamViewSet(viewsets.ModelViewSet):
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=201, headers=headers)
 
-class ExamSubmissionViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['post'])
+    def start(self, request, pk=None):
+        if request.user.user_type != 'student':
+            return Response({'error': 'Only students can attempt exams'}, status=403)
+        attempt = start_attempt(self.get_object(), request.user)
+        if attempt.status != 'in_progress':
+            return Response({'error': 'No attempts left', 'status': attempt.status, 'submission': attempt.submission_id}, status=409)
+        return Response(ExamAttemptSerializer(attempt).data, status=201)
+
+    @action(detail=True, methods=['get'], url_path='item-analysis')
+    def item_analysis(self, request, pk=None):
+        if request.user.user_type == 'student':
+            return Response({'error': 'Unauthorized'}, status=403)
+        exam = self.get_object()
+        # Abandoned attempts count as soon as they expire
+        finalize_expired_attempts(attempts=ExamAttempt.objects.filter(exam=exam))
+        return Response(item_analysis(exam))
+
+class ExamSubmissionViewSet(FastListMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = ExamSubmissionSerializer
     permission_classes = [IsAuthenticated]
 
@@ -262,9 +625,237 @@ class ExamSubmissionViewSet(viewsets.ModelViewSet):
             return ExamSubmission.objects.filter(exam__created_by=user)
         return ExamSubmission.objects.all()
 
+    def list(self, request, *args, **kwargs):
+        user = request.user
+        if user.user_type == 'teacher':
+            finalize_expired_attempts(attempts=ExamAttempt.objects.filter(exam__created_by=user))
+        elif user.user_type != 'student':
+            finalize_expired_attempts()
+        return super().list(request, *args, **kwargs)
+
     def perform_create(self, serializer):
+        # Students submit through timed attempts (POST /api/exams/<id>/start/)
+        if self.request.user.user_type == 'student':
+            raise PermissionDenied('Exams are submitted through attempts')
         serializer.save(student=self.request.user)
 
+    def perform_update(self, serializer):
+        if self.request.user.user_type == 'student':
+            raise PermissionDenied('Submissions cannot be changed')
+        serializer.save()
+
+    def perform_destroy(self, instance):
+        if self.request.user.user_type == 'student':
+            raise PermissionDenied('Submissions cannot be deleted')
+        instance.delete()
+
+class ExamAttemptViewSet(SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
+    serializer_class = ExamAttemptSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.user_type == 'student':
+            return ExamAttempt.objects.filter(student=user)
+        elif user.user_type == 'teacher':
+            return ExamAttempt.objects.filter(exam__created_by=user)
+        return ExamAttempt.objects.all()
+
+    def get_object(self):
+        attempt = super().get_object()
+        if attempt.status == 'in_progress':
+            if is_expired(attempt):
+                finalize_attempt(attempt, status='expired')
+                attempt.refresh_from_db()
+            else:
+                # Show answers still waiting in the write-behind buffer
+                attempt.answers = {**attempt.answers, **answer_buffer.pending(attempt.id)}
+        return attempt
+
+    def _own_open_attempt(self, request):
+        attempt = self.get_object()
+        if attempt.student_id != request.user.id:
+            return None, Response({'error': 'Unauthorized'}, status=403)
+        if attempt.status != 'in_progress':
+            return None, Response({'error': 'Attempt is closed', 'status': attempt.status, 'submission': attempt.submission_id}, status=409)
+        return attempt, None
+
+    def _validated_answers(self, attempt, request):
+        try:
+            return validate_answers(attempt.exam, request.data.get('answers', {}))
+        except ValueError as exc:
+            raise ValidationError({'answers': [str(exc)]})
+
+    @action(detail=True, methods=['post'])
+    def autosave(self, request, pk=None):
+        attempt, error = self._own_open_attempt(request)
+        if error:
+            return error
+        answers = self._validated_answers(attempt, request)
+        answer_buffer.put(attempt.id, answers)
+        return Response({'saved': len(answers), 'deadline': attempt.deadline}, status=202)
+
+    @action(detail=True, methods=['post'])
+    def submit(self, request, pk=None):
+        attempt, error = self._own_open_attempt(request)
+        if error:
+            return error
+        answers = self._validated_answers(attempt, request)
+        submission = finalize_attempt(attempt, answers=answers)
+        return Response(ExamSubmissionSerializer(submission).data, status=201)
+
+def can_access_course(user, course_id):
+    if user.user_type == 'admin' or user.is_staff:
+        return Course.objects.filter(id=course_id).exists()
+    return Course.objects.filter(Q(teacher=user) | Q(students=user), id=course_id).exists()
+
+def page_limit(request, default=50, maximum=200):
+    try:
+        return max(1, min(int(request.query_params.get('limit', default)), maximum))
+    except ValueError:
+        raise ValidationError({'limit': ['Must be an integer.']})
+
+class DiscussionMessageViewSet(viewsets.ModelViewSet):
+    serializer_class = DiscussionMessageSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        user = self.request.user
+        queryset = DiscussionMessage.objects.select_related('user')
+        if user.user_type == 'admin' or user.is_staff:
+            return queryset
+        return queryset.filter(Q(course__teacher=user) | Q(course__students=user)).distinct()
+
+    def list(self, request, *args, **kwargs):
+        # Keyset paging over the (course, created_at, id) index:
+        #   ?course=<id>                   newest page; "next" pages back into history
+        #   ?course=<id>&before=<cursor>   the page before a cursor
+        #   ?course=<id>&since=<cursor>    what was posted after a cursor (oldest first)
+        course_id = request.query_params.get('course')
+        if not course_id or not course_id.isdigit():
+            return Response({'error': 'course is required'}, status=400)
+        if not can_access_course(request.user, course_id):
+            return Response({'error': 'Unauthorized'}, status=403)
+
+        limit = page_limit(request)
+        messages = DiscussionMessage.objects.select_related('user').filter(course_id=course_id)
+        try:
+            since = request.query_params.get('since')
+            if since:
+                position = decode_cursor(since)
+                rows = list(messages.filter(after('created_at', *position)).order_by('created_at', 'id')[:limit + 1])
+                has_more = len(rows) > limit
+                rows = rows[:limit]
+                cursor = encode_cursor(rows[-1].created_at, rows[-1].id) if rows else since
+                return Response({
+                    'results': self.get_serializer(rows, many=True).data,
+                    'cursor': cursor,
+                    'has_more': has_more,
+                })
+
+            before_cursor = request.query_params.get('before')
+            if before_cursor:
+                messages = messages.filter(before('created_at', *decode_cursor(before_cursor)))
+        except ValueError:
+            return Response({'error': 'Invalid cursor'}, status=400)
+
+        rows = list(messages.order_by('-created_at', '-id')[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return Response({
+            'results': self.get_serializer(rows, many=True).data,
+            'next': encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None,
+            # Newest position seen; poll with ?since= from here
+            'cursor': encode_cursor(rows[0].created_at, rows[0].id) if rows and not before_cursor else None,
+        })
+
+    def perform_create(self, serializer):
+        if not can_access_course(self.request.user, serializer.validated_data['course'].id):
+            raise PermissionDenied('Not a member of this course')
+        serializer.save(user=self.request.user)
+
+    def perform_update(self, serializer):
+        if serializer.instance.user_id != self.request.user.id:
+            raise PermissionDenied('Only the author can edit a message')
+        serializer.save()
+
+    def perform_destroy(self, instance):
+        user = self.request.user
+        if instance.user_id != user.id and user.user_type == 'student':
+            raise PermissionDenied('Only the author can delete a message')
+        instance.delete()
+
+class SyncView(APIView):
+    """Delta sync for the SPA: everything that changed since an opaque token.
+
+    Without a token (or when the token is too old) the response is a full
+    snapshot with ``reset: true``. Rows are scoped and serialized by the same
+    viewsets that serve them individually; ids the client could see that were
+    deleted or are no longer visible come back under ``deleted``.
+    """
+    permission_classes = [IsAuthenticated]
+
+    viewsets = {
+        'courses': CourseViewSet,
+        'assignments': AssignmentViewSet,
+        'announcements': AnnouncementViewSet,
+        'messages': MessageViewSet,
+        'submissions': SubmissionViewSet,
+        'projects': ProjectViewSet,
+        'exams': ExamViewSet,
+    }
+
+    def _view(self, key, request):
+        return self.viewsets[key](request=request, format_kwarg=None, action='list', kwargs={})
+
+    def get(self, request):
+        token = request.query_params.get('token')
+        changes = None
+        if token:
+            try:
+                position = decode_token(token)
+            except ValueError:
+                return Response({'error': 'Invalid sync token'}, status=400)
+            changes, position = changes_since(position, request.user)
+            if changes is not None and not changes:
+                # Caught up: answered from the change log alone
+                return Response({'token': encode_token(position), 'reset': False, 'changes': {}})
+
+        if changes is None:
+            # Full snapshot. Read the position first so that writes racing with
+            # the snapshot are sent again on the next sync rather than lost.
+            position = current_position()
+            data = {}
+            for key in SYNC_MODELS:
+                view = self._view(key, request)
+                data[key] = {'updated': view.get_serializer(view.get_queryset(), many=True).data, 'deleted': []}
+            return Response({'token': encode_token(position), 'reset': True, 'changes': data})
+
+        data = {}
+        for key, ids in changes.items():
+            view = self._view(key, request)
+            rows = list(view.get_queryset().filter(id__in=ids['upsert']))
+            hidden = ids['upsert'] - {row.id for row in rows}
+            data[key] = {
+                'updated': view.get_serializer(rows, many=True).data,
+                'deleted': sorted(ids['delete'] | hidden),
+            }
+        return Response({'token': encode_token(position), 'reset': False, 'changes': data})
+
+class SearchView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'q is required'}, status=400)
+        kinds = [k for k in request.query_params.get('kind', '').split(',') if k]
+        unknown = set(kinds) - set(KIND_BY_MODEL.values())
+        if unknown:
+            return Response({'error': f'Unknown kind: {", ".join(sorted(unknown))}'}, status=400)
+        limit = page_limit(request, default=20, maximum=SEARCH_MAX_RESULTS)
+        return Response({'query': query, 'results': search(request.user, query, kinds=kinds, limit=limit)})
+
 class DashboardStatsView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -285,4 +876,69 @@ class DashboardStatsView(APIView):
             'total_teachers': total_teachers,
             'total_courses': total_courses,
             'recent_users': recent_users_data
-        })
\ No newline at end of file
+        })
+
+def dashboard_cache_key(request, user, days):
+    return f'dashboard:{user.id}:{days}:{request.build_absolute_uri("/")}'
+
+def dashboard_queries(user, days, announcement_count):
+    """The five unevaluated querysets behind the student dashboard, keyed by response field."""
+    now = timezone.now()
+    enrolled = user.courses_enrolled.values('id')
+    open_attempts = ExamAttempt.objects.filter(exam=OuterRef('pk'), student=user, status='in_progress')
+    return {
+        'courses': (
+            Course.objects.filter(id__in=enrolled).order_by('title', 'id')
+            .values('id', 'title', 'teacher', teacher_name=F('teacher__username'))
+        ),
+        'due_assignments': (
+            Assignment.objects.filter(course__in=enrolled, due_date__gte=now, due_date__lte=now + timedelta(days=days))
+            .exclude(Exists(Submission.objects.filter(assignment=OuterRef('pk'), student=user)))
+            .order_by('due_date', 'id')
+        ),
+        'unread_messages': Message.objects.filter(receiver=user, is_read=False),
+        'announcements': Announcement.objects.filter(Q(is_global=True) | Q(course__in=enrolled))[:announcement_count],
+        'open_exams': (
+            Exam.objects.filter(Q(course__in=enrolled) | Q(course__isnull=True))
+            .exclude(Exists(ExamSubmission.objects.filter(exam=OuterRef('pk'), student=user)))
+            .order_by('-created_at', '-id')
+            .values('id', 'title', 'course', 'duration_minutes', 'total_marks',
+                    course_title=F('course__title'), attempt=Subquery(open_attempts.values('id')[:1]))
+        ),
+    }
+
+class StudentDashboardView(APIView):
+    """Everything the student home screen shows, in one response from five queries.
+
+    ``?days=`` sets how far ahead due assignments are listed (default 7).
+    Cached per user for ``DASHBOARD_CACHE_TIMEOUT`` seconds.
+    """
+    permission_classes = [IsAuthenticated]
+    announcement_count = 5
+
+    def get(self, request):
+        user = request.user
+        if user.user_type != 'student':
+            return Response({'error': 'Unauthorized'}, status=403)
+        try:
+            days = max(1, min(int(request.query_params.get('days', 7)), 60))
+        except ValueError:
+            raise ValidationError({'days': ['Must be an integer.']})
+
+        key = dashboard_cache_key(request, user, days)
+        data = cache.get(key)
+        if data is None:
+            data = self.build(request, user, days)
+            cache.set(key, data, timeout=settings.DASHBOARD_CACHE_TIMEOUT)
+        return Response(data)
+
+    def build(self, request, user, days):
+        queries = dashboard_queries(user, days, self.announcement_count)
+        context = {'request': request}
+        return {
+            'courses': list(queries['courses']),
+            'due_assignments': row_mapper(AssignmentSerializer(context=context)).map(queries['due_assignments'], request),
+            'unread_messages': queries['unread_messages'].count(),
+            'announcements': row_mapper(AnnouncementSerializer(context=context)).map(queries['announcements'], request),
+            'open_exams': list(queries['open_exams']),
+        }
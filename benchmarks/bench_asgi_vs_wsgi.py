@@ -0,0 +1,200 @@
+"""Concurrency and tail latency: sync views under WSGI vs. async views under ASGI.
+
+Starts gunicorn (sync workers, ``education.wsgi``) and uvicorn
+(``education.asgi``) with the same number of worker processes on a seeded
+throwaway database, then drives each with ``--concurrency`` clients in
+parallel. The WSGI server serves the DRF endpoints, the ASGI server their
+``/api/async/`` counterparts. Reports throughput, mean and p99 latency per
+endpoint.
+
+SQLite answers in microseconds, which hides what a networked database costs a
+blocked worker; ``--db-latency-ms`` adds that much sleep to every query to
+stand in for the round trip. The dashboard cache is disabled so every request
+builds it.
+
+Needs ``pip install gunicorn uvicorn``.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from datetime import timedelta
+
+from common import ROOT, setup_django, summarize
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework_simplejwt.tokens import AccessToken  # noqa: E402
+
+from app.models import Announcement, Assignment, Choice, Course, CustomUser, Exam, Message, Question  # noqa: E402
+
+SETTINGS_MODULE = '''
+import time
+
+from django.db.backends.signals import connection_created
+
+from education.settings import *  # noqa: F401,F403
+
+DATABASES['default']['NAME'] = {database!r}
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+DASHBOARD_CACHE_TIMEOUT = 0
+
+
+def _slow(execute, sql, params, many, context):
+    time.sleep({latency!r})
+    return execute(sql, params, many, context)
+
+
+def _add_latency(connection, **kwargs):
+    # Fires on every reconnect of the same wrapper
+    if _slow not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_slow)
+
+
+if {latency!r}:
+    connection_created.connect(_add_latency)
+'''
+
+ENDPOINTS = (
+    ('announcements', '/api/announcements/', '/api/async/announcements/'),
+    ('messages', '/api/messages/', '/api/async/messages/'),
+    ('exams', '/api/exams/', '/api/async/exams/'),
+    ('dashboard', '/api/dashboard/', '/api/async/dashboard/'),
+)
+
+
+def seed(students, items):
+    teacher = CustomUser.objects.create(username='teacher', user_type='teacher')
+    student_objs = CustomUser.objects.bulk_create(
+        CustomUser(username=f'student{i}', email=f'student{i}@example.com') for i in range(students)
+    )
+    course = Course.objects.create(title='Course', description='x' * 200, teacher=teacher)
+    course.students.add(*student_objs)
+    now = timezone.now()
+    Assignment.objects.bulk_create(
+        Assignment(course=course, title=f'Assignment {i}', description='y' * 200, due_date=now + timedelta(days=i % 7))
+        for i in range(items)
+    )
+    Announcement.objects.bulk_create(
+        Announcement(course=course, author=teacher, title=f'News {i}', content='z' * 200) for i in range(items)
+    )
+    Message.objects.bulk_create(
+        Message(sender=teacher, receiver=student, content=f'Message {i}') for student in student_objs for i in range(items // 5)
+    )
+    for i in range(5):
+        exam = Exam.objects.create(title=f'Exam {i}', course=course, created_by=teacher)
+        for j in range(10):
+            question = Question.objects.create(exam=exam, text=f'Question {j}', marks=1)
+            Choice.objects.bulk_create(Choice(question=question, text=f'Choice {k}', is_correct=k == 0) for k in range(4))
+    return [str(AccessToken.for_user(student)) for student in student_objs]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(kind, workers, port, env):
+    if kind == 'wsgi':
+        command = [sys.executable, '-m', 'gunicorn', 'education.wsgi:application', '--workers', str(workers),
+                   '--bind', f'127.0.0.1:{port}', '--log-level', 'warning']
+    else:
+        command = [sys.executable, '-m', 'uvicorn', 'education.asgi:application', '--workers', str(workers),
+                   '--host', '127.0.0.1', '--port', str(port), '--lifespan', 'off', '--no-access-log', '--log-level', 'warning']
+    process = subprocess.Popen(command, cwd=ROOT, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process
+        except OSError:
+            if process.poll() is not None:
+                raise SystemExit(f'{kind} server exited with status {process.returncode}')
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit(f'{kind} server did not start')
+
+
+async def fetch(port, path, token):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(
+        f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nAuthorization: Bearer {token}\r\nConnection: close\r\n\r\n'.encode()
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return int(response[9:12])
+
+
+async def load(port, path, tokens, concurrency, duration):
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+
+    async def client(index):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                status = await fetch(port, path, tokens[index % len(tokens)])
+            except OSError:
+                status = None
+            if status == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+            index += concurrency
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per endpoint and server')
+    parser.add_argument('--db-latency-ms', type=float, default=2.0)
+    parser.add_argument('--students', type=int, default=200)
+    parser.add_argument('--items', type=int, default=50)
+    args = parser.parse_args()
+
+    tokens = seed(args.students, args.items)
+    database = settings.DATABASES['default']['NAME']
+    settings_dir = os.path.dirname(database)
+    with open(os.path.join(settings_dir, 'bench_asgi_settings.py'), 'w') as f:
+        f.write(SETTINGS_MODULE.format(database=database, latency=args.db_latency_ms / 1000))
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='bench_asgi_settings',
+               PYTHONPATH=os.pathsep.join([settings_dir, ROOT, os.environ.get('PYTHONPATH', '')]))
+
+    print(f'{args.workers} workers each, {args.concurrency} concurrent clients, '
+          f'{args.db_latency_ms:g} ms per query, {args.duration:g}s per run')
+    print(f"{'endpoint':<15}{'server':<7}{'req/s':>9}{'mean':>11}{'p99':>11}{'errors':>8}")
+    for kind in ('wsgi', 'asgi'):
+        port = free_port()
+        server = start_server(kind, args.workers, port, env)
+        try:
+            for name, sync_path, async_path in ENDPOINTS:
+                path = sync_path if kind == 'wsgi' else async_path
+                asyncio.run(load(port, path, tokens, 4, 1.0))  # warm up every worker
+                latencies, errors, elapsed = asyncio.run(load(port, path, tokens, args.concurrency, args.duration))
+                if not latencies:
+                    print(f'{name:<15}{kind:<7}{"-":>9}{"-":>11}{"-":>11}{errors:>8}')
+                    continue
+                mean, p99 = summarize(latencies)
+                print(f'{name:<15}{kind:<7}{len(latencies) / elapsed:>9.0f}'
+                      f'{mean * 1000:>8.1f} ms{p99 * 1000:>8.1f} ms{errors:>8}')
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Full GET vs. conditional GET (If-None-Match -> 304) on the list endpoints.
+
+Reports wall time, CPU time and bytes on the wire per request, and what the
+304 path saves over re-downloading the list.
+"""
+import argparse
+
+from common import measure, ms, setup_django, summarize
+
+setup_django()
+
+from django.utils import timezone  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from app.models import Announcement, Assignment, Course, CustomUser  # noqa: E402
+
+
+def seed(courses, students_per_course, items_per_course):
+    teacher = CustomUser.objects.create(username='teacher', user_type='teacher')
+    students = CustomUser.objects.bulk_create(
+        CustomUser(username=f'student{i}', email=f'student{i}@example.com') for i in range(students_per_course)
+    )
+    course_objs = Course.objects.bulk_create(
+        Course(title=f'Course {i}', description='x' * 200, teacher=teacher) for i in range(courses)
+    )
+    Through = Course.students.through
+    Through.objects.bulk_create(Through(course_id=c.id, customuser_id=s.id) for c in course_objs for s in students)
+    now = timezone.now()
+    Assignment.objects.bulk_create(
+        Assignment(course=c, title=f'Assignment {j}', description='y' * 300, due_date=now)
+        for c in course_objs for j in range(items_per_course)
+    )
+    Announcement.objects.bulk_create(
+        Announcement(course=c, author=teacher, title=f'News {j}', content='z' * 300)
+        for c in course_objs for j in range(items_per_course)
+    )
+    return students[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--courses', type=int, default=50)
+    parser.add_argument('--students', type=int, default=40)
+    parser.add_argument('--items', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    student = seed(args.courses, args.students, args.items)
+    client = APIClient()
+    client.force_authenticate(student)
+
+    print(f'{args.courses} courses x {args.students} students, {args.items} assignments/announcements per course')
+    print(f"{'endpoint':<22}{'mode':<8}{'mean wall':>12}{'p99 wall':>12}{'CPU/req':>12}{'bytes/req':>12}")
+    for url in ('/api/courses/', '/api/assignments/', '/api/announcements/'):
+        first = client.get(url)
+        etag = first['ETag']
+        full_bytes = len(first.content)
+
+        full_walls, full_cpu = measure(lambda: client.get(url), args.repeat)
+        cond_walls, cond_cpu = measure(lambda: client.get(url, HTTP_IF_NONE_MATCH=etag), args.repeat)
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+        for mode, walls, cpu, size in (('200', full_walls, full_cpu, full_bytes), ('304', cond_walls, cond_cpu, 0)):
+            mean, p99 = summarize(walls)
+            print(f'{url:<22}{mode:<8}{ms(mean):>12}{ms(p99):>12}{ms(cpu / args.repeat):>12}{size:>12}')
+        print(f"{'':<22}saved {100 * (1 - cond_cpu / full_cpu):5.1f}% CPU, {full_bytes} bytes per revalidation")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Per-row cost of ModelSerializer lists vs. the values()-based fast path.
+
+Serializes the submissions, messages, announcements and exam submissions
+lists (queryset evaluation included, rendering excluded) and reports
+microseconds per row for the plain serializer, the serializer over a
+hand-joined ``select_related`` queryset, and the fast path.
+"""
+import argparse
+
+from common import measure, setup_django, summarize
+
+setup_django()
+
+from django.utils import timezone  # noqa: E402
+from rest_framework.request import Request  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from app.fastlist import row_mapper  # noqa: E402
+from app.models import (  # noqa: E402
+    Announcement, Assignment, Course, CustomUser, Exam, ExamSubmission, Message, Submission,
+)
+from app.serializers import (  # noqa: E402
+    AnnouncementSerializer, ExamSubmissionSerializer, MessageSerializer, SubmissionSerializer,
+)
+
+
+def seed(rows):
+    teacher = CustomUser.objects.create(username='teacher', user_type='teacher')
+    student = CustomUser.objects.create(username='student', email='student@example.com')
+    course = Course.objects.create(title='Course', description='x', teacher=teacher)
+    assignments = Assignment.objects.bulk_create(
+        Assignment(course=course, title=f'Assignment {i}', description='y', due_date=timezone.now()) for i in range(50)
+    )
+    exams = Exam.objects.bulk_create(Exam(title=f'Exam {i}', course=course, created_by=teacher) for i in range(50))
+    Submission.objects.bulk_create(
+        Submission(assignment=assignments[i % 50], student=student, file=f'submissions/s{i}.pdf', grade='B', feedback='ok')
+        for i in range(rows)
+    )
+    Message.objects.bulk_create(
+        Message(sender=teacher, receiver=student, content=f'Message {i}') for i in range(rows)
+    )
+    Announcement.objects.bulk_create(
+        Announcement(title=f'News {i}', content='z', author=teacher, course=course if i % 2 else None, is_global=not i % 2)
+        for i in range(rows)
+    )
+    ExamSubmission.objects.bulk_create(
+        ExamSubmission(exam=exams[i % 50], student=student, score=i % 10, responses=[1, 2, 3]) for i in range(rows)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    seed(args.rows)
+    request = Request(APIRequestFactory().get('/api/'))
+
+    print(f'{args.rows} rows per list')
+    print(f"{'list':<18}{'serializer':>12}{'+joins':>12}{'fast path':>12}{'vs +joins':>11}   (us/row)")
+    for name, serializer_class, queryset, joins in (
+        ('submissions', SubmissionSerializer, Submission.objects.all(), ('student', 'assignment')),
+        ('messages', MessageSerializer, Message.objects.all(), ('sender', 'receiver')),
+        ('announcements', AnnouncementSerializer, Announcement.objects.all(), ('author', 'course')),
+        ('exam submissions', ExamSubmissionSerializer, ExamSubmission.objects.all(), ('student', 'exam')),
+    ):
+        context = {'request': request}
+        mapper = row_mapper(serializer_class(context=context))
+        assert mapper.map(queryset.all(), request) == serializer_class(queryset.all(), many=True, context=context).data
+
+        slow, _ = measure(lambda: serializer_class(queryset.all(), many=True, context=context).data, args.repeat)
+        joined, _ = measure(lambda: serializer_class(queryset.select_related(*joins), many=True, context=context).data, args.repeat)
+        fast, _ = measure(lambda: mapper.map(queryset.all(), request), args.repeat)
+        slow_row, joined_row, fast_row = (summarize(walls)[0] / args.rows * 1e6 for walls in (slow, joined, fast))
+        print(f'{name:<18}{slow_row:>12.2f}{joined_row:>12.2f}{fast_row:>12.2f}{joined_row / fast_row:>10.1f}x')
+
+
+if __name__ == '__main__':
+    main()
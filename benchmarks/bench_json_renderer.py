@@ -0,0 +1,81 @@
+"""DRF's JSONRenderer vs. the orjson-backed FastJSONRenderer on the large list endpoints.
+
+Reports render-only throughput on already-serialized list data and
+end-to-end request time for /api/submissions/ and /api/messages/, and checks
+that both renderers produce the same bytes. Request time also includes the
+serializers' per-row related lookups, so the render column isolates the
+renderer itself.
+"""
+import argparse
+
+from common import measure, ms, setup_django, summarize
+
+setup_django()
+
+from django.utils import timezone  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from app.models import Assignment, Course, CustomUser, Message, Submission  # noqa: E402
+from app.renderers import FastJSONRenderer  # noqa: E402
+from app.serializers import MessageSerializer, SubmissionSerializer  # noqa: E402
+from app.views import MessageViewSet, SubmissionViewSet  # noqa: E402
+
+
+def seed(rows):
+    teacher = CustomUser.objects.create(username='teacher', user_type='teacher')
+    student = CustomUser.objects.create(username='student', email='student@example.com')
+    course = Course.objects.create(title='Course', description='x', teacher=teacher)
+    assignments = Assignment.objects.bulk_create(
+        Assignment(course=course, title=f'Assignment {i}', description='y' * 200, due_date=timezone.now())
+        for i in range(max(1, rows // 100))
+    )
+    Submission.objects.bulk_create(
+        Submission(assignment=assignments[i % len(assignments)], student=student, file=f'submissions/s{i}.pdf',
+                   grade='A' if i % 3 else None, feedback='Well done, see comments inline. ' * 3)
+        for i in range(rows)
+    )
+    Message.objects.bulk_create(
+        Message(sender=teacher if i % 2 else student, receiver=student if i % 2 else teacher,
+                content=f'Message {i}: ' + 'lorem ipsum dolor sit amet ' * 4)
+        for i in range(rows)
+    )
+    return teacher, student
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    teacher, student = seed(args.rows)
+    renderers = (('stdlib', JSONRenderer), ('orjson', FastJSONRenderer))
+
+    print(f'{args.rows} rows per endpoint')
+    print(f"{'endpoint':<20}{'renderer':<10}{'render mean':>14}{'MB/s':>10}{'request mean':>15}{'p99':>12}{'CPU/req':>12}")
+    for url, viewset, serializer, queryset, user in (
+        ('/api/submissions/', SubmissionViewSet, SubmissionSerializer, Submission.objects.all(), teacher),
+        ('/api/messages/', MessageViewSet, MessageSerializer, Message.objects.all(), student),
+    ):
+        data = serializer(queryset, many=True).data
+        bodies = {}
+        client = APIClient()
+        client.force_authenticate(user)
+        for name, renderer_class in renderers:
+            renderer = renderer_class()
+            bodies[name] = renderer.render(data, 'application/json')
+            render_walls, _ = measure(lambda: renderer.render(data, 'application/json'), args.repeat)
+            render_mean, _ = summarize(render_walls)
+
+            viewset.renderer_classes = [renderer_class]
+            request_walls, request_cpu = measure(lambda: client.get(url), args.repeat)
+            mean, p99 = summarize(request_walls)
+            mb_per_s = len(bodies[name]) / render_mean / 1e6
+            print(f'{url:<20}{name:<10}{ms(render_mean):>14}{mb_per_s:>10.1f}{ms(mean):>15}{ms(p99):>12}{ms(request_cpu / args.repeat):>12}')
+        assert bodies['stdlib'] == bodies['orjson'], f'{url}: renderers disagree'
+        print(f"{'':<20}identical output, {len(bodies['orjson'])} bytes")
+
+
+if __name__ == '__main__':
+    main()
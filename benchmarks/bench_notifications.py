@@ -0,0 +1,84 @@
+"""Announcement notifications: fan-out cost and the "anything new?" check.
+
+Publishes an announcement to a course of ``--students`` students, once with a
+``save()`` per notification and once through ``app.notifications.fan_out``,
+and reports the time for each. Then compares how a student finds out whether
+anything is new: counting feed announcements newer than the last one seen
+(``visible_announcements``) vs. reading their inbox counter.
+"""
+import argparse
+import time
+
+from common import measure, ms, setup_django, summarize
+
+setup_django()
+
+from django.db import transaction  # noqa: E402
+from django.db.models.signals import post_save  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from app.models import Announcement, Course, CustomUser, Notification, NotificationInbox  # noqa: E402
+from app.notifications import fan_out, unread_notifications  # noqa: E402
+from app.views import visible_announcements  # noqa: E402
+
+
+def one_by_one(announcement, user_ids):
+    with transaction.atomic():
+        for pk in user_ids:
+            Notification(recipient_id=pk, announcement=announcement).save()
+            inbox, _ = NotificationInbox.objects.get_or_create(user_id=pk)
+            inbox.unread_count += 1
+            inbox.save()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--students', type=int, default=5000)
+    parser.add_argument('--announcements', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    # Publish explicitly below instead of through the signal
+    post_save.disconnect(sender=Announcement, dispatch_uid='notify-announcement-saved')
+
+    teacher = CustomUser.objects.create(username='teacher', user_type='teacher')
+    course = Course.objects.create(title='Course', description='', teacher=teacher)
+    CustomUser.objects.bulk_create(
+        [CustomUser(username=f'student{i}', user_type='student') for i in range(args.students)]
+    )
+    students = CustomUser.objects.filter(user_type='student')
+    course.students.add(*students)
+    user_ids = list(students.values_list('pk', flat=True))
+
+    print(f'fan-out to {args.students} students')
+    for name, publish in (
+        ('save() per row', lambda a: one_by_one(a, user_ids)),
+        ('fan_out', fan_out),
+    ):
+        announcement = Announcement.objects.create(title=name, content='', author=teacher, course=course)
+        started = time.perf_counter()
+        publish(announcement)
+        elapsed = time.perf_counter() - started
+        print(f'{name:<16}{elapsed:8.2f} s{args.students / elapsed:>10.0f} rows/s')
+
+    Announcement.objects.bulk_create([
+        Announcement(title=f'older {i}', content='', author=teacher, course=course) for i in range(args.announcements)
+    ])
+    student = students.first()
+    last_seen = timezone.now()
+    checks = (
+        ('feed query', lambda: visible_announcements(student).filter(created_at__gt=last_seen).count()),
+        ('inbox counter', lambda: unread_notifications(student)),
+    )
+    print(f'\n"anything new?" for a student, {args.announcements + 2} announcements in the feed')
+    means = {}
+    for name, check in checks:
+        walls, _ = measure(check, args.requests)
+        mean, p99 = summarize(walls)
+        means[name] = mean
+        print(f'{name:<16}{ms(mean)}{ms(p99)}')
+    print(f"inbox counter is {means['feed query'] / means['inbox counter']:.1f}x faster")
+
+
+if __name__ == '__main__':
+    main()
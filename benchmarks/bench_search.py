@@ -0,0 +1,95 @@
+"""Full-text search (FTS5 / tsvector) vs. ``icontains`` scans.
+
+Seeds ``--rows`` announcements (default 1M) spread over courses, indexes them
+and times the same queries through ``app.search.search`` and through an
+``icontains`` filter on ``Announcement.content``.
+"""
+import argparse
+import random
+from itertools import accumulate
+
+from common import measure, ms, setup_django, summarize
+
+setup_django()
+
+from django.db import transaction  # noqa: E402
+
+from app.models import Announcement, Course, CustomUser, SearchEntry  # noqa: E402
+from app.search import search  # noqa: E402
+
+SYLLABLES = 'ka lo mi ne ru ta vo pe si da ge fu hi jo be'.split()
+
+
+def vocabulary(size, rng):
+    """Synthetic words with a Zipf-like frequency, like real course text."""
+    words = sorted({''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(size * 2)})[:size]
+    rng.shuffle(words)
+    cum_weights = list(accumulate(1 / (rank + 1) for rank in range(len(words))))
+    return words, cum_weights
+
+
+def seed(rows, courses, batch=5000):
+    rng = random.Random(42)
+    words, cum_weights = vocabulary(20000, rng)
+    teacher = CustomUser.objects.create(username='teacher', user_type='teacher')
+    course_ids = [c.id for c in Course.objects.bulk_create(
+        Course(title=f'Course {i}', description='', teacher=teacher) for i in range(courses)
+    )]
+    done = 0
+    while done < rows:
+        n = min(batch, rows - done)
+        with transaction.atomic():
+            created = Announcement.objects.bulk_create(
+                Announcement(
+                    course_id=rng.choice(course_ids), author=teacher, title=' '.join(rng.choices(words, cum_weights=cum_weights, k=3)),
+                    content=' '.join(rng.choices(words, cum_weights=cum_weights, k=40)),
+                )
+                for _ in range(n)
+            )
+            # bulk_create sends no signals, so index the batch directly
+            SearchEntry.objects.bulk_create(
+                SearchEntry(kind='announcement', object_id=a.id, course_id=a.course_id, title=a.title, body=a.content)
+                for a in created
+            )
+        done += n
+    return words
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--courses', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f'seeding {args.rows} announcements...')
+    words = seed(args.rows, args.courses)
+    admin = CustomUser.objects.create(username='admin', user_type='admin')
+    # A student in 5 courses: results are filtered by enrollment
+    student = CustomUser.objects.create(username='student')
+    for course in Course.objects.order_by('id')[:5]:
+        course.students.add(student)
+
+    print('icontains returns the first 20 matches unranked; fts ranks every match before limiting.')
+    print(f"{'query':<24}{'user':<9}{'icontains mean':>16}{'fts mean':>12}{'fts p99':>12}{'speedup':>10}")
+    # A frequent word, a mid-frequency word, a rare word, two words, and a prefix
+    queries = [words[0], words[100], words[10000], f'{words[5]} {words[50]}', words[200][:4]]
+    for term in queries:
+        for label, user in (('admin', admin), ('student', student)):
+            def scan():
+                qs = Announcement.objects.all()
+                for word in term.split():
+                    qs = qs.filter(content__icontains=word)
+                if user is student:
+                    qs = qs.filter(course__students=student)
+                return list(qs[:20])
+
+            scan_walls, _ = measure(scan, args.repeat)
+            fts_walls, _ = measure(lambda: search(user, term, limit=20), args.repeat)
+            scan_mean, _ = summarize(scan_walls)
+            fts_mean, fts_p99 = summarize(fts_walls)
+            print(f'{term:<24}{label:<9}{ms(scan_mean):>16}{ms(fts_mean):>12}{ms(fts_p99):>12}{scan_mean / fts_mean:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Deleting a large course: cascading hard delete vs. soft delete + purge.
+
+Builds two identical courses (``--students`` enrolled, ``--assignments``
+assignments with a submission from every student, an announcement with its
+notifications) and reports how long the delete call takes for each: the
+cascading ``hard_delete()``, which runs as one transaction, and the soft
+``delete()`` the API and admin now use. Then times ``purge_deleted`` removing
+the soft-deleted one in ``PURGE_BATCH_SIZE`` row transactions.
+"""
+import argparse
+import time
+
+from common import setup_django
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.db import transaction  # noqa: E402
+from django.db.models.signals import post_save  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from app import purge, signals  # noqa: E402
+from app.models import Announcement, Assignment, Course, CustomUser, Submission  # noqa: E402
+from app.notifications import fan_out  # noqa: E402
+
+
+def build_course(teacher, students, assignments):
+    course = Course.objects.create(title='Course', description='', teacher=teacher)
+    course.students.add(*students)
+    for i in range(assignments):
+        assignment = Assignment.objects.create(course=course, title=f'A{i}', description='', due_date=timezone.now())
+        Submission.objects.bulk_create(
+            [Submission(assignment=assignment, student=s, file=f'submissions/{s.pk}-{i}.txt') for s in students]
+        )
+    fan_out(Announcement.objects.create(title='Welcome', content='', author=teacher, course=course))
+    return course
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--assignments', type=int, default=20)
+    args = parser.parse_args()
+
+    # The purge is run explicitly below, not on the background thread
+    signals.schedule_purge = lambda: None
+    post_save.disconnect(sender=Announcement, dispatch_uid='notify-announcement-saved')
+    settings.PURGE_BATCH_PAUSE = 0
+
+    teacher = CustomUser.objects.create(username='teacher', user_type='teacher')
+    CustomUser.objects.bulk_create(
+        [CustomUser(username=f'student{i}', user_type='student') for i in range(args.students)]
+    )
+    students = list(CustomUser.objects.filter(user_type='student'))
+    rows = args.students * (args.assignments + 2) + args.assignments
+    print(f'course with {args.students} students, {args.assignments} assignments, ~{rows} dependent rows')
+
+    for name, delete in (('hard_delete()', lambda c: c.hard_delete()), ('delete() (soft)', lambda c: c.delete())):
+        course = build_course(teacher, students, args.assignments)
+        started = time.perf_counter()
+        with transaction.atomic():
+            delete(course)
+        print(f'{name:<18}{time.perf_counter() - started:8.3f} s')
+
+    started = time.perf_counter()
+    deleted, _ = purge.purge_deleted(files_per_second=10_000)
+    elapsed = time.perf_counter() - started
+    print(f"{'purge_deleted':<18}{elapsed:8.3f} s  {deleted} rows in batches of {settings.PURGE_BATCH_SIZE}")
+    assert Submission.objects.count() == 0
+
+
+if __name__ == '__main__':
+    main()
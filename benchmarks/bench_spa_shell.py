@@ -0,0 +1,67 @@
+"""SPA page loads: the full middleware stack + react_app vs. SPAShellMiddleware.
+
+Requests a client-side route the way a browser does (``Accept-Encoding: gzip,
+br``) through the whole request handler, with and without the shell fast
+path, and reports wall time, CPU time and bytes per request, plus the
+revalidation (304) cost of the fast path.
+"""
+import argparse
+
+from common import measure, ms, setup_django, summarize
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+
+# Render {% static %} without a collectstatic manifest
+override_settings(STORAGES={
+    **settings.STORAGES, 'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}).enable()
+
+FAST_PATH = 'app.middleware.SPAShellMiddleware'
+
+
+def client(middleware):
+    """A test client whose handler loads ``middleware``."""
+    original = settings.MIDDLEWARE
+    settings.MIDDLEWARE = middleware
+    try:
+        c = Client(HTTP_ACCEPT_ENCODING='gzip, br')
+        c.get('/courses/1/')  # the handler builds its middleware chain on first use
+    finally:
+        settings.MIDDLEWARE = original
+    return c
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    clients = (
+        ('full stack', client([m for m in settings.MIDDLEWARE if m != FAST_PATH])),
+        ('fast path', client(settings.MIDDLEWARE)),
+    )
+    fast = clients[1][1]
+    etag = fast.get('/courses/1/')['ETag']
+
+    print(f'{args.requests} requests for /courses/<id>/')
+    print(f"{'':<14}{'mean':>12}{'p99':>12}{'CPU/req':>12}{'req/s':>9}{'bytes':>8}")
+    results = {}
+    for name, c, headers in (
+        *((name, c, {}) for name, c in clients),
+        ('fast path 304', fast, {'HTTP_IF_NONE_MATCH': etag}),
+    ):
+        paths = [f'/courses/{i}/' for i in range(args.requests)]
+        responses = iter(paths)
+        walls, cpu = measure(lambda: c.get(next(responses), **headers), args.requests)
+        mean, p99 = summarize(walls)
+        size = len(c.get('/courses/1/', **headers).content)
+        results[name] = mean
+        print(f'{name:<14}{ms(mean)}{ms(p99)}{ms(cpu / args.requests)}{1 / mean:>9.0f}{size:>8}')
+    print(f"fast path is {results['full stack'] / results['fast path']:.1f}x faster per page load")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Static asset delivery: WhiteNoiseMiddleware vs. StaticAssetMiddleware.
+
+Runs collectstatic with the precompressing storage into a temporary
+STATIC_ROOT, reports the size of each encoding of the front-end bundles, then
+calls each middleware directly with requests for them (``Accept-Encoding:
+gzip, br``) and reports time per request, body read included, and the
+Cache-Control header each one sends.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from common import measure, ms, setup_django, summarize
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.staticfiles.storage import staticfiles_storage  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from whitenoise.middleware import WhiteNoiseMiddleware  # noqa: E402
+
+from app.middleware import StaticAssetMiddleware  # noqa: E402
+
+settings.STATIC_ROOT = tempfile.mkdtemp(prefix='edu-bench-static-')
+
+ASSETS = ('js/main.161a37b6.js', 'css/main.29f4617a.css')
+# Requested by the JS runtime under the build's own name
+CHUNK = '/static/js/453.d959d594.chunk.js'
+
+
+def serve(middleware, request):
+    response = middleware(request)
+    body = b''.join(response)
+    response.close()
+    return body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    call_command('collectstatic', interactive=False, verbosity=0)
+    print(f'collectstatic: {time.perf_counter() - started:.1f}s')
+
+    urls = [staticfiles_storage.url(name) for name in ASSETS] + [CHUNK]
+    print(f"\n{'file':<45}{'identity':>10}{'gzip':>10}{'br':>10}")
+    for url in urls:
+        path = os.path.join(settings.STATIC_ROOT, url[len(settings.STATIC_URL):])
+        sizes = [os.path.getsize(p) if os.path.exists(p) else None for p in (path, path + '.gz', path + '.br')]
+        print(f'{url:<45}' + ''.join(f'{size:>10}' if size else f'{"-":>10}' for size in sizes))
+
+    middlewares = (
+        ('whitenoise', WhiteNoiseMiddleware(lambda request: None)),
+        ('in-memory', StaticAssetMiddleware(lambda request: None)),
+    )
+    factory = RequestFactory(HTTP_ACCEPT_ENCODING='gzip, br')
+    print(f"\n{'file':<45}{'middleware':<12}{'mean':>12}{'p99':>12}   cache-control")
+    for url in urls:
+        request = factory.get(url)
+        means = {}
+        for name, middleware in middlewares:
+            cache_control = middleware(request)['Cache-Control']
+            walls, _ = measure(lambda: serve(middleware, request), args.requests)
+            mean, p99 = summarize(walls)
+            means[name] = mean
+            print(f'{url:<45}{name:<12}{ms(mean)}{ms(p99)}   {cache_control}')
+        print(f"{'':<45}{'':<12}{means['whitenoise'] / means['in-memory']:>10.1f}x faster")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""User autocomplete (indexed prefix range) vs. the ``?search=`` icontains scan.
+
+Seeds ``--users`` users (default 500k) and replays a keystroke sequence
+against ``/api/users/autocomplete/``. For comparison it runs the query behind
+``/api/users/?search=`` (icontains, ordered by date_joined) capped at the same
+20 rows, i.e. without its unbounded serialization cost.
+"""
+import argparse
+import random
+import string
+
+from common import measure, ms, setup_django, summarize
+
+setup_django()
+
+from django.db import transaction  # noqa: E402
+from django.db.models import Q  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from app.models import CustomUser, normalize_search  # noqa: E402
+
+
+def seed(count, batch=10000):
+    rng = random.Random(7)
+    names = []
+    for start in range(0, count, batch):
+        users = []
+        for i in range(start, min(count, start + batch)):
+            name = ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(5, 10))) + str(i)
+            email = f'{name}@example.com'
+            # bulk_create skips save(), so fill the normalized columns here
+            users.append(CustomUser(
+                username=name, email=email, username_search=normalize_search(name), email_search=normalize_search(email),
+            ))
+            names.append(name)
+        with transaction.atomic():
+            CustomUser.objects.bulk_create(users)
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=500_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f'seeding {args.users} users...')
+    names = seed(args.users)
+    admin = CustomUser.objects.create(username='admin', user_type='admin')
+    client = APIClient()
+    client.force_authenticate(admin)
+
+    rng = random.Random(1)
+    target = rng.choice(names)
+    keystrokes = [target[:n] for n in range(1, 6)]
+    client.get(f'/api/users/autocomplete/?q={target}')
+    print(f"{'prefix':<10}{'autocomplete mean':>20}{'p99':>12}{'icontains mean':>16}{'results':>10}")
+    for prefix in keystrokes:
+        url = f'/api/users/autocomplete/?q={prefix}'
+        ac_walls, _ = measure(lambda: client.get(url), args.repeat)
+        scan = CustomUser.objects.filter(Q(username__icontains=prefix) | Q(email__icontains=prefix)).order_by('-date_joined')
+        scan_walls, _ = measure(lambda: list(scan[:20]), max(1, args.repeat // 4))
+        ac_mean, ac_p99 = summarize(ac_walls)
+        scan_mean, _ = summarize(scan_walls)
+        print(f'{prefix:<10}{ms(ac_mean):>20}{ms(ac_p99):>12}{ms(scan_mean):>16}{len(client.get(url).json()):>10}')
+
+
+if __name__ == '__main__':
+    main()
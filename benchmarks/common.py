@@ -0,0 +1,50 @@
+"""Shared setup for the benchmark scripts.
+
+Every benchmark runs against a throwaway SQLite database in a temporary
+directory, so db.sqlite3 is never touched. Run them from the repository root,
+e.g. ``python benchmarks/bench_conditional_get.py``.
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'education.settings')
+    from django.conf import settings
+
+    settings.DATABASES['default']['NAME'] = os.path.join(tempfile.mkdtemp(prefix='edu-bench-'), 'bench.sqlite3')
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['*']
+
+    import django
+    from django.core.management import call_command
+
+    django.setup()
+    call_command('migrate', verbosity=0)
+
+
+def measure(fn, repeat):
+    """Run ``fn`` ``repeat`` times; return (wall seconds list, total CPU seconds)."""
+    walls = []
+    cpu_start = time.process_time()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        walls.append(time.perf_counter() - start)
+    return walls, time.process_time() - cpu_start
+
+
+def ms(seconds):
+    return f'{seconds * 1000:8.2f} ms'
+
+
+def summarize(walls):
+    walls = sorted(walls)
+    p99 = walls[min(len(walls) - 1, int(len(walls) * 0.99))]
+    return statistics.mean(walls), p99
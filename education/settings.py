@@ -50,11 +50,21 @@ AUTH_USER_MODEL = 'app.CustomUser'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'app.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # orjson-backed JSON; falls back to the stdlib encoder when orjson is missing
+    'DEFAULT_RENDERER_CLASSES': (
+        'app.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'app.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 from datetime import timedelta
@@ -65,6 +75,8 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': False,
     'BLACKLIST_AFTER_ROTATION': True,
     'UPDATE_LAST_LOGIN': False,
+    # Tokens carry a hash of the password, so changing it revokes them
+    'CHECK_REVOKE_TOKEN': True,
 
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
@@ -92,7 +104,9 @@ SIMPLE_JWT = {
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # Right after SecurityMiddleware: serves the SPA shell without running the rest
+    'app.middleware.SPAShellMiddleware',
+    'app.middleware.StaticAssetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -138,6 +152,49 @@ DATABASES = {
 }
 
 
+CACHES = {
+    # Also holds the per-user versions behind app.authentication; without
+    # REDIS_URL it is per process, so authenticated users are not cached.
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    } if os.environ.get('REDIS_URL') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'education',
+    },
+    # Rendered anonymous API responses (see app.caching.AnonymousResponseCacheMixin).
+    # Set REDIS_URL (requires the `redis` package) to share it across workers.
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    } if os.environ.get('REDIS_URL') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+}
+
+RESPONSE_CACHE_ALIAS = 'responses'
+# Keys embed model versions, so this only bounds memory, not staleness.
+RESPONSE_CACHE_TIMEOUT = 60 * 10
+
+# Users resolved by app.authentication.CachedJWTAuthentication are reused for
+# this many seconds unless invalidated earlier through USER_CACHE_ALIAS. They
+# are only cached when that alias is shared by all workers (not LocMem).
+USER_CACHE_ALIAS = 'default'
+USER_CACHE_TIMEOUT = 60
+
+# Login (app.login, app.throttling). Password checks run on their own pool so
+# a login storm cannot take every request worker. Waiting logins hold request
+# threads, so the queue is a few checks per worker and the wait a few seconds.
+LOGIN_WORKERS = int(os.environ.get('LOGIN_WORKERS', 2))
+LOGIN_QUEUE_SIZE = LOGIN_WORKERS * 4
+LOGIN_QUEUE_TIMEOUT = 2
+# Token buckets as (burst capacity, tokens refilled per second)
+LOGIN_IP_BUCKET = (300, 10.0)
+LOGIN_ACCOUNT_BUCKET = (10, 1 / 30)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -180,8 +237,53 @@ STATICFILES_DIRS = [
 ]
 
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+STATICFILES_STORAGE = 'app.storage.PrecompressedManifestStaticFilesStorage'
+
+# The front-end build's manifest; the files it lists are cached as immutable
+STATIC_ASSET_MANIFEST = 'asset-manifest.json'
+# Larger static files (source maps) are streamed from disk instead of held in memory
+STATIC_PRELOAD_MAX_FILE_SIZE = 1024 * 1024
 
 
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+
+# Timed exam attempts
+# Autosaved answers are buffered in memory and flushed in batches once this
+# many attempts are pending, and every this many seconds.
+EXAM_AUTOSAVE_FLUSH_SIZE = 200
+EXAM_AUTOSAVE_FLUSH_INTERVAL = 5
+# Extra time after the deadline during which the final submit is still accepted.
+EXAM_ATTEMPT_GRACE_SECONDS = 30
+# Attempts a student gets per exam; starting another returns the last one.
+EXAM_MAX_ATTEMPTS = 1
+
+# Rendered student exam payloads are keyed by Exam.content_version, so the
+# timeout only bounds memory use, not staleness.
+EXAM_PAYLOAD_CACHE_TIMEOUT = 60 * 60
+# Rendered course content trees; keys carry a per-course version, so this only bounds memory.
+COURSE_CONTENT_CACHE_TIMEOUT = 60 * 60
+# The student dashboard is cached per user and not invalidated, so keep this short.
+DASHBOARD_CACHE_TIMEOUT = 30
+
+# Largest accepted POST .../bulk-grade/ request (submissions and projects).
+BULK_GRADE_MAX_ROWS = 5000
+
+# Delta sync (/api/sync/): clients further behind than this many change log
+# entries get a full snapshot instead of a delta.
+SYNC_MAX_CHANGES = 5000
+
+# Announcement notifications (app.notifications). Rows are inserted this many
+# recipients per transaction; announcements reaching more users than the
+# inline limit are fanned out on the worker pool instead of in the request.
+NOTIFICATION_CHUNK_SIZE = 1000
+NOTIFICATION_INLINE_LIMIT = 500
+NOTIFICATION_WORKERS = int(os.environ.get('NOTIFICATION_WORKERS', 1))
+
+# Purge of soft-deleted courses and users (app.purge): rows deleted per
+# transaction, the pause between those transactions (seconds) and the most
+# uploaded files unlinked from MEDIA_ROOT per second.
+PURGE_BATCH_SIZE = 500
+PURGE_BATCH_PAUSE = 0.05
+PURGE_FILES_PER_SECOND = 50
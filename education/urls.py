@@ -19,6 +19,7 @@ from django.urls import path, include
 from rest_framework_simplejwt.views import (
     TokenRefreshView,
 )
+from app.middleware import SPA_PATH_PATTERN
 from app.views import CustomTokenObtainPairView, react_app
 from django.urls import re_path
 
@@ -40,6 +41,7 @@ if settings.DEBUG:
 # Catch-all route for React app - MUST be at the end
 # Regex avoids intercepting static, media, api, and admin routes
 urlpatterns += [
-    re_path(r'^(?!.*(?:admin/|api/|static/|media/)).*$', react_app),
+    # Normally answered by app.middleware.SPAShellMiddleware before reaching here
+    re_path(SPA_PATH_PATTERN, react_app),
 ]
 